@@ -0,0 +1,12 @@
+
+def gcd(a, b):
+    if b == 0:
+        return a
+    r = a % b
+    result = gcd(b, r)
+    return result
+
+a = int(input())
+b = int(input())
+value = gcd(a, b)
+print(value)
@@ -0,0 +1,15 @@
+
+def add_to(total, n):
+    if n == 0:
+        return total
+    total = total + n
+    n = n - 1
+    return sum_to(total, n)
+
+def sum_to(total, n):
+    result = add_to(total, n)
+    return result
+
+n = int(input())
+value = sum_to(0, n)
+print(value)
@@ -0,0 +1,9 @@
+_BASE = 10
+value = int(input())
+digits = 0
+while value > 0:
+    digit = value % _BASE
+    print(digit)
+    value = value // _BASE
+    digits = digits + 1
+print(digits)
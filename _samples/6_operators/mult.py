@@ -0,0 +1,4 @@
+a = int(input())
+b = int(input())
+result = a * b
+print(result)
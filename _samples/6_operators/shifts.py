@@ -0,0 +1,14 @@
+a = int(input())
+n = int(input())
+double = a * 2
+times_ten = a * 10
+half = a // 4
+low = a % 8
+left = a << n
+right = a >> n
+print(double)
+print(times_ten)
+print(half)
+print(low)
+print(left)
+print(right)
@@ -0,0 +1,9 @@
+n = int(input())
+k = int(input())
+i = 0
+while i < n:
+    offset = k * 3 # the same in every iteration
+    value = i * k
+    value = value + offset
+    print(value)
+    i = i + 1
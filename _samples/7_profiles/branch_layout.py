@@ -0,0 +1,11 @@
+n = int(input())
+skip = int(input())
+i = 0
+count = 0
+while i < n:
+    if i != skip:
+        count = count + 1
+    else:
+        count = count - 1
+    i = i + 1
+print(count)
@@ -0,0 +1,25 @@
+def checksum(total, value):
+    total = total + value
+    if total > 9999:
+        total = total - 9999
+    if total < 0:
+        total = total + 9999
+    total = total * 3
+    if total > 9999:
+        total = total % 9999
+    bits = value % 8
+    if bits == 1:
+        total = total + 1
+    if bits == 2:
+        total = total + 2
+    if bits == 4:
+        total = total + 4
+    return total
+
+n = int(input())
+i = 0
+total = 0
+while i < n:
+    total = checksum(total, i)
+    i = i + 1
+print(total)
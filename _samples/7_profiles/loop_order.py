@@ -0,0 +1,12 @@
+n = int(input())
+i = 0
+total = 0
+while i < n:
+    total = total + i
+    if i == 3:
+        j = 0
+        while j < 5:
+            total = total + 1
+            j = j + 1
+    i = i + 1
+print(total)
@@ -0,0 +1,227 @@
+import argparse
+import ast
+import json
+import math
+import os
+import sys
+import time
+from translator import translate, run, program_instructions
+from emulator.Assembler import Assembler
+from emulator.Emulator import Emulator, EmulatorError
+from emulator.FastEmulator import FastEmulator
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '_samples')
+
+# values read by the input() calls of every sample
+SAMPLE_INPUTS = {
+    '1_global/add_sub.py': [10],
+    '1_global/factorial.py': [6],
+    '1_global/fibonnaci.py': [12],
+    '1_global/mult.py': [6, 7],
+    '1_global/simple.py': [],
+    '2_mem_alloc/add_sub.py': [10],
+    '2_mem_alloc/factorial.py': [6],
+    '2_mem_alloc/fibonnaci.py': [12],
+    '2_mem_alloc/mult.py': [6, 7],
+    '3_conditionals/factorial.py': [6],
+    '3_conditionals/gcd.py': [84, 36],
+    '3_conditionals/smart_mult.py': [6, 7],
+    '4_function_calls/call_param.py': [5],
+    '4_function_calls/call_return.py': [5],
+    '4_function_calls/call_void.py': [5],
+    '4_function_calls/factorial.py': [6],
+    '4_function_calls/factorial_rec.py': [6],
+    '4_function_calls/fib_rec.py': [10],
+    '4_function_calls/fibonnaci.py': [12],
+    '4_function_calls/gcd_rec.py': [1071, 462],
+    '4_function_calls/sum_rec.py': [100],
+    '5_arrays/eratosthenes.py': [50],
+    '5_arrays/eratosthenes_local.py': [50],
+    '5_arrays/fibo_cached.py': [15],
+    '5_arrays/global_read.py': [3, 5, 1, 2, 3, 4, 5],
+    '5_arrays/local_read.py': [3, 5, 1, 2, 3, 4, 5],
+    '6_operators/div_mod.py': [12345],
+    '6_operators/mult.py': [123, -45],
+    '6_operators/shifts.py': [-100, 3],
+    '6_operators/table.py': [10, 7],
+    '7_profiles/branch_layout.py': [200, 7],
+    '7_profiles/hot_inlining.py': [200],
+    '7_profiles/loop_order.py': [200],
+}
+
+# larger versions of the samples: (name, sample, source replacements, inputs)
+STRESS = [
+    ('stress/fib_rec_20', '4_function_calls/fib_rec.py', [], [20]),
+    ('stress/factorial_rec_7', '4_function_calls/factorial_rec.py', [], [7]),
+    ('stress/sum_rec_250', '4_function_calls/sum_rec.py', [], [250]),
+    ('stress/fibonnaci_1000', '1_global/fibonnaci.py', [], [1000]),
+    ('stress/gcd_large', '3_conditionals/gcd.py', [], [32767, 2]),
+    ('stress/eratosthenes_1000', '5_arrays/eratosthenes.py', [('[0] * 100', '[0] * 1000')], [1000]),
+    ('stress/eratosthenes_local_1000', '5_arrays/eratosthenes_local.py', [('[0] * 100', '[0] * 1000')], [1000]),
+    ('stress/fibo_cached_24', '5_arrays/fibo_cached.py', [], [24]),
+]
+
+TIME_FLOOR_MS = 0.2 # compile time differences below this are noise
+SPEEDUP_FLOOR_MS = 1.0 # reference emulations shorter than this are too noisy to track the speedup of the FastEmulator
+# executed instructions from which the FastEmulator targets x10, shorter runs do not pay back the translation of traces
+LONG_RUN = 100_000
+
+def main():
+    args = process_cli()
+    results = benchmark(workloads(), args['optimize'], args['repeat'], args['max_steps'], args['emulators'])
+    print(report(results))
+    if args['output']:
+        save(results, args['output'])
+    if args['update'] or not os.path.exists(args['baseline']):
+        save(results, args['baseline'])
+        print(f'; Baseline written to {args["baseline"]}')
+        return 0
+    with open(args['baseline']) as f:
+        baseline = json.load(f)
+    regressions = compare(baseline, results, args['time_threshold'], args['instruction_threshold'],
+                          args['speedup_threshold'])
+    for regression in regressions:
+        print(f'; REGRESSION {regression}')
+    print(f'; {len(regressions)} regression(s) against {args["baseline"]}')
+    return 1 if regressions else 0
+
+def process_cli():
+    """"Process Command Line Interface options"""
+    parser = argparse.ArgumentParser(description='Compile and emulate every sample, tracking regressions')
+    parser.add_argument('--baseline', default='bench_baseline.json',
+                        help='JSON baseline to compare with, created when missing (default: bench_baseline.json)')
+    parser.add_argument('--update', default=False, action='store_true',
+                        help='overwrite the baseline with the results of this run')
+    parser.add_argument('--output', default=None, help='also write the results of this run to this JSON file')
+    parser.add_argument('-O', dest='optimize', type=int, nargs='?', const=1, default=0, metavar='LEVEL',
+                        help='optimization level of the translations')
+    parser.add_argument('--repeat', type=int, default=5, help='compilations per program, the fastest counts')
+    parser.add_argument('--max-steps', type=int, default=20_000_000,
+                        help='instructions after which an emulated program is considered stuck')
+    parser.add_argument('--time-threshold', type=float, default=0.25,
+                        help='tolerated relative compile time increase (default: 0.25)')
+    parser.add_argument('--instruction-threshold', type=float, default=0.0,
+                        help='tolerated relative increase of executed instructions (default: 0)')
+    parser.add_argument('--emulators', default=False, action='store_true',
+                        help='also time every program on the reference Emulator and on the FastEmulator, '
+                             f'tracking the speedup (x10 targeted on the runs over {LONG_RUN} instructions)')
+    parser.add_argument('--speedup-threshold', type=float, default=0.25,
+                        help='tolerated relative decrease of the FastEmulator speedup (default: 0.25)')
+    return vars(parser.parse_args())
+
+def workloads():
+    """(name, source, inputs) of the samples and of their stress versions"""
+    results = list()
+    for sample, inputs in SAMPLE_INPUTS.items():
+        results.append((sample, read_sample(sample), inputs))
+    for name, sample, replacements, inputs in STRESS:
+        source = read_sample(sample)
+        for old, new in replacements:
+            if old not in source:
+                raise ValueError(f'{sample} does not contain {old!r}, update the stress workload {name}')
+            source = source.replace(old, new)
+        results.append((name, source, inputs))
+    return results
+
+def read_sample(sample):
+    with open(os.path.join(SAMPLES_DIR, sample)) as f:
+        return f.read()
+
+def benchmark(programs, optimize=0, repeat=5, max_steps=20_000_000, emulators=False):
+    results = dict()
+    for name, source, inputs in programs:
+        result = dict()
+        try:
+            node = ast.parse(source)
+            timings = list()
+            for _ in range(repeat):
+                start = time.perf_counter()
+                translate(node, optimize)
+                timings.append(time.perf_counter() - start)
+            result['compile_ms'] = round(min(timings) * 1000, 4)
+        except Exception as e:
+            result['status'] = f'compile error: {type(e).__name__}: {e}'
+            results[name] = result
+            continue
+        try:
+            emulator = run(node, inputs, optimize, max_steps)
+            result['instructions'] = emulator.instructions
+            result['cycles'] = emulator.cycles
+            result['stack_high_water'] = emulator.stack_high_water
+            result['output'] = emulator.output
+            result['status'] = 'ok'
+            if emulators:
+                result.update(emulator_timings(node, inputs, optimize, repeat, max_steps))
+        except EmulatorError as e:
+            result['status'] = f'runtime error: {e}'
+        except Exception as e:
+            result['status'] = f'assembly error: {type(e).__name__}: {e}'
+        results[name] = result
+    return {'optimize': optimize, 'workloads': results}
+
+def emulator_timings(root_node, inputs, optimize=0, repeat=5, max_steps=20_000_000):
+    """Fastest runs of the program on the reference Emulator and on the FastEmulator, and their ratio"""
+    image = Assembler(program_instructions(root_node, optimize)).assemble().image
+    result = dict()
+    for key, emulator in (('reference_ms', Emulator), ('fast_ms', FastEmulator)):
+        timings = list()
+        for _ in range(repeat):
+            start = time.perf_counter()
+            emulator(image, inputs, max_steps).run()
+            timings.append(time.perf_counter() - start)
+        result[key] = round(min(timings) * 1000, 4)
+    result['speedup'] = round(result['reference_ms'] / result['fast_ms'], 2)
+    return result
+
+def compare(baseline, results, time_threshold, instruction_threshold, speedup_threshold=0.25):
+    """Descriptions of every metric of results worse than in baseline beyond the thresholds"""
+    regressions = list()
+    for name, before in baseline['workloads'].items():
+        after = results['workloads'].get(name)
+        if after is None:
+            regressions.append(f'{name}: workload disappeared')
+            continue
+        if before.get('status') == 'ok' and after.get('status') != 'ok':
+            regressions.append(f'{name}: {after.get("status")}')
+            continue
+        if 'compile_ms' in before and 'compile_ms' in after:
+            limit = before['compile_ms'] * (1 + time_threshold)
+            if after['compile_ms'] > limit and after['compile_ms'] - before['compile_ms'] > TIME_FLOOR_MS:
+                regressions.append(f'{name}: compile time {before["compile_ms"]} ms -> {after["compile_ms"]} ms')
+        if 'instructions' in before and 'instructions' in after:
+            if after['instructions'] > before['instructions'] * (1 + instruction_threshold):
+                regressions.append(f'{name}: executed instructions {before["instructions"]} -> {after["instructions"]}')
+        if 'speedup' in before and 'speedup' in after and before['reference_ms'] >= SPEEDUP_FLOOR_MS:
+            if after['speedup'] < before['speedup'] * (1 - speedup_threshold):
+                regressions.append(f'{name}: FastEmulator speedup x{before["speedup"]} -> x{after["speedup"]}')
+    return regressions
+
+def report(results):
+    lines = [f'{"workload":<36} {"compile ms":>10} {"instructions":>12} {"cycles":>10} {"speedup":>8}  status']
+    for name, result in results['workloads'].items():
+        compile_ms = f'{result["compile_ms"]:.3f}' if 'compile_ms' in result else '-'
+        speedup = f'x{result["speedup"]:.2f}' if 'speedup' in result else '-'
+        lines.append(f'{name:<36} {compile_ms:>10} {result.get("instructions", "-"):>12} '
+                     f'{result.get("cycles", "-"):>10} {speedup:>8}  {result["status"]}')
+    speedups = [result['speedup'] for result in results['workloads'].values()
+                if 'speedup' in result and result['reference_ms'] >= SPEEDUP_FLOOR_MS]
+    if speedups:
+        lines.append(f'; FastEmulator speedup over the reference Emulator: x{geometric_mean(speedups):.2f} geometric '
+                     f'mean, x{min(speedups):.2f} to x{max(speedups):.2f} on the {len(speedups)} runs over '
+                     f'{SPEEDUP_FLOOR_MS} ms')
+    long_runs = [result['speedup'] for result in results['workloads'].values()
+                 if 'speedup' in result and result.get('instructions', 0) >= LONG_RUN]
+    if long_runs:
+        lines.append(f'; x{geometric_mean(long_runs):.2f} geometric mean on the {len(long_runs)} runs over {LONG_RUN} '
+                     f'instructions (target: x10)')
+    return '\n'.join(lines)
+
+def geometric_mean(values):
+    return math.exp(sum(math.log(value) for value in values) / len(values))
+
+def save(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,90 @@
+import ast
+import hashlib
+import os
+import tempfile
+
+LOW_WATER = 0.9 # eviction trims the cache to this fraction of its bounds, leaving room before the next scan
+
+class CompilationCache():
+    """
+        On-disk cache of translated programs, content addressed by the
+        normalized AST (comments and layout do not matter) and the version
+        of the translator. Least recently used entries are evicted once the
+        cache grows over max_entries or max_bytes.
+
+        Every put counts the entries by name, which also sees those added by
+        the other workers of a batch run, and estimates their bytes from the
+        mean size at the last scan. The entries are only stat'ed (scanned) on
+        the first put and when a bound may be crossed, so a batch run does
+        not stat every entry for every file it compiles.
+    """
+
+    def __init__(self, directory, version, max_entries=4096, max_bytes=64 * 1024 * 1024) -> None:
+        self.directory = directory
+        self.version = version
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.__entry_size = None # mean bytes of an entry at the last scan, None before any scan
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, root_node, *options):
+        digest = hashlib.sha256()
+        digest.update(self.version.encode())
+        for option in options:
+            digest.update(b'\0' + repr(option).encode())
+        digest.update(b'\0' + ast.dump(root_node).encode())
+        return digest.hexdigest()
+
+    def get(self, key):
+        path = self.__path(key)
+        try:
+            with open(path) as f:
+                result = f.read()
+            os.utime(path) # refreshing the entry for the LRU eviction
+            return result
+        except OSError:
+            return None
+
+    def put(self, key, assembly):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            f.write(assembly)
+        os.replace(tmp, self.__path(key)) # atomic, concurrent batch workers never see partial entries
+        if self.__entry_size is None:
+            self.evict()
+            return
+        entries = self.__count()
+        if entries > self.max_entries or entries * max(self.__entry_size, len(assembly)) > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """Removes the least recently used entries once over a bound, down to LOW_WATER of the bounds"""
+        entries = list()
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith('.pep'):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+        entries.sort()
+        if len(entries) > self.max_entries or total > self.max_bytes:
+            max_entries, max_bytes = int(self.max_entries * LOW_WATER), int(self.max_bytes * LOW_WATER)
+            while entries and (len(entries) > max_entries or total > max_bytes):
+                _, size, path = entries.pop(0)
+                total -= size
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass # already evicted by another worker
+        self.__entry_size = total / len(entries) if entries else 0
+
+    def __count(self):
+        with os.scandir(self.directory) as it:
+            return sum(1 for entry in it if entry.name.endswith('.pep'))
+
+    def __path(self, key):
+        return os.path.join(self.directory, key + '.pep')
@@ -0,0 +1,166 @@
+import argparse
+import ast
+import fnmatch
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from translator import program_instructions
+from emulator.Assembler import Assembler
+from emulator.Emulator import Emulator, EmulatorError
+from emulator.FastEmulator import FastEmulator
+from bench import workloads
+
+# runs a program in a fresh interpreter, its run time is the last line written to stderr
+PYTHON_RUNNER = '''
+import sys, time
+code = compile(sys.argv[1], sys.argv[2], 'exec')
+start = time.perf_counter()
+try:
+    exec(code, {'__name__': '__main__'})
+except SystemExit:
+    pass
+sys.stdout.flush()
+sys.stderr.write(f'\\n{time.perf_counter() - start}\\n')
+'''
+
+def main():
+    args = process_cli()
+    programs = [p for p in workloads() + matrix(args['matrix'])
+                if not args['only'] or any(fnmatch.fnmatch(p[0], pattern) for pattern in args['only'])]
+    if not programs:
+        print('; No program to check')
+        return 1
+    return check_all(programs, args['levels'], args['jobs'], args['max_steps'], args['timeout'],
+                     args['reference_emulator'])
+
+def process_cli():
+    """"Process Command Line Interface options"""
+    parser = argparse.ArgumentParser(description='Run every sample under CPython and translated on the emulator, '
+                                                 'reporting the programs whose outputs differ')
+    parser.add_argument('--levels', nargs='+', type=int, default=[0, 1, 2], metavar='LEVEL',
+                        help='optimization levels of the translations (default: 0 1 2)')
+    parser.add_argument('--matrix', default=None, metavar='JSON',
+                        help='more programs to check, {"path.py": [[inputs], ...]} with the paths relative '
+                             'to the JSON file, each program runs once per list of inputs')
+    parser.add_argument('--only', nargs='+', default=None, metavar='PATTERN',
+                        help='only check the programs whose name matches one of these glob patterns')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='number of worker processes (default: one per CPU)')
+    parser.add_argument('--max-steps', type=int, default=20_000_000,
+                        help='instructions after which an emulated program is considered stuck')
+    parser.add_argument('--timeout', type=float, default=60,
+                        help='seconds after which a program running under CPython is considered stuck')
+    parser.add_argument('--reference-emulator', default=False, action='store_true',
+                        help='run on the plain interpreter instead of the FastEmulator')
+    return vars(parser.parse_args())
+
+def matrix(path):
+    """(name, source, inputs) of every program and inputs listed in the JSON file at path"""
+    if path is None:
+        return []
+    with open(path) as f:
+        programs = json.load(f)
+    results = list()
+    for program, input_lists in programs.items():
+        with open(os.path.join(os.path.dirname(path), program)) as f:
+            source = f.read()
+        for inputs in input_lists:
+            results.append((f'{program} {" ".join(str(i) for i in inputs)}', source, inputs))
+    return results
+
+####
+## Runs
+####
+
+def run_python(name, source, inputs, timeout):
+    """(printed values, seconds, error) of source run by CPython"""
+    try:
+        process = subprocess.run([sys.executable, '-c', PYTHON_RUNNER, source, name], capture_output=True,
+                                 text=True, input=''.join(f'{i}\n' for i in inputs), timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return None, None, f'did not stop after {timeout} s'
+    if process.returncode != 0:
+        return None, None, process.stderr.strip().splitlines()[-1]
+    return process.stdout.split(), float(process.stderr.split()[-1]), None
+
+def run_emulated(node, inputs, optimize, max_steps, reference=False):
+    """(finished emulator, seconds spent emulating) of the translation of node"""
+    image = Assembler(program_instructions(node, optimize)).assemble().image
+    emulator = (Emulator if reference else FastEmulator)(image, inputs, max_steps)
+    start = time.perf_counter()
+    emulator.run()
+    return emulator, time.perf_counter() - start
+
+def wrapped(value):
+    """value as a 16 bits PEP/9 word would hold it"""
+    try:
+        return str(Emulator.signed(int(value) & 0xFFFF))
+    except ValueError:
+        return value
+
+def check(name, source, inputs, levels, max_steps, timeout, reference=False):
+    """
+        Worker entry point: run one program under CPython then at every level, returns
+        (name, CPython seconds, CPython error, [(level, status, instructions, emulation seconds)]).
+        The status is ok, overflow when the outputs only match as 16 bits words, or what went wrong.
+    """
+    expected, python_time, error = run_python(name, source, inputs, timeout)
+    if error is not None:
+        return name, python_time, error, []
+    results = list()
+    try:
+        node = ast.parse(source)
+    except SyntaxError as e:
+        return name, python_time, None, [(level, f'compile error: {e}', None, None) for level in levels]
+    for level in levels:
+        try:
+            emulator, elapsed = run_emulated(node, inputs, level, max_steps, reference)
+        except EmulatorError as e:
+            results.append((level, f'runtime error: {e}', None, None))
+            continue
+        except Exception as e:
+            results.append((level, f'compile error: {type(e).__name__}: {e}', None, None))
+            continue
+        output = [str(value) for value in emulator.output]
+        if output == expected:
+            status = 'ok'
+        elif output == [wrapped(value) for value in expected]:
+            status = 'overflow'
+        else:
+            status = f'MISMATCH: expected {" ".join(expected)}, got {" ".join(output)}'
+        results.append((level, status, emulator.instructions, elapsed))
+    return name, python_time, None, results
+
+def check_all(programs, levels, jobs=None, max_steps=20_000_000, timeout=60, reference=False):
+    """Check every program over a process pool and print a per-run summary, returns the exit code"""
+    jobs = jobs or os.cpu_count() or 1
+    count = len(programs)
+    start = time.perf_counter()
+    runs = failures = overflows = 0
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for name, python_time, error, results in executor.map(
+                check, *zip(*programs), [levels] * count, [max_steps] * count, [timeout] * count,
+                [reference] * count):
+            if error is not None:
+                print(f'{name:<36} SKIP  CPython: {error}')
+                continue
+            for level, status, instructions, elapsed in results:
+                runs += 1
+                failures += status not in ('ok', 'overflow')
+                overflows += status == 'overflow'
+                if elapsed is None:
+                    print(f'{name:<36} -O{level} {status}')
+                    continue
+                ratio = f'x{elapsed / python_time:.1f}' if python_time > 0 else '-'
+                print(f'{name:<36} -O{level} {instructions:>10} instructions {elapsed * 1000:9.2f} ms '
+                      f'{ratio:>8} vs CPython  {status}')
+    total = time.perf_counter() - start
+    print(f'; {runs - failures}/{runs} runs matched CPython ({overflows} as 16 bits words) in {total:.2f} s '
+          f'with {jobs} worker(s), {failures} failed')
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
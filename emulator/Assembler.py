@@ -0,0 +1,105 @@
+from emulator.Opcodes import UNARY, BRANCH, BRANCH_MODES, GENERAL, MODES
+
+class AssemblerError(Exception):
+    pass
+
+
+class Assembler():
+    """
+        Two pass assembler for the instructions produced by the translator.
+        After assemble(), image holds the bytes loaded at address 0, symbols
+        the value of every label and addresses the address of every
+        instruction.
+    """
+
+    def __init__(self, instructions) -> None:
+        self.__instructions = instructions
+        self.image = bytearray()
+        self.symbols = dict()
+        self.addresses = list()
+
+    def assemble(self):
+        # first pass: locating labels and equates
+        address = 0
+        for instruction in self.__instructions:
+            self.addresses.append(address)
+            mnemonic, operand = self.__split(instruction)
+            label = instruction.label
+            if mnemonic == '.END':
+                break
+            if label is not None:
+                if label in self.symbols:
+                    raise AssemblerError(f'Symbol {label} is defined more than once')
+                self.symbols[label] = self.__value(operand) if mnemonic == '.EQUATE' else address
+            address += self.__size(mnemonic, operand)
+
+        # second pass: encoding
+        for instruction in self.__instructions:
+            mnemonic, operand = self.__split(instruction)
+            if mnemonic == '.END':
+                break
+            self.image += self.__encode(mnemonic, operand)
+        if len(self.image) > 0x10000:
+            raise AssemblerError('Program does not fit in memory')
+        return self
+
+    def __split(self, instruction):
+        return instruction.opcode.upper(), instruction.argument
+
+    def __size(self, mnemonic, operand):
+        if mnemonic in ('.EQUATE', '.END'):
+            return 0
+        if mnemonic == '.BLOCK':
+            return self.__value(operand)
+        if mnemonic == '.WORD':
+            return 2
+        if mnemonic == '.BYTE':
+            return 1
+        if mnemonic in UNARY:
+            return 1
+        if mnemonic in BRANCH or mnemonic in GENERAL:
+            return 3
+        raise AssemblerError(f'Unknown instruction {mnemonic}')
+
+    def __encode(self, mnemonic, operand):
+        if mnemonic == '.EQUATE':
+            return b''
+        if mnemonic == '.BLOCK':
+            return bytes(self.__value(operand))
+        if mnemonic == '.WORD':
+            return self.__word(self.__resolve(operand))
+        if mnemonic == '.BYTE':
+            return bytes([self.__resolve(operand) & 0xFF])
+        if mnemonic in UNARY:
+            return bytes([UNARY[mnemonic]])
+
+        spec, _, mode = operand.partition(',')
+        mode = mode.strip().lower()
+        if mnemonic in BRANCH:
+            mode = mode or 'i'
+            if mode not in BRANCH_MODES:
+                raise AssemblerError(f'Invalid addressing mode {mode} for {mnemonic}')
+            opcode = BRANCH[mnemonic] | BRANCH_MODES[mode]
+        else:
+            if mode not in MODES:
+                raise AssemblerError(f'Invalid addressing mode {mode!r} for {mnemonic}')
+            opcode = GENERAL[mnemonic] | MODES[mode]
+        return bytes([opcode]) + self.__word(self.__resolve(spec.strip()))
+
+    def __resolve(self, operand):
+        if operand in self.symbols:
+            return self.symbols[operand]
+        return self.__value(operand)
+
+    def __value(self, operand):
+        try:
+            if operand.startswith("'") and operand.endswith("'") and len(operand) == 3:
+                return ord(operand[1])
+            return int(operand, 0)
+        except (ValueError, AttributeError):
+            raise AssemblerError(f'Undefined symbol or invalid operand {operand}')
+
+    def __word(self, value):
+        if not -0x8000 <= value <= 0xFFFF:
+            raise AssemblerError(f'Operand {value} does not fit in 16 bits')
+        return (value & 0xFFFF).to_bytes(2, 'big')
@@ -0,0 +1,306 @@
+from collections import Counter
+from emulator.Opcodes import decoding_table
+
+USER_STACK = 0xFB8F  # initial stack pointer set by the PEP/9 operating system
+CHAR_IN = 0xFC15     # memory mapped input/output bytes
+CHAR_OUT = 0xFC16
+
+class EmulatorError(Exception):
+    pass
+
+
+class Emulator():
+    """
+        Straightforward fetch-decode-execute PEP/9 interpreter.
+
+        The operating system traps (DECI, DECO, STRO, HEXO, NOP) are executed
+        natively and count as one instruction. DECI reads from the scripted
+        inputs, DECO and STRO output is captured. Besides the output, a run
+        records the executed instructions (total, per mnemonic and per
+        address), the bytes fetched, read and written and the deepest stack.
+        cycles estimates the run time assuming one cycle per instruction plus
+        one per byte moved over the one byte wide PEP/9 data bus.
+    """
+
+    DECODING = decoding_table()
+
+    def __init__(self, image, inputs=(), max_steps=10_000_000) -> None:
+        self.memory = bytearray(0x10000)
+        self.memory[:len(image)] = image
+        self.inputs = list(inputs)
+        self.max_steps = max_steps
+        self.output = list()    # printed values, in order
+        self.text = list()      # printed text, exactly as the simulator terminal shows it
+        self.a = 0
+        self.x = 0
+        self.sp = USER_STACK
+        self.pc = 0
+        self.n = self.z = self.v = self.c = 0
+        self.halted = False
+
+        self.instructions = 0
+        self.mnemonics = Counter()
+        self.executions = Counter()  # instruction address -> times executed
+        self.fetched_bytes = 0
+        self.read_bytes = 0
+        self.written_bytes = 0
+        self.lowest_sp = USER_STACK
+        self.__input_index = 0
+
+    @property
+    def stack_high_water(self):
+        return USER_STACK - self.lowest_sp
+
+    @property
+    def cycles(self):
+        return self.instructions + self.fetched_bytes + self.read_bytes + self.written_bytes
+
+    def statistics(self):
+        return {
+            'instructions': self.instructions,
+            'cycles': self.cycles,
+            'fetched_bytes': self.fetched_bytes,
+            'read_bytes': self.read_bytes,
+            'written_bytes': self.written_bytes,
+            'stack_high_water': self.stack_high_water,
+            'mnemonics': dict(self.mnemonics.most_common()),
+        }
+
+    def run(self):
+        while not self.halted:
+            if self.instructions >= self.max_steps:
+                raise EmulatorError(f'Program did not stop after {self.max_steps} instructions')
+            self.step()
+        return self
+
+    ####
+    ## Fetch, decode, execute
+    ####
+
+    def step(self):
+        pc = self.pc
+        decoded = self.DECODING[self.memory[pc]]
+        if decoded is None:
+            raise EmulatorError(f'Invalid instruction specifier {self.memory[pc]:#04x} at {pc:#06x}')
+        mnemonic, mode = decoded
+        self.instructions += 1
+        self.mnemonics[mnemonic] += 1
+        self.executions[pc] += 1
+        if mode is None:
+            self.fetched_bytes += 1
+            self.pc = (pc + 1) & 0xFFFF
+            self.execute_unary(mnemonic)
+        else:
+            self.fetched_bytes += 3
+            spec = (self.memory[(pc + 1) & 0xFFFF] << 8) | self.memory[(pc + 2) & 0xFFFF]
+            self.pc = (pc + 3) & 0xFFFF
+            self.execute(mnemonic, mode, spec)
+
+    def execute_unary(self, mnemonic):
+        if mnemonic == 'STOP':
+            self.halted = True
+        elif mnemonic == 'RET':
+            self.pc = self.read_word(self.sp)
+            self.set_sp(self.sp + 2)
+        elif mnemonic == 'RETTR':
+            raise EmulatorError('RETTR is not supported, traps are executed natively')
+        elif mnemonic == 'MOVSPA':
+            self.a = self.sp
+        elif mnemonic == 'MOVFLGA':
+            self.a = (self.n << 3) | (self.z << 2) | (self.v << 1) | self.c
+        elif mnemonic == 'MOVAFLG':
+            self.n, self.z, self.v, self.c = (self.a >> 3) & 1, (self.a >> 2) & 1, (self.a >> 1) & 1, self.a & 1
+        elif mnemonic in ('NOP0', 'NOP1'):
+            pass
+        else:
+            register = mnemonic[-1]
+            value = self.a if register == 'A' else self.x
+            operation = mnemonic[:-1]
+            if operation == 'NOT':
+                result = ~value & 0xFFFF
+            elif operation == 'NEG':
+                result = -value & 0xFFFF
+                self.v = 1 if value == 0x8000 else 0
+            elif operation == 'ASL':
+                result = (value << 1) & 0xFFFF
+                self.c = value >> 15
+                self.v = 1 if (value ^ result) & 0x8000 else 0
+            elif operation == 'ASR':
+                result = (value >> 1) | (value & 0x8000)
+                self.c = value & 1
+            elif operation == 'ROL':
+                result = ((value << 1) & 0xFFFF) | self.c
+                self.c = value >> 15
+            elif operation == 'ROR':
+                result = (value >> 1) | (self.c << 15)
+                self.c = value & 1
+            if operation not in ('ROL', 'ROR'):
+                self.set_nz(result)
+            self.set_register(register, result)
+
+    def execute(self, mnemonic, mode, spec):
+        if mnemonic in ('BR', 'BRLE', 'BRLT', 'BREQ', 'BRNE', 'BRGE', 'BRGT', 'BRV', 'BRC', 'CALL'):
+            target = spec if mode == 'i' else self.read_word(spec + self.x)
+            if mnemonic == 'CALL':
+                self.set_sp(self.sp - 2)
+                self.write_word(self.sp, self.pc)
+                self.pc = target
+            elif self.branch_taken(mnemonic):
+                self.pc = target
+        elif mnemonic == 'DECI':
+            value = self.read_input()
+            self.v = 0 if -0x8000 <= value <= 0x7FFF else 1
+            self.write_word(self.address(mode, spec), value & 0xFFFF)
+            self.set_nz(value & 0xFFFF)
+        elif mnemonic == 'DECO':
+            value = self.signed(self.operand(mode, spec))
+            self.output.append(value)
+            self.text.append(str(value))
+        elif mnemonic == 'HEXO':
+            self.text.append(f'{self.operand(mode, spec):04X}')
+        elif mnemonic == 'STRO':
+            address = self.address(mode, spec)
+            while self.read_byte(address) != 0:
+                self.text.append(chr(self.read_byte(address)))
+                address += 1
+        elif mnemonic == 'NOP':
+            pass
+        elif mnemonic == 'ADDSP':
+            self.set_sp(self.sp + self.operand(mode, spec))
+        elif mnemonic == 'SUBSP':
+            self.set_sp(self.sp - self.operand(mode, spec))
+        else:
+            register = mnemonic[-1]
+            operation = mnemonic[:-1]
+            value = self.a if register == 'A' else self.x
+            if operation == 'STW':
+                self.write_word(self.address(mode, spec), value)
+            elif operation == 'STB':
+                self.write_byte(self.address(mode, spec), value & 0xFF)
+            elif operation == 'LDW':
+                result = self.operand(mode, spec)
+                self.set_nz(result)
+                self.set_register(register, result)
+            elif operation == 'LDB':
+                result = (value & 0xFF00) | self.byte_operand(mode, spec)
+                self.n = 0
+                self.z = 1 if result & 0xFF == 0 else 0
+                self.set_register(register, result)
+            elif operation in ('ADD', 'SUB', 'CPW'):
+                operand = self.operand(mode, spec)
+                if operation == 'ADD':
+                    result = self.add(value, operand, 0)
+                else:
+                    result = self.add(value, ~operand & 0xFFFF, 1) # r + ~operand + 1
+                if operation == 'CPW':
+                    self.n ^= self.v # the comparison is correct even when the subtraction overflows
+                else:
+                    self.set_register(register, result)
+            elif operation == 'CPB':
+                result = ((value & 0xFF) - self.byte_operand(mode, spec)) & 0xFF
+                self.n = result >> 7
+                self.z = 1 if result == 0 else 0
+                self.v = self.c = 0
+            elif operation in ('AND', 'OR'):
+                operand = self.operand(mode, spec)
+                result = value & operand if operation == 'AND' else value | operand
+                self.set_nz(result)
+                self.set_register(register, result)
+            else:
+                raise EmulatorError(f'{mnemonic} is not supported')
+
+    ####
+    ## Helpers
+    ####
+
+    def branch_taken(self, mnemonic):
+        return {
+            'BR': True,
+            'BRLE': self.n or self.z,
+            'BRLT': self.n,
+            'BREQ': self.z,
+            'BRNE': not self.z,
+            'BRGE': not self.n,
+            'BRGT': not self.n and not self.z,
+            'BRV': self.v,
+            'BRC': self.c,
+        }[mnemonic]
+
+    def read_input(self):
+        if self.__input_index >= len(self.inputs):
+            raise EmulatorError('DECI executed with no input left')
+        value = int(self.inputs[self.__input_index])
+        self.__input_index += 1
+        return value
+
+    def add(self, value, operand, carry_in):
+        total = value + operand + carry_in
+        result = total & 0xFFFF
+        self.c = total >> 16
+        self.v = 1 if (value ^ result) & (operand ^ result) & 0x8000 else 0
+        self.set_nz(result)
+        return result
+
+    def address(self, mode, spec):
+        if mode == 'd':
+            address = spec
+        elif mode == 'n':
+            address = self.read_word(spec)
+        elif mode == 's':
+            address = self.sp + spec
+        elif mode == 'sf':
+            address = self.read_word(self.sp + spec)
+        elif mode == 'x':
+            address = spec + self.x
+        elif mode == 'sx':
+            address = self.sp + spec + self.x
+        elif mode == 'sfx':
+            address = self.read_word(self.sp + spec) + self.x
+        else:
+            raise EmulatorError(f'Addressing mode {mode} does not designate memory')
+        return address & 0xFFFF
+
+    def operand(self, mode, spec):
+        return spec if mode == 'i' else self.read_word(self.address(mode, spec))
+
+    def byte_operand(self, mode, spec):
+        return spec & 0xFF if mode == 'i' else self.read_byte(self.address(mode, spec))
+
+    def read_word(self, address):
+        self.read_bytes += 2
+        return (self.memory[address & 0xFFFF] << 8) | self.memory[(address + 1) & 0xFFFF]
+
+    def write_word(self, address, value):
+        self.written_bytes += 2
+        self.memory[address & 0xFFFF] = (value >> 8) & 0xFF
+        self.memory[(address + 1) & 0xFFFF] = value & 0xFF
+
+    def read_byte(self, address):
+        self.read_bytes += 1
+        if address == CHAR_IN:
+            raise EmulatorError('Character input is not supported')
+        return self.memory[address & 0xFFFF]
+
+    def write_byte(self, address, value):
+        self.written_bytes += 1
+        if address == CHAR_OUT:
+            self.text.append(chr(value))
+        self.memory[address & 0xFFFF] = value
+
+    def set_nz(self, value):
+        self.n = value >> 15
+        self.z = 1 if value == 0 else 0
+
+    def set_register(self, register, value):
+        if register == 'A':
+            self.a = value
+        else:
+            self.x = value
+
+    def set_sp(self, value):
+        self.sp = value & 0xFFFF
+        self.lowest_sp = min(self.lowest_sp, self.sp)
+
+    @staticmethod
+    def signed(value):
+        return value - 0x10000 if value & 0x8000 else value
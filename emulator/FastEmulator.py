@@ -0,0 +1,484 @@
+from emulator.Emulator import Emulator, EmulatorError, CHAR_IN, CHAR_OUT
+
+# status bits tested by the branches, locals of the generated blocks
+CONDITIONS = {
+    'BR': 'True', 'BRLE': 'n or z', 'BRLT': 'n', 'BREQ': 'z', 'BRNE': 'not z', 'BRGE': 'not n',
+    'BRGT': 'not (n or z)', 'BRV': 'v', 'BRC': 'c', 'CALL': 'True',
+}
+# the same conditions, for the trace leaving when the branch is not taken
+NOT_TAKEN = {
+    'BRLE': 'not (n or z)', 'BRLT': 'not n', 'BREQ': 'not z', 'BRNE': 'z', 'BRGE': 'n', 'BRGT': 'n or z',
+    'BRV': 'not v', 'BRC': 'not c',
+}
+INDIRECT = ('n', 'sf', 'sfx') # addressing modes reading a pointer first
+
+MAX_TRACE = 256 # instructions decoded or translated at once when no branch or return ends them
+HOT = 400 # instructions interpreted from an address before translating the trace starting there
+COLD = 8 # a trace ends before the code interpreted COLD times less often than its start
+STATUS = frozenset('nzvc')
+# status bits (read, set) by the mnemonics, or their operation without the register, changing them
+STATUS_BITS = {
+    'DECI': ('', 'nzv'), 'MOVFLGA': ('nzvc', ''), 'MOVAFLG': ('', 'nzvc'), 'NOT': ('', 'nz'), 'NEG': ('', 'nzv'),
+    'ASL': ('', 'nzvc'), 'ASR': ('', 'nzc'), 'ROL': ('c', 'c'), 'ROR': ('c', 'c'), 'LDW': ('', 'nz'),
+    'LDB': ('', 'nz'), 'AND': ('', 'nz'), 'OR': ('', 'nz'), 'ADD': ('', 'nzvc'), 'SUB': ('', 'nzvc'),
+    'CPW': ('', 'nzvc'), 'CPB': ('', 'nzvc'),
+}
+SAVE = 's[:] = a, x, sp, n, z, v, c, low, k'
+STOPPED = -1 # returned by a trace once the program stopped, -2 - address when the step budget ran out there
+
+class FastEmulator(Emulator):
+    """
+        PEP/9 emulator translating the hot code of the program into Python
+        functions. Cold code runs on the reference Emulator one block (up to
+        the next branch) at a time, decoded once, so that short programs are
+        not slowed down by translations they would not pay back. Once HOT
+        instructions were interpreted from an address, a function is
+        generated for the trace starting there: the instructions from the
+        address, following unconditional branches and calls, and the side of
+        conditional branches the cold code took most often, the other one
+        leaving the trace (or looping when it goes back to its start). The
+        trace ends before the code the cold code seldom ran. The registers
+        and status bits are locals of the function, memory is read and
+        written in place and the status bits replaced before being read are
+        not computed, so an instruction costs a few Python operations
+        instead of a decode and several method calls.
+
+        The speedup is meant for long-running programs: around ten times
+        the reference Emulator from a hundred thousand instructions or so
+        (bench.py LONG_RUN). A sample running a few thousand instructions
+        spends most of its time translating traces, and is only slightly
+        faster, or slower when it ends before any trace pays back.
+
+        The results (output, memory, registers and every counter) are those
+        of the reference Emulator, the counters of the blocks and traces
+        being derived from the times each one was run and left early. The last
+        instructions before max_steps run on the reference Emulator, so that
+        the limit is exact. The program must not modify its own code once it
+        has run: a block is decoded and a trace translated once. The
+        translator never does.
+    """
+
+    def __init__(self, image, inputs=(), max_steps=10_000_000) -> None:
+        super().__init__(image, inputs, max_steps)
+        self.__traces = dict() # first address -> (function, instructions, early exit counter of each branch)
+        self.__entries = list() # trace -> times entered, in translation order
+        self.__exits = list() # early exit -> times taken
+        self.__blocks = dict() # first address -> cold block, see __decode
+
+    def run(self):
+        traces, blocks = self.__traces, self.__blocks
+        # registers, status bits, lowest stack pointer and instructions left before max_steps
+        state = [self.a, self.x, self.sp, self.n, self.z, self.v, self.c, self.lowest_sp,
+                 self.max_steps - self.instructions]
+        pc, trace = self.pc, None
+        try:
+            while pc >= 0:
+                trace = traces.get(pc)
+                if trace is None:
+                    block = blocks.get(pc) or self.__decode(pc)
+                    if block[2] < HOT:
+                        pc = self.__interpret(pc, block, state)
+                        continue
+                    trace = traces[pc] = self.__translate(pc)
+                pc = trace[0](state)
+        finally:
+            self.a, self.x, self.sp, self.n, self.z, self.v, self.c, self.lowest_sp = (int(r) for r in state[:8])
+            self.__account()
+        if pc == STOPPED:
+            if trace is not None: # stopped by the STOP ending the trace
+                self.pc = (trace[1][-1][0] + 1) & 0xFFFF
+            self.halted = True
+            return self
+        self.pc = -2 - pc # finishing one instruction at a time, the trace may leave early
+        return super().run()
+
+    ####
+    ## Cold code, executed by the reference Emulator one block at a time
+    ####
+
+    def __decode(self, start):
+        """[instructions up to the next branch, times interpreted, instructions interpreted], cached by start"""
+        steps = list()
+        pc = start
+        while len(steps) < MAX_TRACE:
+            decoded = self.DECODING[self.memory[pc]]
+            if decoded is None:
+                break # raised by step once reached
+            mnemonic, mode = decoded
+            address = pc
+            if mode is None:
+                spec, pc = None, (pc + 1) & 0xFFFF
+            else:
+                spec = (self.memory[(pc + 1) & 0xFFFF] << 8) | self.memory[(pc + 2) & 0xFFFF]
+                pc = (pc + 3) & 0xFFFF
+            steps.append((address, mnemonic, mode, spec, pc))
+            if mnemonic in CONDITIONS or mnemonic in ('RET', 'STOP'):
+                break
+        block = self.__blocks[start] = [steps, 0, 0]
+        return block
+
+    def __interpret(self, pc, block, state):
+        """Executes block on the reference Emulator, returns the address reached"""
+        steps = block[0]
+        self.a, self.x, self.sp, self.n, self.z, self.v, self.c, self.lowest_sp, remaining = state
+        if steps and len(steps) <= remaining:
+            block[1] += 1
+            block[2] += len(steps)
+            execute, execute_unary = self.execute, self.execute_unary
+            for _, mnemonic, mode, spec, self.pc in steps:
+                if mode is None:
+                    execute_unary(mnemonic)
+                else:
+                    execute(mnemonic, mode, spec)
+            remaining -= len(steps)
+        else: # stepping up to the limit or the invalid instruction, counted by step
+            self.pc = pc
+            for _ in range(len(steps) or 1):
+                if remaining <= 0:
+                    raise EmulatorError(f'Program did not stop after {self.max_steps} instructions')
+                self.step()
+                remaining -= 1
+        state[:] = self.a, self.x, self.sp, self.n, self.z, self.v, self.c, self.lowest_sp, remaining
+        return STOPPED if self.halted else self.pc
+
+    ####
+    ## Counters, derived from the executions of every block and trace
+    ####
+
+    def __account(self):
+        for block in self.__blocks.values():
+            for address, mnemonic, mode, _, _ in block[0]:
+                self.instructions += block[1]
+                self.mnemonics[mnemonic] += block[1]
+                self.executions[address] += block[1]
+                self.fetched_bytes += (1 if mode is None else 3) * block[1] # the traffic is counted by execute
+            block[1] = 0
+        for (_, instructions, exits), entered in zip(self.__traces.values(), self.__entries):
+            executed = entered
+            for position, (address, mnemonic, fetched, read, written) in enumerate(instructions):
+                if executed == 0:
+                    break
+                self.instructions += executed
+                self.mnemonics[mnemonic] += executed
+                self.executions[address] += executed
+                self.fetched_bytes += fetched * executed
+                self.read_bytes += read * executed
+                self.written_bytes += written * executed
+                if position in exits: # the branch left the trace
+                    executed -= self.__exits[exits[position]]
+        self.__entries[:] = [0] * len(self.__entries) # in place, the traces hold the lists
+        self.__exits[:] = [0] * len(self.__exits)
+
+    ####
+    ## Translation of a trace into a Python function
+    ####
+
+    def __translate(self, start):
+        steps, leave, followed = self.__follow(start)
+        instructions = [(address, mnemonic, 1 if mode is None else 3) + self.__traffic(mnemonic, mode)
+                        for address, mnemonic, mode, _, _ in steps if mnemonic is not None]
+        body = list()
+        exits = dict() # position of a conditional branch in instructions -> its exit counter
+        for position, ((address, mnemonic, mode, spec, pc), live) in enumerate(zip(steps, self.__live_bits(steps))):
+            if mnemonic is None:
+                message = f'Invalid instruction specifier {self.memory[address]:#04x} at {address:#06x}'
+                body.append(f'raise EmulatorError({message!r})')
+            elif mode is None:
+                body += self.__unary(mnemonic, live)
+            elif mnemonic not in CONDITIONS:
+                body += self.__general(mnemonic, mode, spec, live)
+            else: # branches and calls
+                target = str(spec)
+                if mode != 'i':
+                    body += [f't = ({spec} + x) & 65535', 't = m[t] << 8 | m[t + 1 & 65535]']
+                    target = 't'
+                if mnemonic == 'CALL':
+                    body += ['sp = (sp - 2) & 65535', 'if sp < low: low = sp',
+                             f'm[sp] = {pc >> 8}', f'm[sp + 1 & 65535] = {pc & 0xFF}']
+                if CONDITIONS[mnemonic] != 'True':
+                    exits[position] = len(self.__exits)
+                    condition = CONDITIONS[mnemonic]
+                    if position in followed: # leaving when the branch is not taken
+                        condition, target = NOT_TAKEN[mnemonic], str(pc)
+                    body.append((condition, target, position + 1, len(self.__exits)))
+                    self.__exits.append(0)
+
+        # a trace branching back to its start loops without going through run
+        loop = leave == str(start) or any(isinstance(line, tuple) and line[1] == str(start) for line in body)
+        size, indent = len(instructions), '        ' if loop else '    '
+        lines = ['def trace(s, m=m, e=e, q=q, deci=deci, deco=deco, hexo=hexo, stro=stro, rbyte=rbyte, wbyte=wbyte):',
+                 '    a, x, sp, n, z, v, c, low, k = s']
+        if loop:
+            lines.append('    while True:')
+        lines += [indent + f'if k < {size}: {SAVE}; return {-2 - start}',
+                  indent + f'k -= {size}',
+                  indent + f'e[{len(self.__entries)}] += 1']
+        for line in body:
+            if isinstance(line, tuple): # conditional branch, giving back the steps of the instructions not executed
+                condition, target, executed, counter = line
+                leave_early = 'continue' if loop and target == str(start) else f'{SAVE}; return {target}'
+                line = f'if {condition}: q[{counter}] += 1; k += {size - executed}; {leave_early}'
+            lines.append(indent + line)
+        if not (loop and leave == str(start)):
+            lines += [indent + SAVE, indent + f'return {leave}']
+        self.__entries.append(0)
+        namespace = {'m': self.memory, 'e': self.__entries, 'q': self.__exits, 'deci': self.read_input,
+                     'deco': self.__deco, 'hexo': self.__hexo, 'stro': self.__stro, 'rbyte': self.__read_byte,
+                     'wbyte': self.__write_byte, 'EmulatorError': EmulatorError}
+        exec('\n'.join(lines), namespace)
+        return namespace['trace'], instructions, exits
+
+    def __follow(self, start):
+        """
+            (address, mnemonic, mode, specifier, next address) of the instructions of the trace starting at start,
+            the expression of the address executed after it and the positions of the conditional branches whose
+            target the trace follows, mnemonic is None for an invalid specifier. The trace follows the side of
+            conditional branches the cold code took most often, and ends before the code it seldom ran.
+        """
+        steps, visited, followed = list(), set(), set()
+        pc = start
+        while len(steps) < MAX_TRACE:
+            block = self.__blocks.get(pc) or self.__decode(pc)
+            if not block[0]:
+                steps.append((pc, None, None, None, pc))
+                return steps, str(pc), followed
+            steps += block[0]
+            visited.update(address for address, _, _, _, _ in block[0])
+            _, mnemonic, mode, spec, pc = steps[-1]
+            if mnemonic == 'STOP':
+                return steps, str(STOPPED), followed
+            if mnemonic == 'RET':
+                return steps, 't', followed
+            if CONDITIONS.get(mnemonic) == 'True':
+                if mode != 'i':
+                    return steps, 't', followed
+                if spec in visited:
+                    return steps, str(spec), followed
+                pc = spec # following the branch
+            elif mnemonic in CONDITIONS:
+                if mode == 'i' and spec not in visited and self.__interpreted(spec) > self.__interpreted(pc):
+                    followed.add(len(steps) - 1)
+                    pc = spec # the branch was mostly taken, the trace leaves when it is not
+                if self.__interpreted(pc) * COLD < self.__interpreted(start):
+                    return steps, str(pc), followed
+        return steps, str(pc), followed
+
+    def __interpreted(self, pc):
+        """Times the cold code ran the block at pc"""
+        block = self.__blocks.get(pc)
+        return 0 if block is None else block[1]
+
+    def __live_bits(self, steps):
+        """Status bits read after every step before being set again, the code after the trace may read them all"""
+        live, results = STATUS, list()
+        for _, mnemonic, _, _, _ in reversed(steps):
+            results.append(live)
+            if mnemonic is None or CONDITIONS.get(mnemonic, 'True') != 'True':
+                live = STATUS # leaving the trace
+            else:
+                read, written = STATUS_BITS.get(mnemonic) or STATUS_BITS.get(mnemonic[:-1], ('', ''))
+                live = (live - set(written)) | set(read)
+        return results[::-1]
+
+    def __unary(self, mnemonic, live):
+        """Lines of a one byte instruction, the status bits not in live are not computed"""
+        if mnemonic in ('STOP', 'NOP0', 'NOP1'):
+            return []
+        if mnemonic == 'RET':
+            return ['t = m[sp] << 8 | m[sp + 1 & 65535]', 'sp = (sp + 2) & 65535', 'if sp < low: low = sp']
+        if mnemonic == 'RETTR':
+            return ['raise EmulatorError("RETTR is not supported, traps are executed natively")']
+        if mnemonic == 'MOVSPA':
+            return ['a = sp']
+        if mnemonic == 'MOVFLGA':
+            return ['a = n << 3 | z << 2 | v << 1 | c']
+        if mnemonic == 'MOVAFLG':
+            return ['n, z, v, c = a >> 3 & 1, a >> 2 & 1, a >> 1 & 1, a & 1']
+        r, operation = mnemonic[-1].lower(), mnemonic[:-1]
+        if operation == 'NOT':
+            return [f'{r} ^= 65535'] + self.__nz(r, live)
+        if operation == 'NEG':
+            return self.__only(live, v=f'v = {r} == 32768') + [f'{r} = -{r} & 65535'] + self.__nz(r, live)
+        if operation == 'ASL':
+            lines = self.__only(live, c=f'c = {r} >> 15')
+            if 'v' in live:
+                lines += [f'r = ({r} << 1) & 65535', f'v = ({r} ^ r) >> 15', f'{r} = r']
+            else:
+                lines.append(f'{r} = ({r} << 1) & 65535')
+            return lines + self.__nz(r, live)
+        if operation == 'ASR':
+            return self.__only(live, c=f'c = {r} & 1') + [f'{r} = {r} >> 1 | {r} & 32768'] + self.__nz(r, live)
+        if operation == 'ROL':
+            if 'c' not in live:
+                return [f'{r} = ({r} << 1) & 65535 | c']
+            return [f'r = ({r} << 1) & 65535 | c', f'c = {r} >> 15', f'{r} = r']
+        if 'c' not in live: # ROR
+            return [f'{r} = {r} >> 1 | c << 15']
+        return [f'r = {r} >> 1 | c << 15', f'c = {r} & 1', f'{r} = r']
+
+    def __general(self, mnemonic, mode, spec, live):
+        """Lines of an instruction with an operand, branches and calls aside"""
+        if mnemonic == 'NOP':
+            return []
+        if mnemonic == 'DECI':
+            return self.__address(mode, spec) + ['w = deci()', 'v = not -32768 <= w <= 32767', 'w &= 65535',
+                                                 'm[t] = w >> 8', 'm[t + 1 & 65535] = w & 255',
+                                                 'n = w >> 15', 'z = w == 0']
+        if mnemonic in ('DECO', 'HEXO'):
+            lines, w = self.__operand(mode, spec)
+            return lines + [f'{mnemonic.lower()}({w})']
+        if mnemonic == 'STRO':
+            return self.__address(mode, spec) + ['stro(t)']
+        if mnemonic in ('ADDSP', 'SUBSP'):
+            lines, w = self.__operand(mode, spec)
+            sign = '+' if mnemonic == 'ADDSP' else '-'
+            return lines + [f'sp = (sp {sign} {w}) & 65535', 'if sp < low: low = sp']
+        r, operation = mnemonic[-1].lower(), mnemonic[:-1]
+        if operation == 'STW':
+            lines, address = self.__location(mode, spec)
+            return lines + [f'm[{address}] = {r} >> 8', f'm[{self.__next(address)}] = {r} & 255']
+        if operation == 'STB':
+            return self.__address(mode, spec) + [f'wbyte(t, {r} & 255)']
+        if operation == 'LDW':
+            lines, w = self.__operand(mode, spec)
+            return lines + [f'{r} = {w}'] + self.__nz(r, live)
+        if operation == 'LDB':
+            lines, w = self.__byte_operand(mode, spec)
+            return lines + [f'{r} = {r} & 65280 | {w}'] + self.__only(live, n='n = 0', z=f'z = not {r} & 255')
+        if operation in ('ADD', 'SUB', 'CPW'):
+            return self.__addition(operation, r, mode, spec, live)
+        if operation == 'CPB':
+            lines, w = self.__byte_operand(mode, spec)
+            return lines + [f'r = ({r} & 255) - {w} & 255'] + self.__only(live, n='n = r >> 7', z='z = r == 0') \
+                + (['v = c = 0'] if live & {'v', 'c'} else [])
+        if operation in ('AND', 'OR'):
+            lines, w = self.__operand(mode, spec)
+            symbol = '&' if operation == 'AND' else '|'
+            return lines + [f'{r} {symbol}= {w}'] + self.__nz(r, live)
+        return [f'raise EmulatorError("{mnemonic} is not supported")']
+
+    def __addition(self, operation, r, mode, spec, live):
+        """Lines of ADD, SUB (r + ~operand + 1) and CPW, the carry and overflow only computed when read"""
+        overflow = 'v' in live or (operation == 'CPW' and 'n' in live) # the comparison is correct even on overflow
+        if operation == 'CPW' and not live:
+            return []
+        lines, w = self.__operand(mode, spec)
+        if 'c' not in live and not overflow:
+            sign = '+' if operation == 'ADD' else '-'
+            lines.append(f'{"r" if operation == "CPW" else r} = ({r} {sign} {w}) & 65535')
+        else:
+            if operation != 'ADD' and w.isdigit():
+                w = str(int(w) ^ 65535)
+            elif operation != 'ADD':
+                lines.append(f'w = {w} ^ 65535')
+                w = 'w'
+            elif not w.isdigit():
+                lines.append(f'w = {w}')
+                w = 'w'
+            if operation == 'ADD':
+                lines.append(f'r = {r} + {w}')
+            else:
+                lines.append(f'r = {r} + {int(w) + 1}' if w.isdigit() else f'r = {r} + w + 1')
+            lines += self.__only(live, c='c = r >> 16') + ['r &= 65535']
+            if overflow:
+                lines.append(f'v = (({r} ^ r) & ({w} ^ r)) >> 15')
+            if operation != 'CPW':
+                lines.append(f'{r} = r')
+        if operation == 'CPW':
+            return lines + self.__only(live, n='n = r >> 15 ^ v', z='z = r == 0')
+        return lines + self.__nz(r, live)
+
+    def __nz(self, r, live):
+        return self.__only(live, n=f'n = {r} >> 15', z=f'z = {r} == 0')
+
+    def __only(self, live, **lines):
+        """The lines assigning the status bits in live"""
+        return [line for bit, line in lines.items() if bit in live]
+
+    def __address(self, mode, spec):
+        """Lines leaving the address designated by the operand in t"""
+        pointer = 'm[u] << 8 | m[u + 1 & 65535]'
+        return {
+            'd': [f't = {spec}'],
+            'n': [f'u = {spec}', f't = {pointer}'],
+            's': [f't = (sp + {spec}) & 65535'],
+            'sf': [f'u = (sp + {spec}) & 65535', f't = {pointer}'],
+            'x': [f't = ({spec} + x) & 65535'],
+            'sx': [f't = (sp + {spec} + x) & 65535'],
+            'sfx': [f'u = (sp + {spec}) & 65535', f't = ({pointer}) + x & 65535'],
+        }.get(mode, [f'raise EmulatorError("Addressing mode {mode} does not designate memory")'])
+
+    def __location(self, mode, spec):
+        """Lines computing the address designated by the operand and its expression, a constant or a register"""
+        if mode == 'd':
+            return [], str(spec)
+        if mode in ('s', 'x') and spec == 0:
+            return [], 'sp' if mode == 's' else 'x'
+        return self.__address(mode, spec), 't'
+
+    def __next(self, address):
+        """Expression of the address following address"""
+        return str((int(address) + 1) & 0xFFFF) if address.isdigit() else f'{address} + 1 & 65535'
+
+    def __operand(self, mode, spec):
+        """Lines computing the word operand and its expression"""
+        if mode == 'i':
+            return [], str(spec)
+        lines, address = self.__location(mode, spec)
+        return lines, f'(m[{address}] << 8 | m[{self.__next(address)}])'
+
+    def __byte_operand(self, mode, spec):
+        """Lines computing the byte operand and its expression"""
+        if mode == 'i':
+            return [], str(spec & 0xFF)
+        if mode == 'd' and spec != CHAR_IN:
+            return [], f'm[{spec}]'
+        return self.__address(mode, spec), 'rbyte(t)'
+
+    def __traffic(self, mnemonic, mode):
+        """Bytes read and written by an instruction besides its fetch, as counted by the reference Emulator"""
+        if mode is None:
+            return (2, 0) if mnemonic == 'RET' else (0, 0)
+        if mnemonic in CONDITIONS:
+            return (2 if mode == 'x' else 0, 2 if mnemonic == 'CALL' else 0)
+        if mnemonic == 'NOP':
+            return (0, 0)
+        pointer = 2 if mode in INDIRECT else 0
+        if mnemonic == 'DECI':
+            return (pointer, 2)
+        if mnemonic == 'STRO':
+            return (pointer, 0) # the string is counted while printing it
+        if mnemonic[:-1] == 'STW':
+            return (pointer, 2)
+        if mnemonic[:-1] == 'STB':
+            return (pointer, 1)
+        if mnemonic[:-1] in ('LDB', 'CPB'):
+            return (0, 0) if mode == 'i' else (pointer + 1, 0)
+        return (0, 0) if mode == 'i' else (pointer + 2, 0)
+
+    ####
+    ## Operating system traps and memory mapped input/output
+    ####
+
+    def __deco(self, value):
+        value = self.signed(value)
+        self.output.append(value)
+        self.text.append(str(value))
+
+    def __hexo(self, value):
+        self.text.append(f'{value:04X}')
+
+    def __stro(self, address):
+        while self.read_byte(address) != 0:
+            self.text.append(chr(self.read_byte(address)))
+            address += 1
+
+    def __read_byte(self, address):
+        if address == CHAR_IN:
+            raise EmulatorError('Character input is not supported')
+        return self.memory[address]
+
+    def __write_byte(self, address, value):
+        if address == CHAR_OUT:
+            self.text.append(chr(value))
+        self.memory[address] = value
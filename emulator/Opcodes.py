@@ -0,0 +1,40 @@
+"""PEP/9 instruction specifiers"""
+
+# one byte instructions, no operand
+UNARY = {
+    'STOP': 0x00, 'RET': 0x01, 'RETTR': 0x02, 'MOVSPA': 0x03, 'MOVFLGA': 0x04, 'MOVAFLG': 0x05,
+    'NOTA': 0x06, 'NOTX': 0x07, 'NEGA': 0x08, 'NEGX': 0x09, 'ASLA': 0x0A, 'ASLX': 0x0B,
+    'ASRA': 0x0C, 'ASRX': 0x0D, 'ROLA': 0x0E, 'ROLX': 0x0F, 'RORA': 0x10, 'RORX': 0x11,
+    'NOP0': 0x26, 'NOP1': 0x27,
+}
+
+# branches use a one bit addressing mode field: immediate or indexed
+BRANCH = {
+    'BR': 0x12, 'BRLE': 0x14, 'BRLT': 0x16, 'BREQ': 0x18, 'BRNE': 0x1A, 'BRGE': 0x1C,
+    'BRGT': 0x1E, 'BRV': 0x20, 'BRC': 0x22, 'CALL': 0x24,
+}
+BRANCH_MODES = {'i': 0, 'x': 1}
+
+# every other instruction uses a three bits addressing mode field
+GENERAL = {
+    'NOP': 0x28, 'DECI': 0x30, 'DECO': 0x38, 'HEXO': 0x40, 'STRO': 0x48, 'ADDSP': 0x50,
+    'SUBSP': 0x58, 'ADDA': 0x60, 'ADDX': 0x68, 'SUBA': 0x70, 'SUBX': 0x78, 'ANDA': 0x80,
+    'ANDX': 0x88, 'ORA': 0x90, 'ORX': 0x98, 'CPWA': 0xA0, 'CPWX': 0xA8, 'CPBA': 0xB0,
+    'CPBX': 0xB8, 'LDWA': 0xC0, 'LDWX': 0xC8, 'LDBA': 0xD0, 'LDBX': 0xD8, 'STWA': 0xE0,
+    'STWX': 0xE8, 'STBA': 0xF0, 'STBX': 0xF8,
+}
+MODES = {'i': 0, 'd': 1, 'n': 2, 's': 3, 'sf': 4, 'x': 5, 'sx': 6, 'sfx': 7}
+
+
+def decoding_table():
+    """Instruction specifier byte -> (mnemonic, addressing mode or None for unary instructions)"""
+    table = [None] * 256
+    for mnemonic, opcode in UNARY.items():
+        table[opcode] = (mnemonic, None)
+    for mnemonic, opcode in BRANCH.items():
+        for mode, bits in BRANCH_MODES.items():
+            table[opcode | bits] = (mnemonic, mode)
+    for mnemonic, opcode in GENERAL.items():
+        for mode, bits in MODES.items():
+            table[opcode | bits] = (mnemonic, mode)
+    return table
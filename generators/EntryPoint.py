@@ -1,15 +1,30 @@
 class EntryPoint():
 
-    def __init__(self, instructions) -> None:
+    def __init__(self, instructions, header=None, comments=(), source_comments=False) -> None:
         self.__instructions = instructions
+        self.__header = header
+        self.__comments = list(comments)
+        self.__source_comments = source_comments # a '; line N' comment where the Python line changes
 
-    def generate(self, func_def=False):
-        if func_def:
-            print('; Function instructions')
+    def generate(self, lines, func_def=False):
+        lines += self.__comments
+        if self.__header is not None:
+            lines.append(self.__header)
+        elif func_def:
+            lines.append('; Function instructions')
         else:
-            print('; Top Level instructions')
-        for label, instr in self.__instructions:
-            s = f'\t\t{instr}' if label == None else f'{str(label+":"):<9}\t{instr}'
-            print(s)
+            lines.append('; Top Level instructions')
+        line = None
+        for instruction in self.__instructions:
+            if self.__source_comments and instruction.source is not None and instruction.source[0] != line:
+                line = instruction.source[0]
+                lines.append(f'; line {line}')
+            lines.append(EntryPoint.format(instruction))
 
-    
\ No newline at end of file
+    def finalize(self):
+        return self.__instructions
+
+    @staticmethod
+    def format(instruction):
+        label, instr = instruction.label, instruction.text()
+        return f'\t\t{instr}' if label == None else f'{str(label+":"):<9}\t{instr}'
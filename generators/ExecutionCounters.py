@@ -0,0 +1,54 @@
+from generators.EntryPoint import EntryPoint
+from ir.Instruction import Instruction
+
+class ExecutionCounters():
+    """
+        Counters of an instrumented program (--instrument): the visitors
+        register one word per statement, loop header, if or else branch and
+        function entry, and increment it each time it is executed. After a
+        run, the words give how many times every source line was executed.
+        Counters are 16 bits words and wrap around after 65535 executions.
+    """
+
+    def __init__(self) -> None:
+        self.counters = list() # {'label', 'kind', 'line', 'function', and 'count' once collected}
+
+    def add(self, kind, node, function=None):
+        """New counter of node, returns the label of its word"""
+        label = f'cnt_{len(self.counters)}'
+        self.counters.append({'label': label, 'kind': kind, 'line': getattr(node, 'lineno', None),
+                              'function': function})
+        return label
+
+    def labels(self):
+        return [counter['label'] for counter in self.counters]
+
+    def generate(self, lines):
+        lines.append('; Execution counters')
+        for instruction in self.finalize():
+            lines.append(EntryPoint.format(instruction))
+
+    def finalize(self):
+        return [Instruction('.WORD', '0', label=counter['label']) for counter in self.counters]
+
+    ####
+    ## After a run
+    ####
+
+    def collect(self, memory, symbols):
+        """Reads the counters from the memory of a finished run, symbols maps labels to addresses"""
+        for counter in self.counters:
+            address = symbols[counter['label']]
+            counter['count'] = (memory[address] << 8) | memory[address + 1]
+
+    def lines(self):
+        """Executions of every source line, the most executed statement of the line counts"""
+        results = dict()
+        for counter in self.counters:
+            if counter['kind'] == 'statement' and 'count' in counter and counter['line'] is not None:
+                results[counter['line']] = max(results.get(counter['line'], 0), counter['count'])
+        return dict(sorted(results.items()))
+
+    def map(self, input_file=None):
+        """JSON compatible map from the counters back to the source"""
+        return {'file': input_file, 'counters': self.counters, 'lines': self.lines()}
@@ -0,0 +1,198 @@
+import ast
+from generators.EntryPoint import EntryPoint
+from ir.Instruction import Instruction
+
+# scratch words shared by the routines, operands are passed in rt_a and rt_b and the result comes back in A
+SCRATCH = ('rt_a', 'rt_b', 'rt_r', 'rt_q', 'rt_s', 'rt_n')
+
+# rt_a * rt_b, shift and add over the bits of rt_b: at most 16 iterations
+MULTIPLY = [
+    ('rt_mul', 'LDWA 0,i'),
+    (None, 'STWA rt_r,d'),
+    ('rt_mul1', 'LDWA rt_b,d'),      # while b != 0
+    (None, 'BREQ rt_mul3'),
+    (None, 'ANDA 1,i'),              # lowest bit of b set: r += a
+    (None, 'BREQ rt_mul2'),
+    (None, 'LDWA rt_r,d'),
+    (None, 'ADDA rt_a,d'),
+    (None, 'STWA rt_r,d'),
+    ('rt_mul2', 'LDWA rt_a,d'),      # a <<= 1
+    (None, 'ASLA'),
+    (None, 'STWA rt_a,d'),
+    (None, 'LDWA rt_b,d'),           # b >>= 1, clearing the sign bit so negative values end too
+    (None, 'ASRA'),
+    (None, 'ANDA 0x7FFF,i'),
+    (None, 'STWA rt_b,d'),
+    (None, 'BR rt_mul1'),
+    ('rt_mul3', 'LDWA rt_r,d'),
+    (None, 'RET'),
+]
+
+# rt_a // rt_b in A and rt_a % rt_b in rt_r, rounded towards minus infinity like Python
+DIVIDE = [
+    ('rt_div', 'LDWA 0,i'),          # rt_s: bit 0 dividend negative, bit 1 divisor negative
+    (None, 'STWA rt_s,d'),
+    (None, 'LDWA rt_a,d'),
+    (None, 'BRGE rt_div1'),
+    (None, 'NEGA'),
+    (None, 'STWA rt_a,d'),
+    (None, 'LDWA 1,i'),
+    (None, 'STWA rt_s,d'),
+    ('rt_div1', 'LDWA rt_b,d'),
+    (None, 'BRGE rt_div2'),
+    (None, 'NEGA'),
+    (None, 'STWA rt_b,d'),
+    (None, 'LDWA rt_s,d'),
+    (None, 'ORA 2,i'),
+    (None, 'STWA rt_s,d'),
+    ('rt_div2', 'LDWA 0,i'),         # unsigned long division of the magnitudes, one bit per iteration
+    (None, 'STWA rt_r,d'),
+    (None, 'STWA rt_q,d'),
+    (None, 'LDWA 16,i'),
+    (None, 'STWA rt_n,d'),
+    ('rt_div3', 'LDWA rt_a,d'),      # next dividend bit into the remainder
+    (None, 'ASLA'),
+    (None, 'STWA rt_a,d'),
+    (None, 'LDWA rt_r,d'),
+    (None, 'ROLA'),
+    (None, 'STWA rt_r,d'),
+    (None, 'SUBA rt_b,d'),           # carry set when the divisor fits in the remainder
+    (None, 'BRC rt_div4'),
+    (None, 'BR rt_div5'),
+    ('rt_div4', 'STWA rt_r,d'),
+    ('rt_div5', 'LDWA rt_q,d'),      # the carry is the next quotient bit
+    (None, 'ROLA'),
+    (None, 'STWA rt_q,d'),
+    (None, 'LDWA rt_n,d'),
+    (None, 'SUBA 1,i'),
+    (None, 'STWA rt_n,d'),
+    (None, 'BRNE rt_div3'),
+    (None, 'LDWA rt_s,d'),           # the remainder has the sign of the dividend
+    (None, 'ANDA 1,i'),
+    (None, 'BREQ rt_div6'),
+    (None, 'LDWA rt_r,d'),
+    (None, 'NEGA'),
+    (None, 'STWA rt_r,d'),
+    ('rt_div6', 'LDWA rt_s,d'),      # operands of the same sign: the truncated result is the floor
+    (None, 'CPWA 1,i'),
+    (None, 'BREQ rt_div7'),
+    (None, 'CPWA 2,i'),
+    (None, 'BREQ rt_div7'),
+    (None, 'LDWA rt_q,d'),
+    (None, 'RET'),
+    ('rt_div7', 'LDWA rt_q,d'),      # opposite signs: negative quotient
+    (None, 'NEGA'),
+    (None, 'STWA rt_q,d'),
+    (None, 'LDWA rt_r,d'),
+    (None, 'BREQ rt_div9'),
+    (None, 'LDWA rt_q,d'),           # inexact: q -= 1 and the remainder takes the sign of the divisor
+    (None, 'SUBA 1,i'),
+    (None, 'STWA rt_q,d'),
+    (None, 'LDWA rt_s,d'),
+    (None, 'CPWA 1,i'),
+    (None, 'BREQ rt_div8'),
+    (None, 'LDWA rt_r,d'),
+    (None, 'SUBA rt_b,d'),
+    (None, 'STWA rt_r,d'),
+    (None, 'BR rt_div9'),
+    ('rt_div8', 'LDWA rt_r,d'),
+    (None, 'ADDA rt_b,d'),
+    (None, 'STWA rt_r,d'),
+    ('rt_div9', 'LDWA rt_q,d'),
+    (None, 'RET'),
+]
+
+def shift(name, instruction):
+    # rt_a shifted rt_b times
+    return [
+        (name, f'LDWA rt_b,d'),
+        (None, f'BRLE {name}2'),
+        (f'{name}1', 'LDWA rt_a,d'),
+        (None, instruction),
+        (None, 'STWA rt_a,d'),
+        (None, 'LDWA rt_b,d'),
+        (None, 'SUBA 1,i'),
+        (None, 'STWA rt_b,d'),
+        (None, f'BRGT {name}1'),
+        (f'{name}2', 'LDWA rt_a,d'),
+        (None, 'RET'),
+    ]
+
+ROUTINES = {
+    'rt_mul': MULTIPLY,
+    'rt_div': DIVIDE,
+    'rt_shl': shift('rt_shl', 'ASLA'),
+    'rt_shr': shift('rt_shr', 'ASRA'),
+}
+
+
+class RuntimeRoutines():
+    """
+        Lowering of the operators PEP/9 has no instruction for. Operations
+        by a constant become inline shift/add sequences, the others call a
+        routine emitted once per program, only when some code needs it.
+    """
+
+    def __init__(self) -> None:
+        self.required = list()
+
+    def arithmetic(self, op, left, right, left_value=None, right_value=None):
+        """Instructions computing left op right in A, operands are formatted ('x,d', '3,i', ...)"""
+        if isinstance(op, ast.Add):
+            return [f'LDWA {left}', f'ADDA {right}']
+        if isinstance(op, ast.Sub):
+            return [f'LDWA {left}', f'SUBA {right}']
+        if isinstance(op, ast.Mult):
+            if right_value is None and left_value is not None:
+                left, right, left_value, right_value = right, left, right_value, left_value
+            if right_value is not None:
+                return self.__multiply(left, right_value)
+            return self.__call('rt_mul', left, right)
+        if isinstance(op, (ast.FloorDiv, ast.Mod)):
+            if self.__power_of_two(right_value):
+                if isinstance(op, ast.FloorDiv):
+                    return [f'LDWA {left}'] + ['ASRA'] * (right_value.bit_length() - 1)
+                return [f'LDWA {left}', f'ANDA {right_value - 1},i']
+            instructions = self.__call('rt_div', left, right)
+            if isinstance(op, ast.Mod):
+                instructions.append('LDWA rt_r,d')
+            return instructions
+        if isinstance(op, (ast.LShift, ast.RShift)):
+            instruction = 'ASLA' if isinstance(op, ast.LShift) else 'ASRA'
+            if right_value is not None and right_value >= 0:
+                return [f'LDWA {left}'] + [instruction] * min(right_value, 16)
+            return self.__call('rt_shl' if isinstance(op, ast.LShift) else 'rt_shr', left, right)
+        raise ValueError(f'Unsupported binary operator: {op}')
+
+    def generate(self, lines):
+        lines.append('; Runtime routines')
+        for instruction in self.finalize():
+            lines.append(EntryPoint.format(instruction))
+
+    def finalize(self):
+        instructions = [Instruction('.BLOCK', '2', label=name) for name in SCRATCH]
+        for name in self.required:
+            instructions += [Instruction.parse(instr, label) for label, instr in ROUTINES[name]]
+        return instructions
+
+    def __call(self, routine, left, right):
+        if routine not in self.required:
+            self.required.append(routine)
+        return [f'LDWA {left}', 'STWA rt_a,d', f'LDWA {right}', 'STWA rt_b,d', f'CALL {routine}']
+
+    def __multiply(self, left, value):
+        # Horner's scheme over the bits of the constant: one ASLA per bit, one ADDA per bit set
+        magnitude = abs(value)
+        if magnitude == 0:
+            return ['LDWA 0,i']
+        instructions = [f'LDWA {left}']
+        for bit in bin(magnitude)[3:]:
+            instructions.append('ASLA')
+            if bit == '1':
+                instructions.append(f'ADDA {left}')
+        if value < 0:
+            instructions.append('NEGA')
+        return instructions
+
+    def __power_of_two(self, value):
+        return value is not None and value > 0 and value & (value - 1) == 0
@@ -1,9 +1,18 @@
+from generators.EntryPoint import EntryPoint
+from ir.Instruction import Instruction
+
 class StackMemoryAllocation():
 
     def __init__(self, local_vars: dict()) -> None:
         self.__local_vars = local_vars
 
-    def generate(self):
-        print('; Allocating local memory to stack')
+    def generate(self, lines):
+        lines.append('; Allocating local memory to stack')
+        for instruction in self.finalize():
+            lines.append(EntryPoint.format(instruction))
+
+    def finalize(self):
+        instructions = list()
         for n, v in self.__local_vars.items():
-            print(f'{str(n+":"):<9}\t.EQUATE ' + str(v[0])) # reserving memory for local variable
+            instructions.append(Instruction('.EQUATE', str(v[0]), label=n)) # reserving memory for local variable
+        return instructions
@@ -1,16 +1,26 @@
+from generators.EntryPoint import EntryPoint
+from ir.Instruction import Instruction
 
 class StaticMemoryAllocation():
 
-    def __init__(self, global_vars: dict()) -> None:
+    def __init__(self, global_vars: dict(), arrays=None) -> None:
         self.__global_vars = global_vars
+        self.__arrays = arrays or dict() # array name -> number of cells
 
-    def generate(self):
-        print('; Allocating global memory')
+    def generate(self, lines):
+        lines.append('; Allocating global memory')
+        for instruction in self.finalize():
+            lines.append(EntryPoint.format(instruction))
+
+    def finalize(self):
+        instructions = list()
         for n, v in self.__global_vars.items():
-            if v is None:
-                print(f'{str(n+":"):<9}\t.BLOCK 2') # reserving memory for unknown value
+            if n in self.__arrays:
+                instructions.append(Instruction('.BLOCK', str(self.__arrays[n] * 2), label=n)) # cells of an array
+            elif v is None:
+                instructions.append(Instruction('.BLOCK', '2', label=n)) # reserving memory for unknown value
             elif v is not None and n.isupper() and n[0] == '_':
-                print(f'{str(n+":"):<9}\t.EQUATE ' + str(v)) # reserving memory for constant variable
+                instructions.append(Instruction('.EQUATE', str(v), label=n)) # reserving memory for constant variable
             elif v is not None:
-                print(f'{str(n+":"):<9}\t.WORD ' + str(v)) # reserving memory for known value
-            
\ No newline at end of file
+                instructions.append(Instruction('.WORD', str(v), label=n)) # reserving memory for known value
+        return instructions
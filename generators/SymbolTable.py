@@ -1,7 +1,113 @@
+from generators.RuntimeRoutines import RuntimeRoutines
+
 class SymbolTable():
     def __init__(self):
-        self.variable_name_dict = dict()        
+        self.variable_name_dict = dict()
+        self.global_vars = dict()   # global name -> static value (None when unknown at compile time)
+        self.arrays = dict()        # global array name -> number of cells
+        self.functions = dict()     # function name -> FunctionSymbols, in definition order
+        self.runtime = RuntimeRoutines() # routines needed by the operators without PEP/9 instruction
+        self.label_id = 0           # labels are numbered over the whole program, sections must not collide
+        self.counters = None        # ExecutionCounters of an instrumented program, None otherwise
+        self.profile = None         # ExecutionProfile guiding the optimizations (--pgo-profile), None otherwise
 
     def generate_name(self, variable_id, function_id=0): # function number (main = 0), # variable number
         return 'F' + str(function_id) + 'V' + str(variable_id)
-    
\ No newline at end of file
+
+    def identify(self):
+        result = self.label_id
+        self.label_id += 1
+        return result
+
+    def uses_heap(self):
+        """True when a function allocates an array whose size is only known at run time"""
+        return any(function.heap_symbol() is not None for function in self.functions.values())
+
+    def local_vars(self):
+        """Stack symbols of every function: symbol -> [offset, kind ('l', 'p' or 'r'), function name]"""
+        results = dict()
+        for function in self.functions.values():
+            results.update(function.stack_symbols())
+        return results
+
+    def finalize(self, frame_layout=None):
+        # locals shared by several functions need distinct EQUATE symbols
+        owners = dict()
+        for function in self.functions.values():
+            for name in function.params + function.locals + function.return_slots:
+                owners[name] = owners.get(name, 0) + 1
+        for function in self.functions.values():
+            if frame_layout is not None: # locals with disjoint lifetimes share a slot
+                function.slots = frame_layout.assign(function)
+            function.layout(lambda name: owners[name] > 1)
+
+
+class FunctionSymbols():
+    """Stack frame of a function: locals, return address, parameters then return values"""
+
+    def __init__(self, name, node) -> None:
+        self.name = name
+        self.node = node
+        self.params = [arg.arg for arg in node.args.args]
+        self.locals = list()
+        self.arrays = dict()    # local array name -> number of cells, None when known at run time (heap)
+        self.return_slots = list()
+        self.slots = dict()     # local name -> local whose slot it shares, its own slot when missing
+        self.symbols = dict()   # variable name -> stack symbol
+        self.offsets = dict()   # stack symbol -> [offset, kind]
+
+    def add_local(self, name):
+        if name not in self.params and name not in self.locals:
+            self.locals.append(name)
+
+    def add_array(self, name, size):
+        self.add_local(name)
+        if name in self.arrays and (size is None or self.arrays[name] is None):
+            size = None
+        elif name in self.arrays:
+            size = max(size, self.arrays[name])
+        self.arrays[name] = size
+
+    def add_return(self):
+        # every return statement writes the same slot, the caller reads it once the frame is released
+        if not self.return_slots:
+            self.return_slots.append('RetVal0')
+
+    def local_size(self):
+        size = sum(self.slot_size(name) for name in self.locals if self.slots.get(name, name) == name)
+        return size + 2 if self.heap_symbol() is not None else size
+
+    def slot_size(self, name):
+        # the cells of an array sized at compile time are in the frame, the others in the heap
+        return self.arrays[name] * 2 if self.arrays.get(name) is not None else 2
+
+    def heap_symbol(self):
+        """Slot saving the heap top on entry, None when every array of the function is in its frame"""
+        if None in self.arrays.values():
+            return f'heap_{self.name}'
+        return None
+
+    def layout(self, is_shared):
+        position = 0
+        if self.heap_symbol() is not None:
+            self.offsets[self.heap_symbol()] = [position, 'l']
+            position += 2
+        for kind, names in (('l', self.locals), ('p', self.params), ('r', self.return_slots)):
+            if kind == 'p':
+                position += 2 # return address pushed by CALL
+            for name in names:
+                symbol = name if kind == 'r' else 'm' + name
+                if is_shared(name):
+                    symbol += '_' + self.name
+                self.symbols[name] = symbol
+                if kind == 'l' and self.slots.get(name, name) != name: # placed with the local owning the slot
+                    self.offsets[symbol] = [self.offsets[self.symbols[self.slots[name]]][0], kind]
+                    continue
+                self.offsets[symbol] = [position, kind]
+                position += self.slot_size(name) if kind == 'l' else 2
+
+    def stack_symbols(self):
+        return {symbol: [offset, kind, self.name] for symbol, (offset, kind) in self.offsets.items()}
+
+    def return_symbol(self):
+        return self.symbols[self.return_slots[0]]
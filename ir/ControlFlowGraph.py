@@ -0,0 +1,67 @@
+from optimizers.InstructionSet import BRANCHES, UNCONDITIONAL
+
+class BasicBlock():
+    """Straight-line run of instructions, entered at its first one and left at its last one"""
+
+    __slots__ = ('index', 'start', 'instructions', 'successors', 'predecessors')
+
+    def __init__(self, index, start, instructions) -> None:
+        self.index = index
+        self.start = start              # position of the first instruction in the section
+        self.instructions = instructions
+        self.successors = list()
+        self.predecessors = list()
+
+    @property
+    def label(self):
+        return self.instructions[0].label
+
+
+class ControlFlowGraph():
+    """
+        Basic blocks of one function (or of the top level) and the edges
+        between them. A block starts at every label and after every branch;
+        branches leaving the function (tail calls) have no edge.
+    """
+
+    def __init__(self, instructions) -> None:
+        self.blocks = list()
+        self.labels = dict()    # label -> block
+        leaders = {0} if instructions else set()
+        for i, instruction in enumerate(instructions):
+            if instruction.label is not None:
+                leaders.add(i)
+            if instruction.opcode in BRANCHES or instruction.opcode in UNCONDITIONAL:
+                leaders.add(i + 1)
+        starts = sorted(i for i in leaders if i < len(instructions))
+        for index, (start, end) in enumerate(zip(starts, starts[1:] + [len(instructions)])):
+            block = BasicBlock(index, start, instructions[start:end])
+            self.blocks.append(block)
+            if block.label is not None:
+                self.labels[block.label] = block
+
+        for block in self.blocks:
+            last = block.instructions[-1]
+            following = self.blocks[block.index + 1] if block.index + 1 < len(self.blocks) else None
+            targets = list()
+            if last.opcode in BRANCHES and last.operand in self.labels:
+                targets.append(self.labels[last.operand])
+            if last.opcode not in UNCONDITIONAL and last.opcode != '.END' and following is not None:
+                targets.append(following)
+            for target in targets:
+                if target not in block.successors:
+                    block.successors.append(target)
+                    target.predecessors.append(block)
+
+    def instructions(self):
+        return [instruction for block in self.blocks for instruction in block.instructions]
+
+    @staticmethod
+    def functions(instructions, entries):
+        """Splits a section at the entry labels (functions), each part gets its own graph"""
+        parts = list()
+        for instruction in instructions:
+            if not parts or instruction.label in entries:
+                parts.append(list())
+            parts[-1].append(instruction)
+        return parts
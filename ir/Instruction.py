@@ -0,0 +1,66 @@
+from optimizers.InstructionSet import UNARY
+
+class Instruction():
+    """
+        One PEP/9 instruction or directive of the intermediate representation:
+        LDWA x,d is Instruction('LDWA', 'x', 'd'), BR tl is Instruction('BR',
+        'tl') and .WORD 5 is Instruction('.WORD', '5'). Passes treat them as
+        values and build new ones instead of modifying them.
+
+        source is the (line, column) of the Python code the instruction was
+        generated for, None when unknown (allocations, instructions added by
+        a pass). It is not part of the value: equal instructions may come
+        from different lines.
+    """
+
+    __slots__ = ('opcode', 'operand', 'mode', 'label', 'source')
+
+    def __init__(self, opcode, operand=None, mode=None, label=None, source=None) -> None:
+        self.opcode = opcode
+        self.operand = operand
+        self.mode = mode
+        self.label = label
+        self.source = source
+
+    @classmethod
+    def parse(cls, text, label=None, source=None):
+        """Instruction from its assembly text, e.g. 'LDWA x,d'"""
+        parts = text.split(None, 1)
+        opcode = parts[0]
+        operand, mode = (parts[1].strip() if len(parts) > 1 else None), None
+        if operand is not None and not opcode.startswith('.') and ',' in operand:
+            operand, mode = (part.strip() for part in operand.rsplit(',', 1))
+        return cls(opcode, operand, mode, label, source)
+
+    @property
+    def argument(self):
+        """Operand as written in the assembly, 'x,d'"""
+        if self.mode is None:
+            return self.operand
+        return f'{self.operand},{self.mode}'
+
+    @property
+    def is_directive(self):
+        return self.opcode.startswith('.')
+
+    @property
+    def size(self):
+        """Size in bytes of the assembled instruction, directives are not counted"""
+        if self.is_directive:
+            return 0
+        return 1 if self.opcode in UNARY else 3
+
+    def text(self):
+        return self.opcode if self.operand is None else f'{self.opcode} {self.argument}'
+
+    def with_label(self, label):
+        return Instruction(self.opcode, self.operand, self.mode, label, self.source)
+
+    def __eq__(self, other):
+        return isinstance(other, Instruction) and self.opcode == other.opcode and self.operand == other.operand \
+            and self.mode == other.mode and self.label == other.label
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f'Instruction({self.text()!r}, label={self.label!r})'
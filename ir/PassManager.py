@@ -0,0 +1,31 @@
+import time
+
+class PassManager():
+    """
+        Runs optimization passes in order over one representation of the
+        program (the AST or the instructions of a section). Every pass has
+        optimize(subject) returning the new subject and report() describing
+        what it did, an optimizer added several times reports once. The time
+        spent in each pass and its number of runs are added up by name in
+        timings, which may be shared by several managers.
+    """
+
+    def __init__(self, timings=None) -> None:
+        self.passes = list()
+        self.reports = list()
+        self.timings = timings if timings is not None else dict()
+
+    def add(self, name, optimizer):
+        self.passes.append((name, optimizer))
+        return self
+
+    def run(self, subject):
+        for name, optimizer in self.passes:
+            start = time.perf_counter()
+            subject = optimizer.optimize(subject)
+            timing = self.timings.setdefault(name, {'seconds': 0.0, 'calls': 0})
+            timing['seconds'] += time.perf_counter() - start
+            timing['calls'] += 1
+        for optimizer in dict.fromkeys(optimizer for _, optimizer in self.passes):
+            self.reports.append(optimizer.report())
+        return subject
@@ -0,0 +1,63 @@
+import bisect
+
+class SourceMap():
+    """
+        Line table of an assembled program: rows [address, line, column]
+        giving the Python location of the bytes from address up to the next
+        row. Instructions without location (added by an optimization pass)
+        belong to the row before them in their section; sections without
+        any (allocations, runtime routines) get rows with a None line.
+    """
+
+    def __init__(self) -> None:
+        self.rows = list()
+        self.__starts = None # address of every row, for the lookups
+
+    def locate(self, sections, addresses):
+        """Fills the rows from the instructions of every section and the address of each instruction"""
+        self.rows = list()
+        self.__starts = None
+        addresses = iter(addresses)
+        for instructions in sections:
+            source = None
+            for index, (instruction, address) in enumerate(zip(instructions, addresses)):
+                if instruction.opcode == '.END':
+                    return self
+                if index == 0 or (instruction.source is not None and instruction.source != source):
+                    source = instruction.source
+                    self.__add(address, source)
+        return self
+
+    def find(self, address):
+        """(line, column) of the code at address, None when it has no location"""
+        i = bisect.bisect_right(self.__row_starts(), address) - 1
+        if i < 0 or self.rows[i][1] is None:
+            return None
+        return self.rows[i][1], self.rows[i][2]
+
+    def lines(self, executions):
+        """Executed instructions of every source line, executions maps addresses to counts"""
+        starts = self.__row_starts()
+        results = dict()
+        for address, count in executions.items():
+            i = bisect.bisect_right(starts, address) - 1
+            line = self.rows[i][1] if i >= 0 else None
+            if line is not None:
+                results[line] = results.get(line, 0) + count
+        return dict(sorted(results.items()))
+
+    def map(self, input_file=None):
+        return {'file': input_file, 'columns': ['address', 'line', 'column'], 'rows': self.rows}
+
+    def __row_starts(self):
+        if self.__starts is None:
+            self.__starts = [row[0] for row in self.rows]
+        return self.__starts
+
+    def __add(self, address, source):
+        line, column = source if source is not None else (None, None)
+        if self.rows and self.rows[-1][0] == address:
+            self.rows.pop() # an empty section or a directive, the next code starts at the same address
+        if self.rows and self.rows[-1][1:] == [line, column]:
+            return
+        self.rows.append([address, line, column])
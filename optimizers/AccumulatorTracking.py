@@ -0,0 +1,131 @@
+from optimizers.InstructionSet import BRANCHES, flags_dead_after
+from ir.ControlFlowGraph import ControlFlowGraph
+from ir.Instruction import Instruction
+
+MEMORY_MODES = ('d', 's')   # operands naming one fixed memory word
+REGISTER_NEUTRAL = {'CPWA', 'CPWX', 'CPBA', 'CPBX', 'DECO', 'HEXO', 'STRO', 'NOP0', 'NOP1', 'NOP'} | BRANCHES
+
+class AccumulatorTracking():
+    """
+        Forward dataflow analysis of what the registers hold. The content of
+        A and X is described by the set of operands known to be equal to it
+        ('x,d', 'mresult,s', '5,i'); at a label the sets coming from every
+        predecessor are intersected. A LDWA/LDWX reloading a value the
+        register already holds is removed when its status bits are dead.
+        The analysis runs on the control flow graph of every function, whose
+        entry (a label of entries) can be reached from other sections:
+        nothing is known there.
+    """
+
+    def __init__(self, entries=()) -> None:
+        self.__entries = set(entries)
+        self.removed_loads = 0
+
+    def optimize(self, instructions):
+        results = list()
+        for function in ControlFlowGraph.functions(list(instructions), self.__entries):
+            results += self.__optimize_function(function)
+        return results
+
+    def report(self):
+        return f'; Accumulator tracking removed {self.removed_loads} redundant loads'
+
+    def __optimize_function(self, instructions):
+        graph = ControlFlowGraph(instructions)
+        states = self.__analyze(graph)
+        results = list()
+        pending_label = None
+        for block in graph.blocks:
+            state = states[block.index]
+            for i, instruction in enumerate(block.instructions, block.start):
+                if pending_label is not None:
+                    if instruction.label is None and not instruction.is_directive:
+                        instruction, pending_label = instruction.with_label(pending_label), None
+                    else:
+                        results.append(Instruction('NOP1', label=pending_label)) # keeping the label somewhere
+                        pending_label = None
+                redundant = self.__redundant(state, instruction) and flags_dead_after(instructions, i)
+                if state is not None:
+                    state = self.__transfer(state, instruction)
+                if redundant:
+                    self.removed_loads += 1
+                    pending_label = instruction.label
+                    continue
+                results.append(instruction)
+        if pending_label is not None:
+            results.append(Instruction('NOP1', label=pending_label))
+        return results
+
+    ####
+    ## Dataflow analysis
+    ####
+
+    def __analyze(self, graph):
+        """Register contents on entry of every block, None when unreachable"""
+        states = [None] * len(graph.blocks)
+        if not graph.blocks:
+            return states
+        states[0] = (frozenset(), frozenset())
+        worklist = [0]
+        while worklist:
+            block = graph.blocks[worklist.pop()]
+            state = states[block.index]
+            for instruction in block.instructions:
+                state = self.__transfer(state, instruction)
+            for successor in block.successors:
+                if successor.label in self.__entries:
+                    continue # stays unknown
+                previous = states[successor.index]
+                merged = state if previous is None else (previous[0] & state[0], previous[1] & state[1])
+                if merged != previous:
+                    states[successor.index] = merged
+                    worklist.append(successor.index)
+        return states
+
+    def __transfer(self, state, instruction):
+        a, x = state
+        if instruction.is_directive:
+            return state
+        mnemonic, operand, mode = instruction.opcode, instruction.argument, instruction.mode
+        if mnemonic in REGISTER_NEUTRAL:
+            return state
+        if mnemonic in ('LDWA', 'LDWX'):
+            value = frozenset([operand]) if mode in MEMORY_MODES + ('i',) else frozenset()
+            return (value, x) if mnemonic == 'LDWA' else (a, value)
+        if mnemonic in ('STWA', 'STWX', 'DECI', 'STBA', 'STBX'):
+            a, x = self.__kill(a, operand, mode), self.__kill(x, operand, mode)
+            if mnemonic == 'STWA' and mode in MEMORY_MODES:
+                a = a | {operand}
+            elif mnemonic == 'STWX' and mode in MEMORY_MODES:
+                x = x | {operand}
+            return (a, x)
+        if mnemonic in ('ADDSP', 'SUBSP'):
+            # stack relative operands now designate other words
+            return (self.__kill_stack(a), self.__kill_stack(x))
+        if mnemonic[-1] == 'A' and mnemonic not in ('CALL', 'MOVFLGA', 'MOVSPA'):
+            return (frozenset(), x)
+        if mnemonic[-1] == 'X':
+            return (a, frozenset())
+        if mnemonic in ('MOVFLGA', 'MOVSPA'):
+            return (frozenset(), x)
+        return (frozenset(), frozenset()) # CALL and anything unexpected
+
+    def __kill(self, values, operand, mode):
+        if mode == 's':
+            # several stack symbols may share an offset
+            return frozenset(v for v in values if not v.endswith(',s'))
+        if mode == 'd':
+            return frozenset(v for v in values if v != operand)
+        return frozenset(v for v in values if v.endswith(',i')) # indexed or indirect: any word may change
+
+    def __kill_stack(self, values):
+        return frozenset(v for v in values if not v.endswith(',s'))
+
+    def __redundant(self, state, instruction):
+        if state is None:
+            return False
+        if instruction.opcode == 'LDWA':
+            return instruction.argument in state[0]
+        if instruction.opcode == 'LDWX':
+            return instruction.argument in state[1]
+        return False
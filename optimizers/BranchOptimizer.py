@@ -0,0 +1,138 @@
+from optimizers.InstructionSet import BRANCHES, UNCONDITIONAL
+from ir.Instruction import Instruction
+
+# branch taken when the condition of the other one does not hold
+INVERSE = {'BRLT': 'BRGE', 'BRGE': 'BRLT', 'BRLE': 'BRGT', 'BRGT': 'BRLE', 'BREQ': 'BRNE', 'BRNE': 'BREQ'}
+MAX_TEST_SIZE = 3 # instructions of a loop test, its branch excluded
+
+class BranchOptimizer():
+    """
+        Reduces the branches executed by the control flow of the visitors.
+
+        Loop rotation: while loops are emitted as
+
+            test_N: LDWA a / CPWA b / BRGE end_l_N
+                    body
+                    BR test_N
+            end_l_N:
+
+        executing two branches per iteration. The BR test_N closing the loop
+        is replaced by a copy of the test branching back to the body when the
+        condition holds (LDWA a / CPWA b / BRLT loop_N); the test at the top
+        only guards the first iteration.
+
+        Jump threading: a branch to a BR goes to its target directly, and a
+        labeled NOP1 followed by another label gives up its label, so that
+        both designate the same instruction. Labels in entries are reached
+        from other sections and never renamed.
+    """
+
+    def __init__(self, entries=()) -> None:
+        self.__entries = set(entries)
+        self.rotated = 0
+        self.threaded = 0
+
+    def optimize(self, instructions):
+        instructions = self.__merge_labels(list(instructions))
+        instructions = self.__thread_jumps(instructions)
+        return self.__rotate_loops(instructions)
+
+    def report(self):
+        return f'; Branch optimizer rotated {self.rotated} loops and threaded {self.threaded} branches'
+
+    ####
+    ## Jump threading
+    ####
+
+    def __merge_labels(self, instructions):
+        results = list()
+        renamed = dict()
+        for instruction in instructions:
+            previous = results[-1] if results else None
+            if previous is not None and previous.opcode == 'NOP1' and previous.label is not None \
+                    and instruction.label is not None and not instruction.is_directive:
+                if previous.label not in self.__entries:
+                    renamed[previous.label] = instruction.label # keeping the label of the test (test_N)
+                    results[-1] = instruction
+                    continue
+                if instruction.label not in self.__entries:
+                    renamed[instruction.label] = previous.label
+                    results[-1] = instruction.with_label(previous.label)
+                    continue
+            results.append(instruction)
+        return [self.__retarget(instruction, self.__follow(renamed, instruction.operand))
+                if instruction.opcode in BRANCHES else instruction for instruction in results]
+
+    def __thread_jumps(self, instructions):
+        jumps = {i.label: i.operand for i in instructions if i.label is not None and i.opcode == 'BR'}
+        results = list()
+        for instruction in instructions:
+            if instruction.opcode in BRANCHES:
+                target = self.__follow(jumps, instruction.operand)
+                if target != instruction.operand:
+                    self.threaded += 1
+                    instruction = self.__retarget(instruction, target)
+            results.append(instruction)
+        return results
+
+    def __follow(self, jumps, label):
+        seen = {label}
+        while label in jumps and jumps[label] not in seen: # a BR to itself is an infinite loop, kept as is
+            label = jumps[label]
+            seen.add(label)
+        return label
+
+    def __retarget(self, instruction, target):
+        if target == instruction.operand:
+            return instruction
+        return Instruction(instruction.opcode, target, instruction.mode, instruction.label, instruction.source)
+
+    ####
+    ## Loop rotation
+    ####
+
+    def __rotate_loops(self, instructions):
+        labels = {instruction.label: i for i, instruction in enumerate(instructions) if instruction.label is not None}
+        replacements = dict() # index of the BR closing a loop -> instructions replacing it
+        new_labels = dict()   # index of the first instruction of a rotated body -> its new label
+        for j, instruction in enumerate(instructions):
+            if instruction.opcode != 'BR' or labels.get(instruction.operand, j) >= j:
+                continue
+            header = labels[instruction.operand]
+            test = self.__test(instructions, header, j)
+            if test is None:
+                continue
+            body = header + len(test)
+            body_label = instructions[body].label or new_labels.get(body) or self.__label(instruction.operand)
+            if instructions[body].label is None:
+                new_labels[body] = body_label
+            copy = [t.with_label(None) for t in test[:-1]] + [Instruction(INVERSE[test[-1].opcode], body_label, source=test[-1].source)]
+            replacements[j] = [copy[0].with_label(instruction.label)] + copy[1:]
+            self.rotated += 1
+
+        results = list()
+        for i, instruction in enumerate(instructions):
+            if i in new_labels:
+                instruction = instruction.with_label(new_labels[i])
+            results += replacements.get(i, [instruction])
+        return results
+
+    def __test(self, instructions, header, back_edge):
+        """The instructions of the loop test starting at header, None when the loop can not be rotated"""
+        for c in range(header, min(header + MAX_TEST_SIZE + 1, back_edge)):
+            instruction = instructions[c]
+            if instruction.is_directive or (c > header and instruction.label is not None):
+                return None
+            if instruction.opcode in INVERSE:
+                # leaving the loop to the instruction following the BR, the body must not be empty
+                following = instructions[back_edge + 1] if back_edge + 1 < len(instructions) else None
+                if following is None or instruction.operand != following.label or c + 1 >= back_edge:
+                    return None
+                return instructions[header:c + 1]
+            if instruction.opcode in BRANCHES or instruction.opcode in UNCONDITIONAL or instruction.opcode == 'CALL':
+                return None
+        return None
+
+    def __label(self, header):
+        prefix, _, number = header.rpartition('_')
+        return f'loop_{number}' if prefix == 'test' else f'{header}_loop'
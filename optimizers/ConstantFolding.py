@@ -0,0 +1,168 @@
+import ast
+
+OPERATIONS = {
+    ast.Add: lambda a, b: a + b,
+    ast.Sub: lambda a, b: a - b,
+    ast.Mult: lambda a, b: a * b,
+    ast.FloorDiv: lambda a, b: a // b,
+    ast.Mod: lambda a, b: a % b,
+    ast.LShift: lambda a, b: a << b,
+    ast.RShift: lambda a, b: a >> b,
+    ast.BitAnd: lambda a, b: a & b,
+    ast.BitOr: lambda a, b: a | b,
+}
+
+COMPARISONS = {
+    ast.Lt: lambda a, b: a < b,
+    ast.LtE: lambda a, b: a <= b,
+    ast.Gt: lambda a, b: a > b,
+    ast.GtE: lambda a, b: a >= b,
+    ast.Eq: lambda a, b: a == b,
+    ast.NotEq: lambda a, b: a != b,
+}
+
+def to_word(value):
+    """Two's complement 16 bits value, as computed by PEP/9"""
+    return ((value + 0x8000) & 0xFFFF) - 0x8000
+
+def is_integer(node):
+    return isinstance(node, ast.Constant) and type(node.value) == int
+
+
+class ConstantFolding(ast.NodeTransformer):
+    """
+        Evaluates constant expressions at compile time and propagates the
+        variables holding a single constant value: EQUATE constants (_UPPER)
+        and variables assigned exactly once in their scope, with a constant.
+        Their uses become immediate operands (,i) in the generated code.
+        An if whose condition is then known keeps only the branch taken, a
+        while whose condition is false from the start disappears.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.folded = 0
+        self.propagated = 0
+        self.pruned = 0
+        self.__constants = dict()
+
+    def optimize(self, root_node):
+        changed = True
+        while changed:
+            before = self.folded + self.propagated + self.pruned
+            global_constants = self.__single_assignments(root_node.body, set())
+            self.__constants = global_constants
+            for contents in root_node.body:
+                if isinstance(contents, ast.FunctionDef):
+                    params = {arg.arg for arg in contents.args.args}
+                    assigned = self.__assigned(contents.body) | params
+                    local_constants = self.__single_assignments(contents.body, params)
+                    self.__constants = {n: v for n, v in global_constants.items() if n not in assigned}
+                    self.__constants.update(local_constants)
+                    contents.body = self.__visit_block(contents.body) or [ast.copy_location(ast.Pass(), contents)]
+                    self.__constants = global_constants
+            root_node.body = self.__visit_block(root_node.body)
+            changed = self.folded + self.propagated + self.pruned != before
+        return root_node
+
+    def report(self):
+        return f'; Constant folding evaluated {self.folded} expressions, propagated {self.propagated} constants ' \
+               f'and pruned {self.pruned} branches'
+
+    ####
+    ## Rewriting
+    ####
+
+    def visit_FunctionDef(self, node):
+        return node # handled with its own scope by optimize()
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Load) and node.id in self.__constants:
+            self.propagated += 1
+            return ast.copy_location(ast.Constant(self.__constants[node.id]), node)
+        return node
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        operation = OPERATIONS.get(type(node.op))
+        if operation is None or not is_integer(node.left) or not is_integer(node.right):
+            return node
+        try:
+            value = to_word(operation(node.left.value, node.right.value))
+        except (ZeroDivisionError, ValueError):
+            return node # left for the program to fail at run time
+        self.folded += 1
+        return ast.copy_location(ast.Constant(value), node)
+
+    def visit_If(self, node):
+        node.test = self.visit(node.test)
+        outcome = self.__outcome(node.test)
+        if outcome is not None:
+            self.pruned += 1
+            return self.__visit_block(node.body if outcome else node.orelse)
+        node.body = self.__visit_block(node.body) or [ast.copy_location(ast.Pass(), node)]
+        node.orelse = self.__visit_block(node.orelse)
+        return node
+
+    def visit_While(self, node):
+        node.test = self.visit(node.test)
+        if self.__outcome(node.test) is False:
+            self.pruned += 1
+            return []
+        node.body = self.__visit_block(node.body) or [ast.copy_location(ast.Pass(), node)]
+        return node
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.USub) and is_integer(node.operand):
+            self.folded += 1
+            return ast.copy_location(ast.Constant(to_word(-node.operand.value)), node)
+        return node
+
+    def __visit_block(self, statements):
+        results = list()
+        for statement in statements:
+            result = self.visit(statement)
+            results += result if isinstance(result, list) else [result]
+        return results
+
+    def __outcome(self, test):
+        """Value of a comparison between two constants, None when only known at run time"""
+        if isinstance(test, ast.Compare) and len(test.ops) == 1 and type(test.ops[0]) in COMPARISONS \
+                and is_integer(test.left) and is_integer(test.comparators[0]):
+            return COMPARISONS[type(test.ops[0])](test.left.value, test.comparators[0].value)
+        return None
+
+    ####
+    ## Finding the constants of a scope
+    ####
+
+    def __single_assignments(self, body, excluded):
+        counts = dict()
+        values = dict()
+        for node in self.__statements(body):
+            for target in self.__targets(node):
+                counts[target] = counts.get(target, 0) + 1
+                if isinstance(node, ast.Assign) and is_integer(node.value):
+                    values[target] = node.value.value
+        return {n: values[n] for n, count in counts.items()
+                if count == 1 and n in values and n not in excluded}
+
+    def __assigned(self, body):
+        return {target for node in self.__statements(body) for target in self.__targets(node)}
+
+    def __statements(self, body):
+        # statements of a scope, without entering nested function definitions
+        for statement in body:
+            if isinstance(statement, ast.FunctionDef):
+                continue
+            yield statement
+            for field in ('body', 'orelse'):
+                yield from self.__statements(getattr(statement, field, []))
+
+    def __targets(self, node):
+        if isinstance(node, ast.Assign):
+            return [t.id for t in node.targets if isinstance(t, ast.Name)]
+        if isinstance(node, ast.AugAssign) and isinstance(node.target, ast.Name):
+            return [node.target.id]
+        return []
@@ -0,0 +1,206 @@
+from optimizers.InstructionSet import BRANCHES, CONDITIONAL_BRANCHES, UNCONDITIONAL
+from ir.ControlFlowGraph import ControlFlowGraph
+from ir.Instruction import Instruction
+
+REGISTERS = frozenset({'A', 'X', 'F'})  # the status bits are a location of their own
+STORES = {'STWA', 'STWX', 'DECI'}       # writing their operand without reading it
+
+class DeadCodeElimination():
+    """
+        Backward liveness analysis over the control flow graph of every
+        function. The locations are the registers, the status bits, the
+        global words ('x,d') and the locals and parameters of the function
+        ('mn,s'). An instruction without side effects whose results are all
+        dead is removed (dead stores, then the computations feeding them),
+        and so are the blocks no path from the entry reaches.
+
+        Globals are live on exit of a function only when some instruction of
+        the program reads them, see reads(), and at a CALL only when the
+        called code (functions, runtime routines) reads them. Once the
+        program stops (.END, STOP), only the observed words (read from the memory of
+        the finished run, like execution counters) are live.
+    """
+
+    def __init__(self, entries=(), live_globals=(), stack_symbols=(), observed=(), called_globals=None) -> None:
+        self.__entries = set(entries)
+        self.__globals = frozenset(live_globals)
+        self.__called = frozenset(called_globals) if called_globals is not None else self.__globals
+        self.__observed = frozenset(observed)
+        self.__stack = set(stack_symbols)
+        self.removed_stores = 0
+        self.removed_computations = 0
+        self.removed_unreachable = 0
+
+    @staticmethod
+    def reads(instructions):
+        """Global words ('x,d') read by at least one of the instructions, directly or through an index"""
+        return {f'{instruction.operand},d' for instruction in instructions
+                if instruction.mode not in (None, 'i', 's') and not (instruction.mode == 'd' and instruction.opcode in STORES)}
+
+    def optimize(self, instructions):
+        results = list()
+        for function in ControlFlowGraph.functions(list(instructions), self.__entries):
+            function = self.__remove_unreachable(function)
+            while True:
+                removed = self.removed_stores + self.removed_computations
+                function = self.__remove_dead(function)
+                if self.removed_stores + self.removed_computations == removed:
+                    break
+            results += function
+        return results
+
+    def report(self):
+        return f'; Dead code elimination removed {self.removed_stores} dead stores, ' \
+               f'{self.removed_computations} dead computations and {self.removed_unreachable} unreachable instructions'
+
+    ####
+    ## Rewriting
+    ####
+
+    def __remove_unreachable(self, instructions):
+        graph = ControlFlowGraph(instructions)
+        reached = set()
+        worklist = graph.blocks[:1]
+        while worklist:
+            block = worklist.pop()
+            if block.index not in reached:
+                reached.add(block.index)
+                worklist += block.successors
+        results = list()
+        for block in graph.blocks:
+            for instruction in block.instructions:
+                if block.index in reached or instruction.is_directive:
+                    results.append(instruction)
+                else:
+                    self.removed_unreachable += 1
+        return results
+
+    def __remove_dead(self, instructions):
+        graph = ControlFlowGraph(instructions)
+        live_in = self.__analyze(graph)
+        kept = list()
+        for block in graph.blocks:
+            live = self.__live_out(graph, block, live_in)
+            dead = set()
+            for i in reversed(range(len(block.instructions))):
+                instruction = block.instructions[i]
+                read, written, removable = self.__effects(instruction)
+                if removable and written and not written & live:
+                    dead.add(i)
+                    if instruction.opcode in STORES:
+                        self.removed_stores += 1
+                    else:
+                        self.removed_computations += 1
+                    continue
+                live = (live - written) | read
+            kept.append(self.__keep_labels(block.instructions, dead) if dead else block.instructions)
+        return [instruction for block in kept for instruction in block]
+
+    def __keep_labels(self, instructions, dead):
+        # the label of a removed instruction moves to the next one, or to a sentinel
+        results = list()
+        pending_label = None
+        for i, instruction in enumerate(instructions):
+            if i in dead:
+                if instruction.label is not None:
+                    pending_label = instruction.label
+                continue
+            if pending_label is not None:
+                if instruction.label is None and not instruction.is_directive:
+                    instruction = instruction.with_label(pending_label)
+                else:
+                    results.append(Instruction('NOP1', label=pending_label))
+                pending_label = None
+            results.append(instruction)
+        if pending_label is not None:
+            results.append(Instruction('NOP1', label=pending_label))
+        return results
+
+    ####
+    ## Liveness analysis
+    ####
+
+    def __analyze(self, graph):
+        """Locations live on entry of every block"""
+        live_in = [frozenset()] * len(graph.blocks)
+        worklist = list(graph.blocks)
+        while worklist:
+            block = worklist.pop()
+            live = self.__live_out(graph, block, live_in)
+            for instruction in reversed(block.instructions):
+                read, written, _ = self.__effects(instruction)
+                live = (live - written) | read
+            if live != live_in[block.index]:
+                live_in[block.index] = live
+                worklist += [p for p in block.predecessors if p not in worklist]
+        return live_in
+
+    def __live_out(self, graph, block, live_in):
+        live = frozenset().union(*(live_in[successor.index] for successor in block.successors))
+        last = block.instructions[-1]
+        if last.opcode in BRANCHES and last.operand not in graph.labels:
+            # leaving the function (tail call): the next one may read anything, our frame included
+            live |= REGISTERS | self.__globals | {f'{symbol},s' for symbol in self.__stack}
+        elif not block.successors and last.opcode not in UNCONDITIONAL and last.opcode != '.END':
+            live |= REGISTERS | self.__globals
+        elif last.opcode in ('STOP', '.END'):
+            live |= self.__observed
+        return live
+
+    def __effects(self, instruction):
+        """(locations read, locations written, True when removing it only loses what it writes)"""
+        read, written, removable = self.__instruction_effects(instruction)
+        if instruction.mode is not None and 'x' in instruction.mode:
+            read = read | {'X'} # indexed addressing
+        return read, written, removable
+
+    def __instruction_effects(self, instruction):
+        mnemonic, mode = instruction.opcode, instruction.mode
+        location = self.__location(instruction)
+        memory = {location} if location is not None else set()
+        if mode not in (None, 'i', 'd', 's'):
+            memory = self.__memory() # indexed or indirect: any word may be read
+        if instruction.is_directive or mnemonic in ('NOP0', 'NOP1', 'NOP', 'BR', 'ADDSP', 'SUBSP', 'STOP'):
+            return frozenset(), frozenset(), False
+        if mnemonic in CONDITIONAL_BRANCHES:
+            return frozenset({'F'}), frozenset(), False
+        if mnemonic == 'CALL':
+            return REGISTERS | self.__called, frozenset(), False
+        if mnemonic == 'RET':
+            return REGISTERS | self.__globals, frozenset(), False
+        register = mnemonic[-1]
+        if mnemonic in ('STWA', 'STWX'):
+            if location is None:
+                read = {register} | (memory if mode not in ('i', 'd', 's') else set())
+                return frozenset(read), frozenset(), False
+            return frozenset({register}), frozenset({location}), True
+        if mnemonic == 'DECI':
+            return frozenset(), frozenset(memory if location is not None else set()) | {'F'}, False
+        if mnemonic in ('DECO', 'HEXO', 'STRO'):
+            return frozenset(memory), frozenset(), False
+        if mnemonic in ('LDWA', 'LDWX'):
+            return frozenset(memory), frozenset({register, 'F'}), True
+        if mnemonic in ('ADDA', 'ADDX', 'SUBA', 'SUBX', 'ANDA', 'ANDX', 'ORA', 'ORX'):
+            return frozenset({register} | memory), frozenset({register, 'F'}), True
+        if mnemonic in ('CPWA', 'CPWX'):
+            return frozenset({register} | memory), frozenset({'F'}), True
+        if mnemonic in ('NEGA', 'NEGX', 'NOTA', 'NOTX', 'ASLA', 'ASLX', 'ASRA', 'ASRX'):
+            return frozenset({register}), frozenset({register, 'F'}), True
+        if mnemonic in ('ROLA', 'ROLX', 'RORA', 'RORX'):
+            return frozenset({register, 'F'}), frozenset({register, 'F'}), True
+        if mnemonic == 'MOVSPA':
+            return frozenset(), frozenset({'A'}), True
+        if mnemonic == 'MOVFLGA':
+            return frozenset({'F'}), frozenset({'A'}), True
+        return REGISTERS | self.__memory(), frozenset(), False # byte accesses (input, output) and the rest
+
+    def __location(self, instruction):
+        """The tracked memory word named by the operand, None for the others (immediate, arguments...)"""
+        if instruction.mode == 'd' and not instruction.operand.lstrip('-').isdigit():
+            return instruction.argument
+        if instruction.mode == 's' and instruction.operand in self.__stack:
+            return instruction.argument
+        return None
+
+    def __memory(self):
+        return self.__globals | {f'{symbol},s' for symbol in self.__stack}
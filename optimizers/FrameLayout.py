@@ -0,0 +1,89 @@
+import ast
+
+class FrameLayout():
+    """
+        Shares the stack slots of the locals of a function whose lifetimes
+        do not overlap. A backward liveness pass over the body makes every
+        assigned local interfere with the locals live after the assignment,
+        then the locals are colored greedily in order of first assignment.
+
+        A local read or assigned in a loop keeps its slot for the whole
+        loop: the index register allocation may load it before the loop and
+        store it back on any exit. Arrays keep their own slots.
+    """
+
+    def __init__(self) -> None:
+        self.shared = 0
+        self.saved_bytes = 0
+        self.__names = set()
+        self.__interference = dict()
+
+    def assign(self, function):
+        """local name -> name of the local whose slot it uses (itself when it has its own)"""
+        names = [name for name in function.locals if name not in function.arrays]
+        self.__names = set(names)
+        self.__interference = {name: set() for name in names}
+        self.__block(function.node.body, set())
+
+        slots = dict()
+        for name in names:
+            taken = {slots[other] for other in self.__interference[name] if other in slots}
+            slots[name] = next((owner for owner in slots.values() if owner not in taken), name)
+            if slots[name] != name:
+                self.shared += 1
+                self.saved_bytes += 2
+        return slots
+
+    def report(self):
+        return f'; Frame layout shared the slots of {self.shared} locals ({self.saved_bytes} bytes)'
+
+    ####
+    ## Liveness, from the end of a block to its beginning
+    ####
+
+    def __block(self, statements, live):
+        for statement in reversed(statements):
+            live = self.__statement(statement, live)
+        return live
+
+    def __statement(self, statement, live):
+        """Locals live before statement, knowing those live after it"""
+        if isinstance(statement, ast.Return):
+            return self.__read(statement) # nothing after a return is reached
+        if isinstance(statement, ast.If):
+            return self.__read(statement.test) | self.__block(statement.body, live) \
+                | self.__block(statement.orelse, live)
+        if isinstance(statement, ast.While):
+            entry = live | self.__read(statement.test)
+            while True:
+                updated = entry | self.__block(statement.body, entry)
+                if updated == entry:
+                    break
+                entry = updated
+            used = self.__read(statement) | self.__written(statement)
+            self.__interfere(used, used | entry)
+            return entry
+        written = self.__written(statement)
+        for name in written:
+            self.__interfere({name}, live)
+        return (live - written) | self.__read(statement)
+
+    def __read(self, node):
+        names = set()
+        for n in ast.walk(node):
+            if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Load):
+                names.add(n.id)
+            elif isinstance(n, ast.AugAssign) and isinstance(n.target, ast.Name): # x += 1 reads x
+                names.add(n.target.id)
+        return names & self.__names
+
+    def __written(self, node):
+        names = {n.id for n in ast.walk(node) if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Store)}
+        return names & self.__names
+
+    def __interfere(self, names, others):
+        for name in names:
+            for other in others:
+                if other != name:
+                    self.__interference[name].add(other)
+                    self.__interference[other].add(name)
@@ -0,0 +1,269 @@
+from optimizers.InstructionSet import BRANCHES, UNCONDITIONAL, flags_dead_after
+from ir.Instruction import Instruction
+
+# instructions reading the accumulator
+READS_A = {'STWA', 'STBA', 'ADDA', 'SUBA', 'ANDA', 'ORA', 'CPWA', 'CPBA', 'NOTA', 'NEGA', 'ASLA',
+           'ASRA', 'ROLA', 'RORA', 'MOVAFLG', 'LDBA', 'CALL', 'RET'}
+# instructions giving the accumulator a new value without reading it
+WRITES_A = {'LDWA', 'MOVSPA', 'MOVFLGA'}
+
+class IndexRegisterAllocation():
+    """
+        Keeps the hottest variable of a loop in the index register X. PEP/9
+        has no register to register moves, so a variable is only allocated
+        when every access to it in the loop has an X form:
+
+            LDWA v / CPWA k             ->  CPWX k
+            LDWA v / ADDA k / STWA v    ->  ADDX k  (SUBA likewise)
+            LDWA v / STWA w             ->  STWX w
+            LDWA k / STWA v             ->  LDWX k
+
+        and other reads of v are preceded by a spill (STWX v). v is loaded in
+        X before the loop and stored back on every exit. Loops containing
+        calls, stack pointer moves or any use of X are left untouched, so
+        inner loops are allocated first. The excluded words (execution
+        counters) are never candidates, they must not take X from the
+        variables of the program.
+
+        With the profile of a training run, the hottest loops are allocated
+        first (the loops nested in one keeping X are then left untouched)
+        and an access saves as many instructions as its line was executed.
+        Given finish, the later passes run on a copy of the section for every
+        candidate, and X goes to the one leaving the fewest instructions to
+        execute: the savings above miss a variable the accumulator tracking
+        already keeps in A.
+    """
+
+    def __init__(self, excluded=(), profile=None, finish=None) -> None:
+        self.__excluded = set(excluded)
+        self.__profile = profile
+        self.__finish = finish # instructions -> instructions once the later passes ran
+        self.__instructions = list()
+        self.allocated = list() # (loop label, variable)
+
+    def optimize(self, instructions):
+        self.__instructions = list(instructions)
+        done = set()
+        changed = True
+        while changed:
+            changed = False
+            for header, back_edge in self.__loops():
+                label = self.__instructions[header].label
+                if label in done:
+                    continue
+                done.add(label)
+                if self.__allocate(header, back_edge):
+                    changed = True
+                    break # indices moved, looking for loops again
+        return self.__instructions
+
+    def report(self):
+        allocated = ', '.join(f'{v} in {label}' for label, v in self.allocated) or 'nothing'
+        return f'; Index register allocation kept {allocated} in X'
+
+    ####
+    ## Loops
+    ####
+
+    def __loops(self):
+        # a branch to an earlier label closes a loop, the smallest (with a profile, the hottest) loops come first
+        labels = self.__labels()
+        loops = list()
+        for i, instruction in enumerate(self.__instructions):
+            if instruction.opcode in BRANCHES and instruction.operand in labels and labels[instruction.operand] <= i:
+                loops.append((labels[instruction.operand], i))
+        if self.__profile is not None:
+            return sorted(loops, key=lambda loop: (-self.__weight(self.__instructions[loop[0]]), loop[1] - loop[0]))
+        return sorted(loops, key=lambda loop: loop[1] - loop[0])
+
+    def __allocate(self, header, back_edge):
+        instructions = self.__instructions
+        region = range(header, back_edge + 1)
+        labels = self.__labels()
+
+        # the loop must only be entered through its header, by falling into it
+        for i, instruction in enumerate(instructions):
+            if i in region:
+                continue
+            if instruction.opcode in BRANCHES and labels.get(instruction.operand) in region:
+                return False
+        if header == 0 or self.__no_fallthrough(header - 1):
+            return False
+
+        # exits: every one must only be reachable from the loop to receive the spill
+        exits = set()
+        for i in region:
+            instruction = instructions[i]
+            if instruction.is_directive:
+                return False
+            if instruction.opcode in BRANCHES and instruction.operand in labels:
+                if labels[instruction.operand] not in region:
+                    exits.add(labels[instruction.operand])
+            elif instruction.opcode in BRANCHES:
+                return False
+        if not self.__no_fallthrough(back_edge):
+            exits.add(back_edge + 1)
+        for target in exits:
+            if target >= len(instructions) or instructions[target].is_directive:
+                return False
+            if target - 1 not in region and not self.__no_fallthrough(target - 1):
+                return False
+            for i, instruction in enumerate(instructions):
+                if i not in region and instruction.opcode in BRANCHES and labels.get(instruction.operand) == target:
+                    return False
+
+        # nothing in the loop may use X, move the stack or reach memory indirectly
+        for i in region:
+            instruction = instructions[i]
+            if instruction.opcode in ('CALL', 'ADDSP', 'SUBSP', 'RET', 'STOP') or instruction.opcode.endswith('X'):
+                return False
+            if instruction.mode in ('n', 'sf', 'x', 'sx', 'sfx'):
+                return False
+        # nor may an enclosing loop keep its variable in X, it is allocated first when it is hotter
+        allocated = {label for label, _ in self.allocated}
+        for start, end in self.__loops():
+            if start <= header and back_edge <= end and (start, end) != (header, back_edge) \
+                    and instructions[start].label in allocated:
+                return False
+
+        live_a = self.__accumulator_liveness()
+        best = None
+        for variable in self.__candidates(region):
+            rewritten = self.__rewrite(region, variable, live_a)
+            if rewritten is None or rewritten[1] <= 0:
+                continue
+            results = self.__allocated(header, back_edge, exits, variable, rewritten[0])
+            if self.__finish is not None and self.__profile is not None:
+                saved = self.__executions(instructions) - self.__executions(results)
+            else:
+                saved = rewritten[1]
+            if saved > 0 and (best is None or saved > best[2]):
+                best = (variable, results, saved)
+        if best is None:
+            return False
+
+        variable, self.__instructions, _ = best
+        self.allocated.append((instructions[header].label, variable))
+        return True
+
+    def __allocated(self, header, back_edge, exits, variable, body):
+        """The instructions with the loop body replaced, variable loaded before the loop and spilled on exits"""
+        instructions = self.__instructions
+        results = instructions[:header] + [Instruction.parse(f'LDWX {variable}', source=instructions[header].source)] + body
+        for i in range(back_edge + 1, len(instructions)):
+            instruction = instructions[i]
+            if i in exits:
+                results.append(Instruction.parse(f'STWX {variable}', instruction.label, instruction.source))
+                instruction = instruction.with_label(None)
+            results.append(instruction)
+        return results
+
+    def __candidates(self, region):
+        candidates = set()
+        for i in region:
+            instruction = self.__instructions[i]
+            if instruction.opcode == 'STWA' and instruction.mode in ('d', 's') \
+                    and instruction.argument not in self.__excluded:
+                candidates.add(instruction.argument)
+        return sorted(candidates)
+
+    def __rewrite(self, region, variable, live_a):
+        """
+            The loop body with variable in X and the instructions saved per iteration (over the training
+            run with a profile), None if impossible
+        """
+        instructions = self.__instructions
+        body = list()
+        saved = 0
+        i = region.start
+        while i < region.stop:
+            first, second, third = [instructions[j] if j < region.stop else None for j in range(i, i + 3)]
+            label, op1, arg1 = first.label, first.opcode, first.argument
+            label2, op2, arg2 = (second.label, second.opcode, second.argument) if second else (None, None, None)
+            label3, op3, arg3 = (third.label, third.opcode, third.argument) if third else (None, None, None)
+            if op1 == 'LDWA' and arg1 == variable and label2 is None and arg2 != variable:
+                if op2 == 'CPWA' and not live_a[i + 1]:
+                    body.append(Instruction.parse(f'CPWX {arg2}', label, first.source))
+                    saved += self.__weight(first)
+                    i += 2
+                    continue
+                if op2 in ('ADDA', 'SUBA') and op3 == 'STWA' and arg3 == variable and label3 is None \
+                        and not live_a[i + 2]:
+                    body.append(Instruction.parse(f'{op2[:-1]}X {arg2}', label, first.source))
+                    saved += 2 * self.__weight(first)
+                    i += 3
+                    continue
+                if op2 == 'STWA' and not live_a[i + 1] and flags_dead_after(instructions, i + 1):
+                    body.append(Instruction.parse(f'STWX {arg2}', label, first.source))
+                    saved += self.__weight(first)
+                    i += 2
+                    continue
+            if op1 == 'LDWA' and arg1 != variable and op2 == 'STWA' and arg2 == variable and label2 is None \
+                    and not live_a[i + 1]:
+                body.append(Instruction.parse(f'LDWX {arg1}', label, first.source))
+                saved += self.__weight(first)
+                i += 2
+                continue
+            if arg1 == variable:
+                if op1 in ('STWA', 'DECI', 'STBA'):
+                    return None # written outside of the X forms
+                body.append(Instruction.parse(f'STWX {variable}', label, first.source)) # bringing memory up to date before the read
+                body.append(first.with_label(None))
+                saved -= self.__weight(first)
+                i += 1
+                continue
+            body.append(first)
+            i += 1
+        return body, saved
+
+    ####
+    ## Helpers
+    ####
+
+    def __executions(self, instructions):
+        """Instructions executed by the training run once the later passes optimized instructions"""
+        return sum(self.__weight(instruction) for instruction in self.__finish(instructions))
+
+    def __weight(self, instruction):
+        """Executions of instruction: 1 per iteration without profile, its line count in the training run"""
+        if self.__profile is None:
+            return 1
+        return (self.__profile.count(instruction.source) or 0) if instruction.source is not None else 0
+
+    def __labels(self):
+        return {instruction.label: i for i, instruction in enumerate(self.__instructions) if instruction.label is not None}
+
+    def __no_fallthrough(self, i):
+        return self.__instructions[i].opcode in UNCONDITIONAL
+
+    def __accumulator_liveness(self):
+        """live[i] is True when the value of A after instructions[i] may still be read"""
+        instructions = self.__instructions
+        labels = self.__labels()
+        live_in = [False] * len(instructions)
+        changed = True
+        while changed:
+            changed = False
+            for i in reversed(range(len(instructions))):
+                live = self.__live_out(i, labels, live_in)
+                mnemonic = instructions[i].opcode
+                value = mnemonic in READS_A or (live and mnemonic not in WRITES_A)
+                if value != live_in[i]:
+                    live_in[i] = value
+                    changed = True
+        return [self.__live_out(i, labels, live_in) for i in range(len(instructions))]
+
+    def __live_out(self, i, labels, live_in):
+        instructions = self.__instructions
+        instruction = instructions[i]
+        if instruction.is_directive:
+            return instruction.opcode != '.END' and i + 1 < len(instructions) and live_in[i + 1]
+        mnemonic, operand = instruction.opcode, instruction.operand
+        if mnemonic in ('RET', 'STOP'):
+            return False
+        live = False
+        if mnemonic not in UNCONDITIONAL:
+            live = live_in[i + 1] if i + 1 < len(instructions) else True
+        if mnemonic in BRANCHES:
+            live = live or (live_in[labels[operand]] if operand in labels else True)
+        return live
@@ -0,0 +1,210 @@
+import ast
+import copy
+from visitors.ProgramAnalysis import BUILTINS, array_allocation
+
+DEFAULT_BUDGET = 40 # estimated instructions of a function body still worth copying at every call site
+HOT_BUDGET_FACTOR = 4 # budget multiplier of the call sites a profile finds hot
+
+def estimate(statements):
+    """Rough number of PEP/9 instructions generated for statements"""
+    size = 0
+    for statement in statements:
+        if isinstance(statement, ast.While):
+            size += 4 + estimate(statement.body)
+        elif isinstance(statement, ast.If):
+            size += 4 + estimate(statement.body) + estimate(statement.orelse)
+        elif isinstance(statement, (ast.Assign, ast.AugAssign)):
+            size += 3
+        else:
+            size += 2
+    return size
+
+
+class FunctionInlining():
+    """
+        Copies the body of small leaf functions at their call sites, before
+        the program analysis. A function is inlined when it calls no other
+        user function (so it is not recursive), returns only at its end and
+        its body is estimated under budget instructions. Its locals are
+        renamed for every call site, and parameters it never assigns are
+        replaced by the arguments. Inlining repeats bottom-up, as a caller
+        becomes a leaf once its callees are inlined, and functions left
+        without call sites are removed.
+
+        With the profile of a training run, the hot call sites get a larger
+        budget.
+    """
+
+    def __init__(self, budget=DEFAULT_BUDGET, profile=None) -> None:
+        self.budget = budget
+        self.inlined = list()   # (function, caller, estimated cycles saved per execution)
+        self.__profile = profile
+        self.__names = set()
+        self.__functions = dict()
+
+    def optimize(self, root_node):
+        for node in ast.walk(root_node):
+            if isinstance(node, ast.Name):
+                self.__names.add(node.id)
+            elif isinstance(node, ast.FunctionDef):
+                self.__names.add(node.name)
+            elif isinstance(node, ast.arg):
+                self.__names.add(node.arg)
+        changed = True
+        while changed:
+            before = len(self.inlined)
+            self.__functions = {f.name: f for f in root_node.body if isinstance(f, ast.FunctionDef)}
+            for contents in root_node.body:
+                if isinstance(contents, ast.FunctionDef):
+                    contents.body = self.__inline_block(contents.body, contents)
+            root_node.body = self.__inline_block(root_node.body, None) # function definitions are kept as is
+            changed = len(self.inlined) != before
+        self.__remove_unused(root_node)
+        return root_node
+
+    def report(self):
+        if not self.inlined:
+            return '; Function inlining expanded 0 calls'
+        sites = ', '.join(f'{function} in {caller or "top level"} ~{cycles} cycles'
+                          for function, caller, cycles in self.inlined)
+        return f'; Function inlining expanded {len(self.inlined)} calls, saving per execution: {sites}'
+
+    ####
+    ## Call sites
+    ####
+
+    def __inline_block(self, statements, caller):
+        results = list()
+        for statement in statements:
+            if isinstance(statement, (ast.While, ast.If)):
+                statement.body = self.__inline_block(statement.body, caller)
+                statement.orelse = self.__inline_block(statement.orelse, caller)
+            call, target = self.__call_site(statement)
+            function = self.__functions.get(call.func.id) if call is not None else None
+            if function is None or not self.__inlinable(function, call, caller):
+                results.append(statement)
+                continue
+            results += self.__expand(function, call, target, isinstance(statement, ast.Return))
+            self.inlined.append((function.name, caller.name if caller else None, self.__saved_cycles(function)))
+        return results
+
+    def __call_site(self, statement):
+        """The user call made by a statement and the name receiving its result"""
+        value, target = None, None
+        if isinstance(statement, ast.Assign) and isinstance(statement.targets[0], ast.Name):
+            value, target = statement.value, statement.targets[0].id
+        elif isinstance(statement, (ast.Expr, ast.Return)):
+            value = statement.value
+        if isinstance(value, ast.Call) and isinstance(value.func, ast.Name) and value.func.id not in BUILTINS:
+            return value, target
+        return None, None
+
+    def __inlinable(self, function, call, caller):
+        if function is caller or len(call.args) != len(function.args.args):
+            return False
+        if estimate(function.body) > self.__budget(call):
+            return False
+        for node in ast.walk(function):
+            if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id not in BUILTINS:
+                return False # not a leaf
+            if isinstance(node, ast.Return) and node is not function.body[-1]:
+                return False # returning early would need a jump out of the copied body
+            if isinstance(node, ast.Assign) and array_allocation(node.value) is not None:
+                return False # the caller would need the frame or the heap of the function
+        local_names = self.__local_names(function)
+        if any(name.startswith('_') and name.isupper() for name in local_names):
+            return False # EQUATE constants are global by definition
+        if caller is not None:
+            # a global read by the function must not be shadowed by a local of the caller
+            free = {n.id for n in ast.walk(function) if isinstance(n, ast.Name)} - local_names
+            if free & self.__local_names(caller):
+                return False
+        return True
+
+    def __expand(self, function, call, target, returns):
+        assigned = self.__assigned(function.body)
+        renames = dict()
+        substitutions = dict()
+        statements = list()
+        for param, arg in zip(function.args.args, call.args):
+            if param.arg not in assigned and isinstance(arg, (ast.Name, ast.Constant)):
+                substitutions[param.arg] = arg # read only parameter, the argument is used directly
+            else:
+                renames[param.arg] = self.__fresh(param.arg)
+                statements.append(ast.Assign(targets=[ast.Name(renames[param.arg], ast.Store())], value=arg))
+        for name in assigned:
+            if name not in renames:
+                renames[name] = self.__fresh(name)
+
+        body = [Renamer(renames, substitutions).visit(copy.deepcopy(s)) for s in function.body]
+        if body and isinstance(body[-1], ast.Return):
+            value = body.pop().value
+            if returns:
+                body.append(ast.Return(value))
+            elif target is not None and value is not None:
+                body.append(ast.Assign(targets=[ast.Name(target, ast.Store())], value=value))
+        elif returns:
+            body.append(ast.Return(None))
+        return [ast.fix_missing_locations(ast.copy_location(s, call)) for s in statements + body]
+
+    ####
+    ## Helpers
+    ####
+
+    def __budget(self, call):
+        if self.__profile is not None and self.__profile.hot(call):
+            return self.budget * HOT_BUDGET_FACTOR
+        return self.budget
+
+    def __fresh(self, name):
+        # a name unused in the whole module, arrays keep their trailing _
+        stem, suffix = (name[:-1], '_') if name.endswith('_') else (name, '')
+        n = 1
+        while f'{stem}{n}{suffix}' in self.__names:
+            n += 1
+        self.__names.add(f'{stem}{n}{suffix}')
+        return f'{stem}{n}{suffix}'
+
+    def __assigned(self, body):
+        names = set()
+        for node in ast.walk(ast.Module(body=body, type_ignores=[])):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+                names.add(node.id)
+        return names
+
+    def __local_names(self, function):
+        return self.__assigned(function.body) | {arg.arg for arg in function.args.args}
+
+    def __saved_cycles(self, function):
+        # SUBSP, CALL, ADDSP and RET (1 + size bytes each), plus the frame of the locals and the return slot
+        params = len(function.args.args)
+        returns = isinstance(function.body[-1], ast.Return) and function.body[-1].value is not None
+        saved = 6 + (8 if params or returns else 0)
+        if self.__assigned(function.body) - {arg.arg for arg in function.args.args}:
+            saved += 8
+        if returns:
+            saved += 8 # STWA to the return slot and LDWA -2,s
+        return saved
+
+    def __remove_unused(self, root_node):
+        # functions whose every call site was inlined
+        called = {n.func.id for n in ast.walk(root_node) if isinstance(n, ast.Call) and isinstance(n.func, ast.Name)}
+        inlined = {function for function, _, _ in self.inlined}
+        root_node.body = [c for c in root_node.body
+                          if not isinstance(c, ast.FunctionDef) or c.name in called or c.name not in inlined]
+
+
+class Renamer(ast.NodeTransformer):
+    """Renames the locals of an inlined body and replaces its read only parameters by the arguments"""
+
+    def __init__(self, renames, substitutions) -> None:
+        super().__init__()
+        self.__renames = renames
+        self.__substitutions = substitutions
+
+    def visit_Name(self, node):
+        if node.id in self.__substitutions:
+            return ast.copy_location(copy.deepcopy(self.__substitutions[node.id]), node)
+        if node.id in self.__renames:
+            return ast.copy_location(ast.Name(self.__renames[node.id], node.ctx), node)
+        return node
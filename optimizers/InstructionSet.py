@@ -0,0 +1,32 @@
+"""PEP/9 instruction properties shared by the optimization passes"""
+
+UNARY = {'STOP', 'RET', 'RETTR', 'MOVSPA', 'MOVFLGA', 'MOVAFLG', 'NOTA', 'NOTX', 'NEGA', 'NEGX',
+         'ASLA', 'ASLX', 'ASRA', 'ASRX', 'ROLA', 'ROLX', 'RORA', 'RORX', 'NOP0', 'NOP1'}
+
+CONDITIONAL_BRANCHES = {'BRLE', 'BRLT', 'BREQ', 'BRNE', 'BRGE', 'BRGT', 'BRV', 'BRC'}
+BRANCHES = CONDITIONAL_BRANCHES | {'BR'}
+UNCONDITIONAL = {'BR', 'RET', 'STOP'} # control never falls through
+
+# instructions replacing the status bits, making the previous ones dead
+FLAG_SETTERS = {'LDWA', 'LDWX', 'LDBA', 'LDBX', 'ADDA', 'ADDX', 'SUBA', 'SUBX', 'ANDA', 'ANDX',
+                'ORA', 'ORX', 'CPWA', 'CPWX', 'CPBA', 'CPBX', 'NOTA', 'NOTX', 'NEGA', 'NEGX',
+                'ASLA', 'ASLX', 'ASRA', 'ASRX', 'DECI'}
+# instructions reading the status bits
+FLAG_READERS = CONDITIONAL_BRANCHES | {'ROLA', 'ROLX', 'RORA', 'RORX', 'MOVFLGA'}
+
+
+def flags_dead_after(instructions, index):
+    """True when no instruction can observe the status bits left by instructions[index]"""
+    for instruction in instructions[index + 1:]:
+        if instruction.label is not None:
+            return False # another path joins here, be conservative
+        if instruction.is_directive:
+            return instruction.opcode == '.END'
+        mnemonic = instruction.opcode
+        if mnemonic in FLAG_READERS:
+            return False
+        if mnemonic in FLAG_SETTERS or mnemonic == 'STOP':
+            return True
+        if mnemonic in ('BR', 'CALL', 'RET', 'ADDSP', 'SUBSP'):
+            return False
+    return True
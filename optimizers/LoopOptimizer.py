@@ -0,0 +1,237 @@
+import ast
+import copy
+from optimizers.ConstantFolding import to_word
+
+def names_read(node):
+    return {n.id for n in ast.walk(node) if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Load)}
+
+def assignments(statements):
+    """Number of statements assigning each name, nested blocks included"""
+    counts = dict()
+    for statement in statements:
+        for node in ast.walk(statement):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+                counts[node.id] = counts.get(node.id, 0) + 1
+    return counts
+
+def multiply_cost(value):
+    # instructions of the inline ASLA/ADDA sequence generated for a multiplication by value
+    magnitude = abs(value)
+    return max(magnitude.bit_length() - 1, 0) + max(bin(magnitude).count('1') - 1, 0) + (value < 0)
+
+
+class Loop():
+    """A while loop of the loop nest, with what its body assigns"""
+
+    def __init__(self, node, parent=None) -> None:
+        self.node = node
+        self.parent = parent
+        self.children = list()
+        self.depth = parent.depth + 1 if parent is not None else 0
+        self.update()
+
+    def update(self):
+        self.assigned = assignments(self.node.body)
+
+    def invariant(self, node):
+        """True when node is an expression of names not assigned in the loop"""
+        if isinstance(node, ast.Constant):
+            return True
+        if isinstance(node, ast.Name):
+            return node.id not in self.assigned
+        if isinstance(node, ast.BinOp):
+            return self.invariant(node.left) and self.invariant(node.right)
+        return False # calls, subscripts...
+
+
+class LoopOptimizer():
+    """
+        Loop-invariant code motion and strength reduction of the induction
+        variables, on the loop nest of every scope, innermost loops first.
+
+        An assignment x = e at the top of a loop body moves before the loop
+        when e only reads names the loop does not assign, x is assigned once
+        in the loop and x is not read by the test nor before the assignment.
+        The moved statements run under a copy of the test (if test: ...
+        while test: ...) so nothing changes when the loop does not iterate.
+
+        A basic induction variable is assigned once, at the top of the body,
+        as i = i + c (or - c) with c invariant. An expensive product i * k
+        with k invariant is then replaced by a new variable, initialized to
+        i * k before the loop and incremented by c * k after every update
+        of i.
+    """
+
+    def __init__(self) -> None:
+        self.hoisted = 0
+        self.reduced = 0
+        self.loops = list() # the loop nest, outermost loops of every scope
+        self.__names = set()
+
+    def optimize(self, root_node):
+        for node in ast.walk(root_node):
+            if isinstance(node, ast.Name):
+                self.__names.add(node.id)
+            elif isinstance(node, ast.FunctionDef):
+                self.__names.add(node.name)
+            elif isinstance(node, ast.arg):
+                self.__names.add(node.arg)
+        for contents in root_node.body:
+            if isinstance(contents, ast.FunctionDef):
+                contents.body = self.__optimize_block(contents.body, None)
+        root_node.body = self.__optimize_block(root_node.body, None)
+        return root_node
+
+    def report(self):
+        return f'; Loop optimizer hoisted {self.hoisted} statements out of {self.__count(self.loops)} loops ' \
+               f'and strength reduced {self.reduced} multiplications'
+
+    ####
+    ## Loop nest
+    ####
+
+    def __optimize_block(self, statements, parent):
+        results = list()
+        for statement in statements:
+            if isinstance(statement, ast.While):
+                loop = Loop(statement, parent)
+                (parent.children if parent is not None else self.loops).append(loop)
+                statement.body = self.__optimize_block(statement.body, loop) # inner loops first
+                loop.update()
+                results += self.__optimize_loop(loop)
+            elif isinstance(statement, ast.If):
+                statement.body = self.__optimize_block(statement.body, parent)
+                statement.orelse = self.__optimize_block(statement.orelse, parent)
+                results.append(statement)
+            else:
+                results.append(statement)
+        return results
+
+    def __optimize_loop(self, loop):
+        preheader = self.__hoist(loop) + self.__reduce(loop)
+        if not preheader:
+            return [loop.node]
+        guard = ast.If(test=copy.deepcopy(loop.node.test), body=preheader + [loop.node], orelse=[])
+        return [ast.fix_missing_locations(ast.copy_location(guard, loop.node))]
+
+    def __count(self, loops):
+        return sum(1 + self.__count(loop.children) for loop in loops)
+
+    ####
+    ## Loop-invariant code motion
+    ####
+
+    def __hoist(self, loop):
+        hoisted = list()
+        body = loop.node.body
+        tested = names_read(loop.node.test)
+        moved = True
+        while moved:
+            moved = False
+            for index, statement in enumerate(body):
+                if not isinstance(statement, ast.Assign) or not isinstance(statement.targets[0], ast.Name):
+                    continue
+                name = statement.targets[0].id
+                if loop.assigned.get(name) != 1 or name in tested:
+                    continue
+                if not loop.invariant(statement.value):
+                    continue
+                if any(name in names_read(previous) for previous in body[:index]):
+                    continue # the first iteration reads the value from before the loop
+                hoisted.append(body.pop(index))
+                loop.update()
+                self.hoisted += 1
+                moved = True
+                break
+        return hoisted
+
+    ####
+    ## Strength reduction
+    ####
+
+    def __reduce(self, loop):
+        preheader = list()
+        inductions = self.__induction_variables(loop)
+        reductions = dict() # (variable, factor) -> name of the reduced product
+        candidates = [node for node in ast.walk(ast.Module(body=loop.node.body, type_ignores=[]))
+                      if isinstance(node, ast.Assign) and isinstance(node.value, ast.BinOp)]
+        for node in candidates:
+            product = self.__product(loop, node.value, inductions)
+            if product is None:
+                continue
+            variable, factor = product
+            key = (variable, ast.dump(factor))
+            if key not in reductions:
+                reductions[key] = self.__fresh(f'{variable}_sr')
+                preheader += self.__introduce(loop, reductions[key], variable, factor, inductions[variable])
+            node.value = ast.copy_location(ast.Name(reductions[key], ast.Load()), node.value)
+            self.reduced += 1
+        if reductions:
+            loop.update()
+        return preheader
+
+    def __induction_variables(self, loop):
+        """Basic induction variables: name -> (statement updating it, step, True when decreasing)"""
+        results = dict()
+        for statement in loop.node.body:
+            if isinstance(statement, ast.AugAssign) and isinstance(statement.target, ast.Name):
+                name, op, step = statement.target.id, statement.op, statement.value
+            elif isinstance(statement, ast.Assign) and isinstance(statement.targets[0], ast.Name) \
+                    and isinstance(statement.value, ast.BinOp):
+                name, op = statement.targets[0].id, statement.value.op
+                left, right = statement.value.left, statement.value.right
+                if isinstance(left, ast.Name) and left.id == name:
+                    step = right
+                elif isinstance(right, ast.Name) and right.id == name and isinstance(op, ast.Add):
+                    step = left
+                else:
+                    continue
+            else:
+                continue
+            if isinstance(op, (ast.Add, ast.Sub)) and loop.assigned.get(name) == 1 \
+                    and isinstance(step, (ast.Name, ast.Constant)) and loop.invariant(step):
+                results[name] = (statement, step, isinstance(op, ast.Sub))
+        return results
+
+    def __product(self, loop, node, inductions):
+        """(induction variable, invariant factor) when node is worth reducing"""
+        if not isinstance(node.op, ast.Mult):
+            return None
+        for variable, factor in ((node.left, node.right), (node.right, node.left)):
+            if not isinstance(variable, ast.Name) or variable.id not in inductions:
+                continue
+            if not isinstance(factor, (ast.Name, ast.Constant)) or not loop.invariant(factor):
+                continue
+            if isinstance(factor, ast.Constant) and multiply_cost(factor.value) <= 3:
+                continue # the inline sequence is cheaper than maintaining a new variable
+            return variable.id, factor
+        return None
+
+    def __introduce(self, loop, name, variable, factor, induction):
+        """Statements initializing the reduced product, its update follows the one of the variable"""
+        update, step, decreasing = induction
+        preheader = [ast.Assign(targets=[ast.Name(name, ast.Store())],
+                                value=ast.BinOp(ast.Name(variable, ast.Load()), ast.Mult(), copy.deepcopy(factor)))]
+        if isinstance(step, ast.Constant) and isinstance(factor, ast.Constant):
+            increment = ast.Constant(to_word(step.value * factor.value))
+        elif isinstance(step, ast.Constant) and step.value == 1:
+            increment = copy.deepcopy(factor)
+        elif isinstance(factor, ast.Constant) and factor.value == 1:
+            increment = copy.deepcopy(step)
+        else:
+            increment = ast.Name(self.__fresh(f'{name}_step'), ast.Load())
+            preheader.append(ast.Assign(targets=[ast.Name(increment.id, ast.Store())],
+                                        value=ast.BinOp(copy.deepcopy(step), ast.Mult(), copy.deepcopy(factor))))
+        op = ast.Sub() if decreasing else ast.Add()
+        increment_statement = ast.Assign(targets=[ast.Name(name, ast.Store())],
+                                         value=ast.BinOp(ast.Name(name, ast.Load()), op, increment))
+        body = loop.node.body
+        body.insert(body.index(update) + 1, ast.fix_missing_locations(ast.copy_location(increment_statement, update)))
+        return [ast.fix_missing_locations(ast.copy_location(s, loop.node)) for s in preheader]
+
+    def __fresh(self, name):
+        n = 1
+        while f'{name}{n}' in self.__names:
+            n += 1
+        self.__names.add(f'{name}{n}')
+        return f'{name}{n}'
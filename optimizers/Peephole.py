@@ -0,0 +1,182 @@
+from optimizers.InstructionSet import BRANCHES, UNCONDITIONAL, flags_dead_after
+from ir.Instruction import Instruction
+
+# instructions setting N and Z from the new value of the register they name
+ZERO_TESTS = {'LDW', 'ADD', 'SUB', 'AND', 'OR', 'NEG', 'NOT', 'ASL', 'ASR'}
+# branches reading nothing but N and Z, taken alike after CPWr 0,i and after any of ZERO_TESTS
+SIGN_BRANCHES = {'BRLT', 'BRLE', 'BREQ', 'BRNE', 'BRGE', 'BRGT', 'BR'}
+# instructions replacing every status bit
+ALL_FLAGS_SETTERS = {'ADDA', 'ADDX', 'SUBA', 'SUBX', 'CPWA', 'CPWX', 'CPBA', 'CPBX', 'ASLA', 'ASLX', 'STOP'}
+
+class PeepholeOptimizer():
+    """
+        Rewrites short windows of the instruction stream produced by the
+        visitors. A labeled instruction is a barrier: it can be reached from
+        elsewhere, so it is never merged with what precedes it.
+    """
+
+    def __init__(self) -> None:
+        self.__instructions = list()
+        self.removed_instructions = 0
+        self.saved_bytes = 0
+
+    def optimize(self, instructions):
+        before = self.__instructions = list(instructions)
+        changed = True
+        while changed:
+            changed = False
+            for rule in (self.__unreachable, self.__branch_to_next, self.__store_load, self.__stack_adjustments,
+                         self.__sentinel_labels, self.__compare_with_zero):
+                changed = rule() or changed
+        # added up when the same optimizer cleans up after other passes
+        self.removed_instructions += self.__count(before) - self.__count(self.__instructions)
+        self.saved_bytes += sum(i.size for i in before) - sum(i.size for i in self.__instructions)
+        return self.__instructions
+
+    def report(self):
+        return f'; Peephole optimizer removed {self.removed_instructions} instructions ({self.saved_bytes} bytes)'
+
+    ####
+    ## Rewriting rules, each one returns True when it changed the stream
+    ####
+
+    def __unreachable(self):
+        # unlabeled instructions after BR/RET/STOP can never execute (e.g. the duplicate BR end_f_N)
+        results = list()
+        dead = False
+        for instruction in self.__instructions:
+            if instruction.label is not None or instruction.is_directive:
+                dead = False
+            elif dead:
+                continue
+            results.append(instruction)
+            if instruction.opcode in UNCONDITIONAL:
+                dead = True
+        return self.__replace(results)
+
+    def __branch_to_next(self):
+        # BR end_f_N straight into end_f_N
+        results = list()
+        instructions = self.__instructions
+        for i, instruction in enumerate(instructions):
+            if instruction.label is None and i + 1 < len(instructions) and instruction.opcode == 'BR' \
+                    and instruction.operand == instructions[i + 1].label:
+                continue
+            results.append(instruction)
+        return self.__replace(results)
+
+    def __store_load(self):
+        # STWA x,d followed by LDWA x,d: the accumulator already holds x
+        results = list()
+        instructions = self.__instructions
+        for i, instruction in enumerate(instructions):
+            if instruction.label is None and results and instruction.opcode in ('LDWA', 'LDWX'):
+                previous = results[-1]
+                # the load would only set N and Z again when they already describe the register
+                if previous.opcode == 'STW' + instruction.opcode[-1] and previous.argument == instruction.argument \
+                        and (flags_dead_after(instructions, i) or self.__zero_tested(results, instruction.opcode[-1])):
+                    continue
+            results.append(instruction)
+        return self.__replace(results)
+
+    def __stack_adjustments(self):
+        # ADDSP n,i followed by ADDSP m,i is a single ADDSP n+m,i
+        results = list()
+        instructions = self.__instructions
+        for i, instruction in enumerate(instructions):
+            amount = self.__stack_amount(instruction)
+            if instruction.label is None and amount is not None and results and flags_dead_after(instructions, i):
+                previous = results[-1]
+                previous_amount = self.__stack_amount(previous)
+                if previous_amount is not None:
+                    total = previous_amount + amount
+                    results.pop()
+                    if total > 0:
+                        results.append(Instruction('ADDSP', str(total), 'i', previous.label, previous.source))
+                    elif total < 0:
+                        results.append(Instruction('SUBSP', str(-total), 'i', previous.label, previous.source))
+                    elif previous.label is not None:
+                        results.append(Instruction('NOP1', label=previous.label))
+                    continue
+            results.append(instruction)
+        return self.__replace(results)
+
+    def __sentinel_labels(self):
+        # a labeled NOP1 sentinel hands its label over to the unlabeled instruction after it
+        results = list()
+        instructions = self.__instructions
+        skip = False
+        for i, instruction in enumerate(instructions):
+            if skip:
+                skip = False
+                continue
+            if instruction.label is not None and instruction.opcode == 'NOP1' and i + 1 < len(instructions):
+                following = instructions[i + 1]
+                if following.label is None and not following.is_directive:
+                    results.append(following.with_label(instruction.label))
+                    skip = True
+                    continue
+            results.append(instruction)
+        return self.__replace(results)
+
+    def __compare_with_zero(self):
+        # SUBA 1,i / STWA x,s / CPWA 0,i: the status bits already tell the sign of A
+        results = list()
+        instructions = self.__instructions
+        for i, instruction in enumerate(instructions):
+            if instruction.label is None and instruction.opcode in ('CPWA', 'CPWX') and instruction.argument == '0,i' \
+                    and self.__zero_tested(results, instruction.opcode[-1]) and self.__sign_only_after(i):
+                continue
+            results.append(instruction)
+        return self.__replace(results)
+
+    ####
+    ## Helpers
+    ####
+
+    def __zero_tested(self, results, register):
+        """True when N and Z already describe the register at the end of results"""
+        for instruction in reversed(results):
+            if instruction.opcode[:-1] in ZERO_TESTS and instruction.opcode[-1] == register:
+                return True
+            if instruction.label is not None or instruction.opcode not in ('STWA', 'STWX', 'NOP1'):
+                return False
+        return False
+
+    def __sign_only_after(self, index):
+        """True when no path from instructions[index] reads V or C before they are replaced"""
+        instructions = self.__instructions
+        labels = {instruction.label: i for i, instruction in enumerate(instructions) if instruction.label is not None}
+        worklist, seen = [index + 1], set()
+        while worklist:
+            i = worklist.pop()
+            if i in seen or i >= len(instructions):
+                continue
+            seen.add(i)
+            instruction = instructions[i]
+            if instruction.opcode in ('.END', 'RET') or instruction.opcode in ALL_FLAGS_SETTERS:
+                continue # the callers only test the sign of what they compute themselves
+            if instruction.opcode in BRANCHES:
+                if instruction.opcode not in SIGN_BRANCHES or instruction.operand not in labels:
+                    return False # reading V or C, or leaving the section
+                worklist.append(labels[instruction.operand])
+                if instruction.opcode != 'BR':
+                    worklist.append(i + 1)
+            elif instruction.opcode in ('CALL', 'MOVFLGA', 'ROLA', 'ROLX', 'RORA', 'RORX'):
+                return False
+            else:
+                worklist.append(i + 1)
+        return True
+
+    def __replace(self, results):
+        changed = results != self.__instructions
+        self.__instructions = results
+        return changed
+
+    def __stack_amount(self, instruction):
+        if instruction.opcode in ('ADDSP', 'SUBSP') and instruction.mode == 'i' and instruction.operand.isdigit():
+            return int(instruction.operand) if instruction.opcode == 'ADDSP' else -int(instruction.operand)
+        return None
+
+    def __count(self, instructions):
+        return sum(1 for instruction in instructions if not instruction.is_directive)
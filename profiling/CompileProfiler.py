@@ -0,0 +1,125 @@
+import contextlib
+import functools
+import time
+import tracemalloc
+
+def record(entries, name, seconds):
+    """Adds one call lasting seconds to entries[name]"""
+    entry = entries.setdefault(name, {'seconds': 0.0, 'calls': 0})
+    entry['seconds'] += seconds
+    entry['calls'] += 1
+    return entry
+
+
+class CompileProfiler():
+    """
+        Where compile time goes: wall time and calls of every phase of the
+        translation (parse, analysis, code generation...), of every
+        optimization pass and of every visit_* method of the instrumented
+        visitors, plus the peak of memory allocated by Python (tracemalloc).
+        Visits are keyed by the class of the visitor, inherited methods
+        included. Their times are inclusive, a recursive visit or a super()
+        call being only counted once; self_seconds leaves out the nested visits.
+        report() is a JSON compatible dict, merge() adds several of them up.
+    """
+
+    def __init__(self, name=None) -> None:
+        self.name = name
+        self.phases = dict()    # phase -> {'seconds', 'calls'}
+        self.passes = dict()    # optimization pass -> {'seconds', 'calls'}, filled by the pass managers
+        self.visitors = dict()  # 'Class.visit_Node' -> {'seconds', 'self_seconds', 'calls'}
+        self.peak_memory = 0
+        self.__stack = list()   # [visitor, name, method, time spent in the nested visits] of the running visits
+        self.__start = None
+        self.__elapsed = 0.0
+        self.__tracing = False  # True when tracemalloc was started by this profiler
+
+    def __enter__(self):
+        self.__tracing = not tracemalloc.is_tracing()
+        if self.__tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        self.__start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.__elapsed = time.perf_counter() - self.__start
+        self.peak_memory = max(self.peak_memory, tracemalloc.get_traced_memory()[1])
+        if self.__tracing:
+            tracemalloc.stop()
+        return False
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record(self.phases, name, time.perf_counter() - start)
+
+    @contextlib.contextmanager
+    def instrument(self, *classes):
+        """Times the visit_* methods of the classes and of their bases while the context is active"""
+        originals = list()
+        # wrapping every method once, where it is defined, but not those of the ast module
+        owners = dict.fromkeys(base for cls in classes for base in cls.__mro__
+                               if base.__module__ not in ('ast', 'builtins'))
+        for owner in owners:
+            for attribute, method in list(vars(owner).items()):
+                if attribute.startswith('visit_') and callable(method):
+                    originals.append((owner, attribute, method))
+                    setattr(owner, attribute, self.__timed(attribute, method))
+        try:
+            yield self
+        finally:
+            for cls, attribute, method in originals:
+                setattr(cls, attribute, method)
+
+    def report(self):
+        return {
+            'file': self.name,
+            'seconds': self.__elapsed,
+            'peak_memory_bytes': self.peak_memory,
+            'phases': self.phases,
+            'passes': self.passes,
+            'visitors': dict(sorted(self.visitors.items(), key=lambda item: -item[1]['self_seconds'])),
+        }
+
+    @staticmethod
+    def merge(reports):
+        """Aggregate report of several compilations (a batch), with the files it covers"""
+        total = {'files': [r['file'] for r in reports], 'seconds': 0.0, 'peak_memory_bytes': 0,
+                 'phases': dict(), 'passes': dict(), 'visitors': dict()}
+        for r in reports:
+            total['seconds'] += r['seconds']
+            total['peak_memory_bytes'] = max(total['peak_memory_bytes'], r['peak_memory_bytes'])
+            for section in ('phases', 'passes', 'visitors'):
+                for name, entry in r[section].items():
+                    merged = total[section].setdefault(name, dict.fromkeys(entry, 0))
+                    for field, value in entry.items():
+                        merged[field] += value
+        total['visitors'] = dict(sorted(total['visitors'].items(), key=lambda item: -item[1]['self_seconds']))
+        return total
+
+    def __timed(self, attribute, method):
+        @functools.wraps(method)
+        def timed(visitor, *args, **kwargs):
+            name = f'{type(visitor).__name__}.{attribute}'
+            if self.__stack and self.__stack[-1][:2] == [visitor, name] and self.__stack[-1][2] is not method:
+                return method(visitor, *args, **kwargs) # super() call, timed by the overriding method
+            self.__stack.append([visitor, name, method, 0.0])
+            start = time.perf_counter()
+            try:
+                return method(visitor, *args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                nested = self.__stack.pop()[3]
+                if self.__stack:
+                    self.__stack[-1][3] += elapsed
+                entry = self.visitors.setdefault(name, {'seconds': 0.0, 'self_seconds': 0.0, 'calls': 0})
+                entry['calls'] += 1
+                entry['self_seconds'] += elapsed - nested
+                if all(frame[1] != name for frame in self.__stack): # else already in the outer recursive visit
+                    entry['seconds'] += elapsed
+        return timed
+
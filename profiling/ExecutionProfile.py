@@ -0,0 +1,63 @@
+import hashlib
+import json
+
+HOT_RATIO = 8 # a line is hot when executed at least 1/HOT_RATIO times as often as the hottest one
+
+class ExecutionProfile():
+    """
+        Executions of every source line in a training run (--pgo-train),
+        read back by the profile guided optimizations (--pgo-profile). A
+        line counts the executions of its most executed instruction, so a
+        statement line gives how many times the statement ran, a loop header
+        how many times its test ran and a def line how many times the
+        function was entered. Lines never reached count 0, lines without
+        code are missing. The training program is translated without
+        optimizations: every statement keeps its own instructions.
+    """
+
+    def __init__(self, lines=None, digest=None) -> None:
+        self.lines = dict(lines or {}) # source line -> executions
+        self.digest = digest           # of the source the profile was recorded on
+        self.hottest = max(self.lines.values(), default=0)
+
+    @classmethod
+    def record(cls, source_map, executions, source):
+        """Profile of a finished run, from the line table of the program and the executions of every address"""
+        lines = dict()
+        for _, line, _ in source_map.rows:
+            if line is not None:
+                lines.setdefault(line, 0)
+        for address, count in executions.items():
+            location = source_map.find(address)
+            if location is not None:
+                lines[location[0]] = max(lines[location[0]], count)
+        return cls(lines, cls.fingerprint(source))
+
+    @classmethod
+    def load(cls, path, source):
+        """Profile saved at path, which must have been recorded on source"""
+        with open(path) as f:
+            contents = json.load(f)
+        if contents['source'] != cls.fingerprint(source):
+            raise ValueError(f'{path} was recorded on another version of {contents["file"]}, train again')
+        return cls({int(line): count for line, count in contents['lines'].items()}, contents['source'])
+
+    def map(self, input_file=None):
+        return {'file': input_file, 'source': self.digest, 'lines': dict(sorted(self.lines.items()))}
+
+    @staticmethod
+    def fingerprint(source):
+        return hashlib.sha256(source.encode()).hexdigest()
+
+    ####
+    ## Queries of the optimizations, on nodes or instructions located in the source
+    ####
+
+    def count(self, location):
+        """Executions of the line of an AST node or of a (line, column) source, None when unknown"""
+        line = location[0] if isinstance(location, tuple) else getattr(location, 'lineno', None)
+        return self.lines.get(line)
+
+    def hot(self, location):
+        count = self.count(location)
+        return count is not None and count > 0 and count * HOT_RATIO >= self.hottest
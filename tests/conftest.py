@@ -0,0 +1,37 @@
+import ast
+import pytest
+import translator
+
+MAX_STEPS = 1_000_000
+
+@pytest.fixture
+def cpython():
+    """The values a program prints under CPython, reading inputs"""
+    def run(source, inputs=()):
+        printed = list()
+        values = iter(inputs)
+        namespace = {'input': lambda: str(next(values)), 'print': printed.append}
+        exec(compile(source, '<test>', 'exec'), namespace)
+        return printed
+    return run
+
+@pytest.fixture
+def emulate():
+    """The finished emulator of source translated and run on inputs"""
+    def run(source, inputs=(), optimize=0):
+        return translator.run(ast.parse(source), inputs, optimize, MAX_STEPS)
+    return run
+
+@pytest.fixture
+def code():
+    """The instructions and directives translated from source, without their labels and comments"""
+    def translate(source, optimize=0, **options):
+        lines = list()
+        for line in translator.translate(ast.parse(source), optimize, **options).split('\n'):
+            line = line.split(';', 1)[0]
+            if line and not line[0].isspace():
+                line = line.split(':', 1)[1] # dropping the label
+            if line.strip():
+                lines.append(' '.join(line.split()))
+        return lines
+    return translate
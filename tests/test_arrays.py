@@ -0,0 +1,68 @@
+import ast
+import os
+import pytest
+import translator
+from emulator.Assembler import Assembler
+from emulator.Emulator import Emulator
+
+SAMPLES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '_samples', '5_arrays')
+
+RUNS = [('eratosthenes.py', [60]), ('eratosthenes_local.py', [60]), ('fibo_cached.py', [20]),
+        ('global_read.py', [3, 5, 10, 20, 30, -40, 50]), ('local_read.py', [3, 4, 10, 20, 30, -40])]
+
+REUSED = '''
+def fresh(n):
+    cells_ = [0] * n
+    total = 0
+    i = 0
+    while i < n:
+        total = total + cells_[i]
+        cells_[i] = i + 7
+        i = i + 1
+    return total
+
+def stored(k):
+    small_ = [0] * 4
+    small_[0] = k
+    small_[3] = small_[0] + 1
+    r = small_[3]
+    return r
+
+n = int(input())
+a = fresh(n)
+print(a)
+b = fresh(n)
+print(b)
+c = stored(n)
+print(c)
+'''
+
+def sample(name):
+    with open(os.path.join(SAMPLES, name)) as f:
+        return f.read()
+
+@pytest.mark.parametrize('optimize', [0, 1, 2])
+@pytest.mark.parametrize('name, inputs', RUNS)
+def test_array_samples_print_the_same(cpython, emulate, name, inputs, optimize):
+    assert emulate(sample(name), inputs, optimize).output == cpython(sample(name), inputs)
+
+def test_global_arrays_are_static_blocks_indexed_by_x(code):
+    instructions = code(sample('global_read.py'))
+    assert '.BLOCK 50' in instructions # 25 cells
+    assert 'STWA word_,x' in instructions and 'DECO word_,x' in instructions
+
+def test_frame_arrays_are_indexed_on_the_stack(code):
+    instructions = code(sample('eratosthenes_local.py'))
+    assert [i for i in instructions if i.endswith('mprime_,sx')]
+
+@pytest.mark.parametrize('optimize', [0, 1, 2])
+def test_heap_arrays_are_zeroed_and_released(cpython, optimize):
+    assembler = Assembler(translator.program_instructions(ast.parse(REUSED), optimize)).assemble()
+    emulator = Emulator(assembler.image, [12]).run()
+    assert emulator.output == cpython(REUSED, [12]) == [0, 0, 13]
+    # every function returned its cells to the heap
+    heap = assembler.symbols['rt_heap']
+    assert (emulator.memory[heap] << 8 | emulator.memory[heap + 1]) == assembler.symbols['rt_hbase']
+
+def test_heap_arrays_are_reached_through_the_frame(code):
+    assert [i for i in code(REUSED) if i.endswith('mcells_,sfx')]
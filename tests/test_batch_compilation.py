@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+import translator
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SOURCES = {
+    'add.py': 'a = int(input())\nb = a + 3\nprint(b)\n',
+    os.path.join('nested', 'loop.py'): 'i = 0\nwhile i < 4:\n    print(i)\n    i = i + 1\n',
+    os.path.join('nested', 'deeper', 'call.py'):
+        'def f(x):\n    y = x - 1\n    return y\n\nw = 5\nz = f(w)\nprint(z)\n',
+}
+
+def write_sources(directory, sources=SOURCES):
+    for name, source in sources.items():
+        path = directory / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(source)
+
+def single_file(path):
+    """The assembly printed by the single file mode for path"""
+    result = subprocess.run([sys.executable, os.path.join(ROOT, 'translator.py'), '-f', str(path), '--no-cache'],
+                            capture_output=True, text=True, check=True)
+    return result.stdout
+
+def test_inputs_are_collected_once_and_sorted(tmp_path):
+    write_sources(tmp_path)
+    (tmp_path / 'notes.txt').write_text('not python')
+    inputs = translator.collect_inputs([str(tmp_path), str(tmp_path / '*.py'), str(tmp_path / 'nested' / 'loop.py')])
+    assert inputs == sorted(str(tmp_path / name) for name in SOURCES)
+
+def test_outputs_mirror_the_inputs_in_out_dir(tmp_path):
+    write_sources(tmp_path / 'src')
+    assert translator.compile_batch([str(tmp_path / 'src')], 2, str(tmp_path / 'out')) == 0
+    for name in SOURCES:
+        target = tmp_path / 'out' / (os.path.splitext(name)[0] + '.pep')
+        assert target.read_text() == single_file(tmp_path / 'src' / name)
+
+def test_outputs_default_to_next_to_the_inputs(tmp_path):
+    write_sources(tmp_path)
+    assert translator.compile_batch([str(tmp_path / 'nested' / '**' / '*.py')], 1) == 0
+    assert sorted(p.name for p in tmp_path.rglob('*.pep')) == ['call.pep', 'loop.pep']
+
+def test_failures_do_not_stop_the_batch(tmp_path, capsys):
+    write_sources(tmp_path, {'broken.py': 'a = (\n', **SOURCES})
+    assert translator.compile_batch([str(tmp_path)], 2) == 1
+    assert not (tmp_path / 'broken.pep').exists()
+    assert len(list(tmp_path.rglob('*.pep'))) == len(SOURCES)
+    assert '; Compiled 3/4 files' in capsys.readouterr().out
+
+def test_no_inputs_is_an_error(tmp_path):
+    assert translator.compile_batch([str(tmp_path / '*.py')]) == 1
@@ -0,0 +1,64 @@
+import pytest
+
+LOOP = '''
+n = int(input())
+i = 0
+evens = 0
+while i < n:
+    if i == 3:
+        evens = evens + 10
+    else:
+        evens = evens + 1
+    i = i + 1
+print(evens)
+'''
+
+NESTED = '''
+a = int(input())
+b = int(input())
+r = 0
+if a > 0:
+    if b > 0:
+        r = 1
+    else:
+        r = 2
+else:
+    r = 3
+print(r)
+'''
+
+COUNTDOWN = '''
+n = int(input())
+while n > 0:
+    print(n)
+    n = n - 1
+'''
+
+@pytest.mark.parametrize('inputs', [[0], [1], [6]])
+def test_rotated_loop_prints_the_same(cpython, emulate, inputs):
+    assert emulate(LOOP, inputs, 1).output == cpython(LOOP, inputs)
+
+def test_loops_are_rotated(code, emulate):
+    assert [i for i in code(LOOP, 0) if i.startswith('BR test_')]
+    instructions = code(LOOP, 1)
+    # the test at the top only guards the first iteration, a copy of it closes the loop
+    assert not [i for i in instructions if i.startswith('BR test_')]
+    assert [i for i in instructions if i.startswith('BRGE end_l_')]
+    assert [i for i in instructions if i.startswith('BRLT ')]
+    assert emulate(LOOP, [20], 1).mnemonics['BR'] < emulate(LOOP, [20], 0).mnemonics['BR']
+
+@pytest.mark.parametrize('inputs', [[1, 1], [1, -1], [-1, 0], [0, 5]])
+def test_threaded_branches_print_the_same(cpython, emulate, inputs):
+    assert emulate(NESTED, inputs, 1).output == cpython(NESTED, inputs)
+
+def test_branches_to_branches_are_threaded(code):
+    # the inner if/else leaves straight to the end of the outer one
+    jumps = [i.split()[1] for i in code(NESTED, 1) if i.startswith('BR ')]
+    assert len(jumps) == 3 and jumps[0] == 'tl' and jumps[1] == jumps[2]
+    assert len(set(i for i in code(NESTED, 0) if i.startswith('BR '))) == 3
+
+@pytest.mark.parametrize('inputs', [[0], [3]])
+def test_condition_codes_are_reused(cpython, emulate, code, inputs):
+    assert emulate(COUNTDOWN, inputs, 1).output == cpython(COUNTDOWN, inputs)
+    # SUBA sets N and Z for the test closing the rotated loop, LDWA for the one guarding it
+    assert 'CPWA 0,i' in code(COUNTDOWN, 0) and 'CPWA 0,i' not in code(COUNTDOWN, 1)
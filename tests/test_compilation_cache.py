@@ -0,0 +1,113 @@
+import ast
+import os
+import threading
+import time
+import translator
+from cache.CompilationCache import CompilationCache
+
+SOURCE = 'a = int(input())\nb = a + 3\nprint(b)\n'
+REFORMATTED = '# the same program\na = int(input())   # read\n\nb = a + 3\nprint(b)\n'
+
+def entries(directory):
+    return sorted(name for name in os.listdir(directory) if not name.startswith('.'))
+
+def aged(cache, key, seconds):
+    """Makes the entry of key look last used seconds ago"""
+    path = os.path.join(cache.directory, key + '.pep')
+    then = time.time() - seconds
+    os.utime(path, (then, then))
+
+def test_hits_skip_the_translation(tmp_path, monkeypatch):
+    cache = CompilationCache(str(tmp_path), 'test')
+    first = translator.process('a.py', ast.parse(SOURCE), cache)
+    assert len(entries(tmp_path)) == 1
+
+    def translate(*args, **kwargs):
+        raise AssertionError('translated on a cache hit')
+    monkeypatch.setattr(translator, 'translate', translate)
+    # comments and layout are not part of the key, the header still names the input
+    assert translator.process('b.py', ast.parse(REFORMATTED), cache) == first.replace('a.py', 'b.py')
+
+def test_entries_hold_the_translation(tmp_path):
+    cache = CompilationCache(str(tmp_path), 'test')
+    translator.process('a.py', ast.parse(SOURCE), cache)
+    with open(tmp_path / entries(tmp_path)[0]) as f:
+        assert f.read() == translator.translate(ast.parse(SOURCE))
+
+def test_keys_change_with_the_program_the_options_and_the_version(tmp_path):
+    cache = CompilationCache(str(tmp_path), 'test')
+    key = cache.key(ast.parse(SOURCE))
+    assert cache.key(ast.parse(REFORMATTED)) == key
+    assert cache.key(ast.parse(SOURCE.replace('3', '4'))) != key
+    assert cache.key(ast.parse(SOURCE), 1) != key
+    assert CompilationCache(str(tmp_path), 'other').key(ast.parse(SOURCE)) != key
+
+def test_a_new_version_misses(tmp_path):
+    translator.process('a.py', ast.parse(SOURCE), CompilationCache(str(tmp_path), 'old'))
+    cache = CompilationCache(str(tmp_path), 'new')
+    assert cache.get(cache.key(ast.parse(SOURCE))) is None
+    translator.process('a.py', ast.parse(SOURCE), cache)
+    assert len(entries(tmp_path)) == 2
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = CompilationCache(str(tmp_path), 'test', max_entries=3)
+    for age, key in zip((30, 20, 10), 'abc'):
+        cache.put(key, f'; {key}\n')
+        aged(cache, key, age)
+    assert cache.get('a') == '; a\n' # now the most recently used
+    cache.put('d', '; d\n')
+    kept = entries(tmp_path)
+    assert 'b.pep' not in kept and {'a.pep', 'd.pep'} <= set(kept) and len(kept) <= 3
+
+def test_entries_are_evicted_over_the_size_bound(tmp_path):
+    cache = CompilationCache(str(tmp_path), 'test', max_bytes=250)
+    for age, key in zip((30, 20), 'ab'):
+        cache.put(key, key * 100)
+        aged(cache, key, age)
+    cache.put('c', 'c' * 100)
+    assert entries(tmp_path) == ['b.pep', 'c.pep']
+
+def test_instances_count_the_entries_of_the_others(tmp_path):
+    caches = [CompilationCache(str(tmp_path), 'test', max_entries=100) for _ in range(8)]
+    for i in range(100):
+        for worker, cache in enumerate(caches):
+            cache.put(f'{worker}_{i}', '; entry\n')
+            assert len(entries(tmp_path)) <= 100
+
+def test_concurrent_writers_stay_near_the_bound(tmp_path):
+    writers, peaks = 8, list()
+
+    def write(worker):
+        cache = CompilationCache(str(tmp_path), 'test', max_entries=100)
+        peak = 0
+        for i in range(100):
+            cache.put(f'{worker}_{i}', '; entry\n')
+            peak = max(peak, len(entries(tmp_path)))
+        peaks.append(peak)
+    threads = [threading.Thread(target=write, args=(worker,)) for worker in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # every writer may add its entry before one of them evicts
+    assert max(peaks) <= 100 + writers and len(entries(tmp_path)) <= 100
+
+def test_batch_workers_share_the_cache(tmp_path):
+    for name in ('one', 'two'):
+        (tmp_path / f'{name}.py').write_text(SOURCE)
+    directory = str(tmp_path / 'cache')
+    assert translator.compile_batch([str(tmp_path / '*.py')], 2, None, directory) == 0
+    assert len(entries(directory)) == 1
+    assert (tmp_path / 'one.pep').read_text() == translator.compile_source(SOURCE, str(tmp_path / 'one.py'))
+
+def test_only_the_translator_sources_change_the_version(tmp_path, monkeypatch):
+    for path in ('translator.py', 'visitors/Visitor.py', 'tests/test_visitor.py', 'bench.py', 'differential.py'):
+        (tmp_path / path).parent.mkdir(exist_ok=True)
+        (tmp_path / path).write_text('pass\n')
+    monkeypatch.setattr(translator, '__file__', str(tmp_path / 'translator.py'))
+    version = translator.translator_version()
+    for path in ('tests/test_visitor.py', 'bench.py', 'differential.py'):
+        (tmp_path / path).write_text('edited = True\n')
+    assert translator.translator_version() == version
+    (tmp_path / 'visitors/Visitor.py').write_text('edited = True\n')
+    assert translator.translator_version() != version
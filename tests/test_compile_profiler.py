@@ -0,0 +1,43 @@
+import ast
+import translator
+from profiling.CompileProfiler import CompileProfiler
+
+SOURCE = '''
+def scaled(n):
+    r = n * 3
+    return r
+
+a = int(input())
+b = a + 1
+c = scaled(b)
+print(c)
+'''
+
+def profiled(optimize=0):
+    profiler = CompileProfiler('a.py')
+    with profiler, translator.instrument(profiler):
+        translator.translate(ast.parse(SOURCE), optimize)
+    return profiler.report()
+
+def test_visits_are_keyed_by_the_class_of_the_visitor():
+    visitors = profiled()['visitors']
+    # inherited from InstructionVisitor
+    assert {'TopLevelProgram.visit_BinOp', 'TopLevelProgram.visit_Call', 'FunctionBodyVisitor.visit_BinOp'} \
+        <= set(visitors)
+    assert not [name for name in visitors if name.startswith('InstructionVisitor.')]
+
+def test_super_calls_are_counted_once():
+    visitors = profiled()['visitors']
+    # a, b and c, TopLevelProgram.visit_Assign calling InstructionVisitor.visit_Assign
+    assert visitors['TopLevelProgram.visit_Assign']['calls'] == 3
+    assert visitors['FunctionBodyVisitor.visit_Assign']['calls'] == 1
+
+def test_nested_visits_are_counted_once():
+    report = profiled()
+    visitors = report['visitors']
+    # int(input()) nests a Call in a Call, only the outer one is in the inclusive time
+    assert visitors['TopLevelProgram.visit_Call']['calls'] == 4
+    module = visitors['TopLevelProgram.visit_Module']['seconds']
+    assert all(entry['seconds'] <= module for name, entry in visitors.items() if name.startswith('TopLevelProgram.'))
+    assert all(entry['self_seconds'] <= entry['seconds'] for entry in visitors.values())
+    assert sum(entry['self_seconds'] for entry in visitors.values()) <= report['seconds']
@@ -0,0 +1,62 @@
+import pytest
+
+FOLDED = '''
+_LIMIT = 10
+a = int(input())
+b = 6 * 7
+c = b + 8
+if c > 40:
+    a = a + c
+else:
+    a = a - c
+print(a)
+d = _LIMIT - 3
+print(d)
+'''
+
+@pytest.mark.parametrize('inputs', [[5], [-100]])
+def test_folded_program_prints_the_same(cpython, emulate, inputs):
+    assert emulate(FOLDED, inputs, 1).output == cpython(FOLDED, inputs)
+
+def test_constants_become_immediate_operands(code):
+    instructions = code(FOLDED, 1)
+    assert 'ADDA 50,i' in instructions and 'DECO 7,i' in instructions
+    # no instruction computes or reads the folded variables anymore
+    assert not [i for i in instructions if i.split()[-1] in ('b,d', 'c,d', 'd,d', '_LIMIT,i')]
+
+def test_folded_program_runs_fewer_instructions(emulate):
+    source = FOLDED.replace('6 * 7', '40 + 2')
+    assert emulate(source, [5], 1).instructions < emulate(source, [5], 0).instructions
+
+def test_folding_wraps_like_pep9(emulate):
+    source = 'a = 300\nb = a * 300\nprint(b)\nc = 32767 + 1\nprint(c)\n'
+    assert emulate(source, [], 1).output == [90000 - 65536, -32768]
+
+def test_variables_assigned_in_loops_are_not_propagated(cpython, emulate):
+    source = '''
+x = 1
+n = int(input())
+i = 0
+while i < n:
+    x = x + 2
+    i = i + 1
+print(x)
+'''
+    for inputs in ([0], [4]):
+        assert emulate(source, inputs, 1).output == cpython(source, inputs)
+
+def test_parameters_and_reassigned_locals_are_not_propagated(cpython, emulate):
+    source = '''
+def f(a):
+    b = 5
+    if a > 3:
+        b = a
+    c = b + 1
+    return c
+
+n = int(input())
+r = f(n)
+print(r)
+'''
+    for inputs in ([2], [9]):
+        assert emulate(source, inputs, 1).output == cpython(source, inputs)
@@ -0,0 +1,55 @@
+import pytest
+
+DEAD = '''
+def f(a):
+    dead = a + 1
+    dead = a + 2
+    r = a + a
+    return r
+    print(a)
+
+unused = 7
+g = 0
+def read_g(v):
+    r = v + g
+    return r
+
+x = int(input())
+g = x + 1
+y = f(x)
+print(y)
+z = read_g(y)
+print(z)
+w = 3
+w = 4
+print(w)
+'''
+
+@pytest.mark.parametrize('optimize', [0, 1, 2])
+@pytest.mark.parametrize('inputs', [[5], [-9]])
+def test_eliminated_program_prints_the_same(cpython, emulate, optimize, inputs):
+    assert emulate(DEAD, inputs, optimize).output == cpython(DEAD, inputs)
+
+def test_dead_stores_and_computations_are_removed(code):
+    kept, eliminated = code(DEAD, 0), code(DEAD, 1)
+    for instruction in ('ADDA 2,i', 'STWA mdead,s', 'DECO ma,s'):
+        assert instruction in kept and instruction not in eliminated
+    assert 'STWA g,d' in eliminated # read by read_g after the store, through the CALL
+
+def test_unused_globals_are_not_allocated(code):
+    assert '.WORD 7' in code(DEAD, 0) and '.WORD 7' not in code(DEAD, 1)
+
+def test_constant_conditions_prune_their_branch(code, emulate):
+    source = '''
+_LIMIT = 10
+a = int(input())
+if _LIMIT > 40:
+    a = a - 50
+else:
+    a = a + 50
+print(a)
+'''
+    instructions = code(source, 1)
+    assert 'SUBA 50,i' not in instructions
+    assert not [i for i in instructions if i.startswith('BR') and i != 'BR tl']
+    assert emulate(source, [5], 1).output == [55]
@@ -0,0 +1,24 @@
+import os
+import subprocess
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SUM = 'a = int(input())\nb = int(input())\nc = a + b\nprint(c)\n'
+
+def translator(tmp_path, *options):
+    path = tmp_path / 'sum.py'
+    path.write_text(SUM)
+    return subprocess.run([sys.executable, os.path.join(ROOT, 'translator.py'), '-f', str(path), *options],
+                          capture_output=True, text=True, cwd=tmp_path)
+
+def test_run_reports_the_output(tmp_path):
+    result = translator(tmp_path, '--run', '--input', '1', '2')
+    assert result.returncode == 0 and '; Output: 3' in result.stdout
+
+@pytest.mark.parametrize('options', [['--run'], ['--pgo-train', 'sum.json']])
+def test_missing_inputs_are_a_one_line_error(tmp_path, options):
+    result = translator(tmp_path, *options, '--input', '1')
+    assert result.returncode == 1
+    assert result.stderr == 'translator.py: error: DECI executed with no input left\n'
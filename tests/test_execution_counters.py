@@ -0,0 +1,60 @@
+import ast
+import json
+import os
+import subprocess
+import sys
+import pytest
+import translator
+from generators.ExecutionCounters import ExecutionCounters
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COUNTED = '''def f(v):
+    w = v + 1
+    return w
+
+n = int(input())
+i = 0
+while i < n:
+    if i < 2:
+        r = f(i)
+        print(r)
+    else:
+        print(i)
+    i = i + 1
+'''
+
+def counted(source, inputs, optimize=0):
+    counters = ExecutionCounters()
+    emulator = translator.run(ast.parse(source), inputs, optimize, counters=counters)
+    return emulator, counters
+
+def counts(counters, kind):
+    return {counter['line']: counter['count'] for counter in counters.counters if counter['kind'] == kind}
+
+@pytest.mark.parametrize('optimize', [0, 1])
+def test_statements_count_their_executions(cpython, optimize):
+    emulator, counters = counted(COUNTED, [5], optimize)
+    assert emulator.output == cpython(COUNTED, [5])
+    assert counters.lines() == {2: 2, 3: 2, 5: 1, 6: 1, 7: 1, 8: 5, 9: 2, 10: 2, 12: 3, 13: 5}
+
+def test_loop_headers_branches_and_entries_are_counted():
+    _, counters = counted(COUNTED, [5])
+    assert counts(counters, 'loop') == {7: 6} # the last test leaves the loop
+    assert counts(counters, 'if') == {8: 2} and counts(counters, 'else') == {12: 3}
+    assert [(c['function'], c['count']) for c in counters.counters if c['kind'] == 'function'] == [('f', 2)]
+
+def test_optimizations_keep_the_counts():
+    source = 'n = int(input())\ni = 0\nwhile i < n:\n    i = i + 1\nprint(i)\n'
+    lines = [counted(source, [4], optimize)[1].lines() for optimize in (0, 1, 2)]
+    assert lines[0] == lines[1] == lines[2] == {1: 1, 2: 1, 3: 1, 4: 4, 5: 1}
+
+def test_counter_map_is_written_next_to_the_input(tmp_path):
+    path = tmp_path / 'counted.py'
+    path.write_text(COUNTED)
+    subprocess.run([sys.executable, os.path.join(ROOT, 'translator.py'), '-f', str(path), '--instrument', '--run',
+                    '--input', '5'], capture_output=True, check=True)
+    with open(tmp_path / 'counted.counters.json') as f:
+        counter_map = json.load(f)
+    assert counter_map['file'] == str(path)
+    assert counter_map['lines'] == {str(line): n for line, n in counted(COUNTED, [5])[1].lines().items()}
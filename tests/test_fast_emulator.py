@@ -0,0 +1,38 @@
+import ast
+import pytest
+import bench
+from emulator.Assembler import Assembler
+from emulator.Emulator import Emulator, EmulatorError
+from emulator.FastEmulator import FastEmulator
+from translator import program_instructions
+
+# workloads the reference Emulator runs in well under a second, every one long enough to translate traces
+WORKLOADS = ['7_profiles/branch_layout.py', '7_profiles/hot_inlining.py', 'stress/sum_rec_250',
+             'stress/fibonnaci_1000', 'stress/eratosthenes_1000', 'stress/eratosthenes_local_1000']
+
+def image(name, optimize):
+    for workload, source, inputs in bench.workloads():
+        if workload == name:
+            return Assembler(program_instructions(ast.parse(source), optimize)).assemble().image, inputs
+    raise KeyError(name)
+
+def finished(emulator):
+    """Everything a run leaves behind, or the error stopping it"""
+    try:
+        e = emulator.run()
+    except EmulatorError as error:
+        return str(error)
+    return (e.output, e.text, e.statistics(), dict(e.executions), bytes(e.memory),
+            e.a, e.x, e.sp, e.pc, int(e.n), int(e.z), int(e.v), int(e.c), e.halted)
+
+@pytest.mark.parametrize('name', WORKLOADS)
+@pytest.mark.parametrize('optimize', [0, 2])
+def test_same_results_as_the_reference(name, optimize):
+    program, inputs = image(name, optimize)
+    assert finished(FastEmulator(program, inputs)) == finished(Emulator(program, inputs))
+
+@pytest.mark.parametrize('max_steps', [1, 500, 4321, 20_000])
+def test_step_limit_is_exact(max_steps):
+    # the limit falls in cold blocks, then in traces
+    program, inputs = image('stress/eratosthenes_1000', 1)
+    assert finished(FastEmulator(program, inputs, max_steps)) == finished(Emulator(program, inputs, max_steps))
@@ -0,0 +1,91 @@
+import ast
+import pytest
+from visitors.ProgramAnalysis import ProgramAnalysis
+from optimizers.FrameLayout import FrameLayout
+
+FUNCTIONS = '''
+def f(n):
+    a = n + 1
+    print(a)
+    b = n + 2
+    print(b)
+    c = a
+    print(c)
+    return n
+
+def g(n):
+    a = n + 1
+    i = 0
+    while i < n:
+        t = i + a
+        print(t)
+        i = i + 1
+    u = n + 3
+    print(u)
+    return u
+
+def h(n):
+    x = n + 1
+    if n > 0:
+        y = n + 2
+        print(y)
+    else:
+        z = n + 3
+        print(z)
+    print(x)
+    return x
+
+def k(n):
+    cells_ = [0] * 4
+    d = n + 1
+    cells_[1] = d
+    e = cells_[1]
+    return e
+
+v = int(input())
+r = f(v)
+r = g(v)
+r = h(v)
+r = k(v)
+print(r)
+'''
+
+def functions(frame_layout=None):
+    return ProgramAnalysis(frame_layout).analyze(ast.parse(FUNCTIONS)).functions
+
+def slots():
+    return {name: function.slots for name, function in functions(FrameLayout()).items()}
+
+@pytest.mark.parametrize('inputs', [[-2], [0], [3]])
+def test_shared_slots_print_the_same(cpython, emulate, inputs):
+    assert emulate(FUNCTIONS, inputs, 1).output == cpython(FUNCTIONS, inputs)
+
+def test_locals_live_at_the_same_time_keep_their_slots():
+    layout = slots()['f']
+    assert layout['a'] != layout['b'] # b is assigned while a is still to be read by c
+    assert layout['c'] == 'a'         # a is dead once copied into c
+
+def test_loop_locals_keep_their_slots_for_the_whole_loop():
+    layout = slots()['g']
+    assert len({layout['a'], layout['i'], layout['t']}) == 3
+    assert layout['u'] in ('a', 't') # assigned after the loop, over a dead slot
+
+def test_exclusive_branches_share_a_slot():
+    layout = slots()['h']
+    assert layout['y'] == layout['z'] != layout['x']
+
+def test_arrays_and_parameters_are_never_shared():
+    for function in functions(FrameLayout()).values():
+        assert not set(function.slots) & set(function.params)
+        assert not set(function.slots) & set(function.arrays)
+        assert not set(function.slots.values()) & set(function.arrays)
+
+def test_sharing_locals_are_placed_at_the_same_offset():
+    f = functions(FrameLayout())['f']
+    assert f.offsets[f.symbols['c']] == f.offsets[f.symbols['a']] != f.offsets[f.symbols['b']]
+
+def test_frames_shrink(emulate):
+    shared, separate = functions(FrameLayout()), functions()
+    assert {name: separate[name].local_size() - shared[name].local_size() for name in shared} == \
+           {'f': 2, 'g': 2, 'h': 2, 'k': 2}
+    assert emulate(FUNCTIONS, [3], 1).stack_high_water == emulate(FUNCTIONS, [3], 0).stack_high_water - 2
@@ -0,0 +1,64 @@
+import pytest
+
+COUNTED = '''
+n = int(input())
+i = 0
+total = 0
+while i < n:
+    total = total + i
+    i = i + 1
+print(i)
+print(total)
+'''
+
+@pytest.mark.parametrize('inputs', [[0], [1], [7]])
+def test_allocated_loop_prints_the_same(cpython, emulate, inputs):
+    assert emulate(COUNTED, inputs, 2).output == cpython(COUNTED, inputs)
+
+def test_loop_variable_lives_in_x(code, emulate):
+    instructions = code(COUNTED, 2)
+    # loaded before the loop, stored on the exit before the prints read it
+    exit = instructions.index('DECO i,d') - 1
+    assert instructions[exit] == 'STWX i,d'
+    loop = instructions[instructions.index('LDWX i,d') + 1:exit]
+    assert 'CPWX n,d' in loop and 'ADDX 1,i' in loop
+    assert not [i for i in loop if i.startswith(('LDWA i,', 'STWA i,'))]
+    assert emulate(COUNTED, [50], 2).instructions < emulate(COUNTED, [50], 1).instructions
+
+def test_reads_without_x_form_are_preceded_by_a_spill(code):
+    instructions = code(COUNTED, 2)
+    assert instructions[instructions.index('ADDA i,d') - 1] == 'STWX i,d'
+
+def test_nested_loops_allocate_one_loop(cpython, emulate, code):
+    source = '''
+n = int(input())
+i = 0
+count = 0
+while i < n:
+    j = 0
+    while j < i:
+        count = count + 1
+        j = j + 1
+    i = i + 1
+print(count)
+'''
+    for inputs in ([0], [5]):
+        assert emulate(source, inputs, 2).output == cpython(source, inputs)
+    assert len([i for i in code(source, 2) if i.startswith('LDWX')]) == 1
+
+def test_loops_with_calls_keep_x_free(cpython, emulate, code):
+    source = '''
+def twice(v):
+    w = v + v
+    return w
+
+n = int(input())
+i = 0
+while i < n:
+    r = twice(i)
+    print(r)
+    i = i + 1
+'''
+    assert emulate(source, [3], 2).output == cpython(source, [3])
+    instructions = code(source, 2, inline_budget=0) # keeping the call in the loop
+    assert 'CALL twice' in instructions and not [i for i in instructions if i.startswith('LDWX')]
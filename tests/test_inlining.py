@@ -0,0 +1,90 @@
+import pytest
+
+LEAVES = '''
+def square(v):
+    s = v * v
+    return s
+
+def bump(v):
+    v = v + 1
+    return v
+
+def show(v):
+    print(v)
+
+g = 5
+def read_g(v):
+    r = v + g
+    return r
+
+n = int(input())
+a = square(n)
+b = bump(a)
+show(b)
+c = read_g(n)
+print(c)
+print(n)
+'''
+
+RECURSIVE = '''
+def fact(n):
+    if n <= 1:
+        return 1
+    m = n - 1
+    r = fact(m)
+    r = r * n
+    return r
+
+def sign(v):
+    if v < 0:
+        return 0
+    return 1
+
+n = int(input())
+f = fact(n)
+print(f)
+s = sign(n)
+print(s)
+'''
+
+@pytest.mark.parametrize('inputs', [[7], [-3]])
+def test_inlined_program_prints_the_same(cpython, emulate, inputs):
+    assert emulate(LEAVES, inputs, 2).output == cpython(LEAVES, inputs)
+
+def test_leaf_functions_are_inlined_and_removed(code, emulate):
+    calls = [f'CALL {name}' for name in ('square', 'bump', 'show', 'read_g')]
+    assert set(calls) <= set(code(LEAVES, 1))
+    assert not set(calls) & set(code(LEAVES, 2))
+    assert code(LEAVES, 2).count('RET') == 1 # only rt_mul is left
+    assert emulate(LEAVES, [7], 2).instructions < emulate(LEAVES, [7], 1).instructions
+
+def test_budget_limits_the_inlined_bodies(code):
+    instructions = code(LEAVES, 2, inline_budget=4)
+    assert 'CALL square' in instructions and 'CALL show' not in instructions
+    assert 'CALL show' in code(LEAVES, 2, inline_budget=0)
+
+@pytest.mark.parametrize('inputs', [[1], [6], [-2]])
+def test_recursive_and_early_returning_functions_print_the_same(cpython, emulate, inputs):
+    assert emulate(RECURSIVE, inputs, 2).output == cpython(RECURSIVE, inputs)
+
+def test_recursive_and_early_returning_functions_are_kept(code):
+    instructions = code(RECURSIVE, 2)
+    assert 'CALL fact' in instructions and 'CALL sign' in instructions
+
+def test_caller_locals_do_not_shadow_inlined_globals(cpython, emulate):
+    source = '''
+g = 5
+def read_g(v):
+    r = v + g
+    return r
+
+def caller(g):
+    x = read_g(g)
+    return x
+
+n = int(input())
+y = caller(n)
+print(y)
+'''
+    for inputs in ([1], [40]):
+        assert emulate(source, inputs, 2).output == cpython(source, inputs)
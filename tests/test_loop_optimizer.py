@@ -0,0 +1,78 @@
+import pytest
+
+INVARIANT = '''
+n = int(input())
+k = int(input())
+i = 0
+total = 0
+step = 0
+while i < n:
+    step = k + 2
+    j = i * 23
+    total = total + j
+    total = total + step
+    i = i + 1
+print(total)
+print(step)
+'''
+
+@pytest.mark.parametrize('inputs', [[5, 3], [0, 3], [-2, 1], [40, -7]])
+def test_optimized_loop_prints_the_same(cpython, emulate, inputs):
+    # hoisted statements only run when the loop does, step stays 0 without iterations
+    assert emulate(INVARIANT, inputs, 2).output == cpython(INVARIANT, inputs)
+
+def test_invariants_are_hoisted_out_of_the_loop(code):
+    instructions = code(INVARIANT, 2)
+    assert instructions.count('STWA step,d') == 1
+    # computed once before the loop, which keeps i in X
+    assert instructions.index('STWA step,d') < instructions.index('LDWX i,d')
+
+def test_products_of_the_induction_variable_are_reduced(code, emulate):
+    assert 'CALL rt_mul' not in code(INVARIANT, 2) and 'ADDA 23,i' in code(INVARIANT, 2)
+    assert emulate(INVARIANT, [30, 3], 2).instructions < emulate(INVARIANT, [30, 3], 1).instructions
+
+def test_decreasing_induction_variables(cpython, emulate):
+    source = '''
+n = int(input())
+total = 0
+while n > 0:
+    p = n * 37
+    total = total + p
+    n = n - 1
+print(total)
+'''
+    for inputs in ([0], [1], [6]):
+        assert emulate(source, inputs, 2).output == cpython(source, inputs)
+
+def test_variant_statements_stay_in_the_loop(cpython, emulate):
+    source = '''
+n = int(input())
+i = 0
+last = 0
+while i < n:
+    last = i + 5
+    i = i + 1
+print(last)
+'''
+    for inputs in ([0], [4]):
+        assert emulate(source, inputs, 2).output == cpython(source, inputs)
+
+def test_nested_loops(cpython, emulate):
+    source = '''
+n = int(input())
+k = int(input())
+i = 0
+total = 0
+while i < n:
+    j = 0
+    while j < n:
+        base = k + 1
+        cell = j * 19
+        total = total + cell
+        total = total + base
+        j = j + 1
+    i = i + 1
+print(total)
+'''
+    for inputs in ([0, 2], [3, 2], [5, -1]):
+        assert emulate(source, inputs, 2).output == cpython(source, inputs)
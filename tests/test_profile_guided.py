@@ -0,0 +1,61 @@
+import ast
+import pytest
+import translator
+from bench import SAMPLE_INPUTS, read_sample
+
+BRANCH_LAYOUT, HOT_INLINING, LOOP_ORDER = SAMPLES = ['7_profiles/branch_layout.py', '7_profiles/hot_inlining.py',
+                                                     '7_profiles/loop_order.py']
+
+def trained(sample):
+    _, profile = translator.train(ast.parse(read_sample(sample)), read_sample(sample), SAMPLE_INPUTS[sample])
+    return profile
+
+def executed(sample, optimize, profile=None):
+    return translator.run(ast.parse(read_sample(sample)), SAMPLE_INPUTS[sample], optimize, profile=profile).instructions
+
+@pytest.mark.parametrize('optimize', [1, 2])
+@pytest.mark.parametrize('sample', SAMPLES)
+def test_profiles_keep_outputs(cpython, emulate, sample, optimize):
+    source, inputs = read_sample(sample), SAMPLE_INPUTS[sample]
+    guided = translator.run(ast.parse(source), inputs, optimize, profile=trained(sample))
+    assert guided.output == emulate(source, inputs, optimize).output == cpython(source, inputs)
+
+def test_hot_branch_goes_second(code):
+    profile = trained(BRANCH_LAYOUT)
+    # the if branch runs 199 times out of 200: it falls through from the else branch, which the test jumps to
+    assert [i for i in code(read_sample(BRANCH_LAYOUT), 1) if i.startswith('BREQ else_')]
+    assert not [i for i in code(read_sample(BRANCH_LAYOUT), 1, profile=profile) if i.startswith('BREQ else_')]
+    # -O1 has no other profile guided pass, the branch over the else is only taken once
+    assert executed(BRANCH_LAYOUT, 1, profile) == executed(BRANCH_LAYOUT, 1) - 198
+    assert executed(BRANCH_LAYOUT, 2, profile) < executed(BRANCH_LAYOUT, 2)
+
+def test_hot_call_sites_get_a_larger_budget(code):
+    profile = trained(HOT_INLINING)
+    assert 'CALL checksum' in code(read_sample(HOT_INLINING), 2)
+    assert 'CALL checksum' not in code(read_sample(HOT_INLINING), 2, profile=profile)
+    assert executed(HOT_INLINING, 2, profile) < executed(HOT_INLINING, 2)
+
+def test_hottest_loop_keeps_x(code):
+    profile = trained(LOOP_ORDER)
+    # the inner loop only runs once, the outer one 200 times: X goes to the outer loop, not to both
+    loads = [i for i in code(read_sample(LOOP_ORDER), 2, profile=profile) if i.startswith('LDWX')]
+    assert loads == ['LDWX total,d']
+    assert [i for i in code(read_sample(LOOP_ORDER), 2) if i.startswith('LDWX')] == ['LDWX j,d']
+    assert executed(LOOP_ORDER, 2, profile) < executed(LOOP_ORDER, 2)
+
+@pytest.mark.parametrize('optimize', [1, 2])
+def test_swapped_branches_keep_the_static_values(cpython, emulate, optimize):
+    # the if branch, hot in training, goes second: x = 5 is emitted before the x = 3 giving the static value
+    source = '''
+n = int(input())
+if n > 0:
+    y = n
+    x = 3
+else:
+    x = 5
+print(x)
+'''
+    _, profile = translator.train(ast.parse(source), source, [1])
+    for inputs in ([1], [-1]):
+        guided = translator.run(ast.parse(source), inputs, optimize, profile=profile)
+        assert guided.output == emulate(source, inputs, optimize).output == cpython(source, inputs)
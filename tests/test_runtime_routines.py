@@ -0,0 +1,75 @@
+import ast
+import pytest
+import translator
+
+VARIABLE = '''
+a = int(input())
+b = int(input())
+n = int(input())
+product = a * b
+quotient = a // b
+remainder = a % b
+left = a << n
+right = a >> n
+print(product)
+print(quotient)
+print(remainder)
+print(left)
+print(right)
+'''
+
+CONSTANT = '''
+a = int(input())
+double = a * 2
+times_ten = a * 10
+half = a // 4
+low = a % 8
+left = a << 3
+right = a >> 2
+print(double)
+print(times_ten)
+print(half)
+print(low)
+print(left)
+print(right)
+'''
+
+OPERANDS = [[7, 3, 0], [-7, 3, 1], [7, -3, 2], [-7, -3, 3], [0, 5, 4], [181, 181, 5], [-181, 2, 7], [1000, 1, 4]]
+
+@pytest.mark.parametrize('optimize', [0, 1, 2])
+@pytest.mark.parametrize('inputs', OPERANDS)
+def test_routines_compute_like_python(cpython, emulate, optimize, inputs):
+    assert emulate(VARIABLE, inputs, optimize).output == cpython(VARIABLE, inputs)
+
+@pytest.mark.parametrize('optimize', [0, 1, 2])
+@pytest.mark.parametrize('value', [0, 1, 13, -13, 2047, -2048])
+def test_constant_operands_compute_like_python(cpython, emulate, optimize, value):
+    assert emulate(CONSTANT, [value], optimize).output == cpython(CONSTANT, [value])
+
+def test_constant_operands_are_lowered_inline(code):
+    instructions = code(CONSTANT)
+    assert not [i for i in instructions if i.startswith('CALL')]
+    assert 'ASLA' in instructions and 'ASRA' in instructions and 'ANDA 7,i' in instructions
+
+def test_each_routine_is_emitted_once_and_only_when_used():
+    text = translator.translate(ast.parse(VARIABLE + VARIABLE))
+    labels = [line.split(':')[0] for line in text.split('\n') if line.startswith('rt_') and ':' in line]
+    entries = [label for label in labels if label in ('rt_mul', 'rt_div', 'rt_shl', 'rt_shr')]
+    assert sorted(entries) == ['rt_div', 'rt_mul', 'rt_shl', 'rt_shr']
+    assert text.count('CALL rt_mul') == 2 and text.count('CALL rt_div') == 4
+    assert 'rt_' not in translator.translate(ast.parse(CONSTANT))
+
+def test_routines_work_inside_functions(cpython, emulate):
+    source = '''
+def scale(x, y):
+    z = x * y
+    w = z // 3
+    return w
+
+a = int(input())
+b = int(input())
+r = scale(a, b)
+print(r)
+'''
+    for optimize in (0, 1, 2):
+        assert emulate(source, [-20, 7], optimize).output == cpython(source, [-20, 7])
@@ -0,0 +1,72 @@
+import ast
+import itertools
+import json
+import os
+import subprocess
+import sys
+import pytest
+import translator
+from emulator.Assembler import Assembler
+from ir.SourceMap import SourceMap
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SUMMED = '''n = int(input())
+i = 0
+total = 0
+while i < n:
+    total = total + i
+    i = i + 1
+print(total)
+'''
+
+def mapped_run(source, inputs, optimize):
+    source_map = SourceMap()
+    emulator = translator.run(ast.parse(source), inputs, optimize, source_map=source_map)
+    return emulator, source_map
+
+@pytest.mark.parametrize('optimize', [0, 1, 2])
+def test_rows_cover_the_program_in_address_order(optimize):
+    _, source_map = mapped_run(SUMMED, [3], optimize)
+    addresses = [row[0] for row in source_map.rows]
+    assert addresses == sorted(set(addresses)) and addresses[0] == 0
+    assert source_map.rows[0][1] is None # the branch to the top level and the allocations
+    assert {row[1] for row in source_map.rows[1:]} <= set(range(1, SUMMED.count('\n') + 1))
+
+@pytest.mark.parametrize('optimize', [0, 1, 2])
+def test_instructions_are_located_at_their_line(optimize):
+    source_map = SourceMap()
+    instructions = translator.program_instructions(ast.parse(SUMMED), optimize, source_map=source_map)
+    addresses = Assembler(instructions).assemble().addresses
+    for instruction, address in zip(instructions, addresses):
+        if instruction.opcode in ('DECI', 'DECO'):
+            assert source_map.find(address)[0] == (1 if instruction.opcode == 'DECI' else 7)
+
+@pytest.mark.parametrize('optimize', [0, 1, 2])
+def test_executions_are_attributed_to_their_line(optimize):
+    short, short_map = mapped_run(SUMMED, [10], optimize)
+    long, long_map = mapped_run(SUMMED, [20], optimize)
+    short_lines, long_lines = short_map.lines(short.executions), long_map.lines(long.executions)
+    assert short_lines[1] == long_lines[1] and short_lines[7] == long_lines[7]
+    for line in (5, 6): # the loop body runs twice as many times
+        assert long_lines[line] == 2 * short_lines[line]
+    unlocated = sum(n for address, n in short.executions.items() if short_map.find(address) is None)
+    assert sum(short_lines.values()) + unlocated == short.instructions
+
+def test_source_comments_follow_the_line_table():
+    source_map = SourceMap()
+    translator.program_instructions(ast.parse(SUMMED), 1, source_map=source_map)
+    text = translator.translate(ast.parse(SUMMED), 1, source_comments=True)
+    commented = [int(line.split()[-1]) for line in text.split('\n') if line.startswith('; line ')]
+    located = [line for line, _ in itertools.groupby(row[1] for row in source_map.rows) if line is not None]
+    assert commented == located == [1, 4, 5, 6, 4, 7]
+
+def test_line_table_is_written_next_to_the_input(tmp_path):
+    path = tmp_path / 'summed.py'
+    path.write_text(SUMMED)
+    subprocess.run([sys.executable, os.path.join(ROOT, 'translator.py'), '-f', str(path), '-O', '2',
+                    '--source-map'], capture_output=True, check=True)
+    with open(tmp_path / 'summed.map.json') as f:
+        line_table = json.load(f)
+    assert line_table['columns'] == ['address', 'line', 'column']
+    assert line_table['rows'] == mapped_run(SUMMED, [0], 2)[1].rows
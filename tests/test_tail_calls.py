@@ -0,0 +1,90 @@
+import pytest
+
+ROTATING = '''
+def rotate(a, b, c, n):
+    if n == 0:
+        return a
+    m = n - 1
+    return rotate(b, c, a, m)
+
+def swap(x, y, n):
+    if n == 0:
+        return x
+    x = x + y
+    n = n - 1
+    return swap(y, x, n)
+
+k = int(input())
+v = rotate(1, 2, 3, k)
+print(v)
+w = swap(1, 2, k)
+print(w)
+'''
+
+BETWEEN = '''
+def add_to(total, n):
+    if n == 0:
+        return total
+    total = total + n
+    n = n - 1
+    return sum_to(total, n)
+
+def sum_to(total, n):
+    result = add_to(total, n)
+    return result
+
+n = int(input())
+value = sum_to(0, n)
+print(value)
+'''
+
+@pytest.mark.parametrize('optimize', [0, 1, 2])
+@pytest.mark.parametrize('inputs', [[0], [1], [2], [3], [4], [7]])
+def test_rotated_parameters_print_the_same(cpython, emulate, optimize, inputs):
+    # every parameter is read by the new value of another one, the old values must all be read first
+    assert emulate(ROTATING, inputs, optimize).output == cpython(ROTATING, inputs)
+
+def test_tail_calls_become_jumps(code):
+    # only the calls of the top level are left
+    assert code(ROTATING, 0).count('CALL rotate') == 2
+    instructions = code(ROTATING, 1)
+    assert instructions.count('CALL rotate') == 1 and instructions.count('CALL swap') == 1
+
+def test_tail_calls_use_no_stack(emulate):
+    deep = emulate(ROTATING, [200], 1)
+    assert deep.output == emulate(ROTATING, [200], 0).output
+    assert deep.stack_high_water == emulate(ROTATING, [1], 1).stack_high_water
+    assert emulate(ROTATING, [200], 0).stack_high_water > deep.stack_high_water
+
+@pytest.mark.parametrize('inputs', [[0], [10]])
+def test_tail_calls_between_functions_print_the_same(cpython, emulate, inputs):
+    assert emulate(BETWEEN, inputs, 1).output == cpython(BETWEEN, inputs)
+
+def test_tail_calls_between_functions_reuse_the_frame(code, emulate):
+    instructions = code(BETWEEN, 1)
+    assert 'BR sum_to' in instructions and 'BR add_to' in instructions
+    assert emulate(BETWEEN, [100], 1).stack_high_water == emulate(BETWEEN, [1], 1).stack_high_water
+
+@pytest.mark.parametrize('optimize', [0, 1, 2])
+def test_parameters_read_inside_arguments_are_copied_first(cpython, emulate, optimize):
+    # y overwrites x before the cell indexed by the old x is read
+    source = '''
+t_ = [0] * 4
+t_[0] = 100
+t_[1] = 101
+t_[2] = 102
+t_[3] = 103
+
+def f(x, y, n):
+    if n == 0:
+        return y
+    m = n - 1
+    r = f(y, t_[x], m)
+    return r
+
+a = int(input())
+b = int(input())
+v = f(a, b, 1)
+print(v)
+'''
+    assert emulate(source, [1, 3], optimize).output == cpython(source, [1, 3]) == [101]
@@ -1,56 +1,508 @@
 import argparse
 import ast
-from visitors.GlobalVariables import GlobalVariableExtraction
-from visitors.LocalVariables import LocalVariableExtraction
+import contextlib
+import copy
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from visitors.ProgramAnalysis import ProgramAnalysis
+from visitors.InstructionVisitor import InstructionVisitor
 from visitors.TopLevelProgram import TopLevelProgram
-from visitors.FunctionDefinition import FunctionDefinitionVisitor
+from visitors.FunctionDefinition import FunctionDefinitionVisitor, FunctionBodyVisitor
 from generators.StaticMemoryAllocation import StaticMemoryAllocation
 from generators.StackMemoryAllocation import StackMemoryAllocation
 from generators.EntryPoint import EntryPoint
+from generators.ExecutionCounters import ExecutionCounters
+from ir.Instruction import Instruction
+from ir.PassManager import PassManager
+from ir.SourceMap import SourceMap
+from optimizers.ConstantFolding import ConstantFolding
+from optimizers.Inlining import FunctionInlining, Renamer, DEFAULT_BUDGET
+from optimizers.LoopOptimizer import LoopOptimizer
+from optimizers.FrameLayout import FrameLayout
+from optimizers.Peephole import PeepholeOptimizer
+from optimizers.AccumulatorTracking import AccumulatorTracking
+from optimizers.IndexRegisterAllocation import IndexRegisterAllocation
+from optimizers.DeadCodeElimination import DeadCodeElimination
+from optimizers.BranchOptimizer import BranchOptimizer
+from cache.CompilationCache import CompilationCache
+from profiling.CompileProfiler import CompileProfiler
+from profiling.ExecutionProfile import ExecutionProfile
+from emulator.Assembler import Assembler
+from emulator.Emulator import Emulator, EmulatorError
+from emulator.FastEmulator import FastEmulator
+
+__version__ = '1.0.0'
+
+DEFAULT_CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')),
+                                 'assembly-translator')
+
+# visitors whose visit_* methods are timed by --profile
+PROFILED_VISITORS = (ProgramAnalysis, InstructionVisitor, TopLevelProgram, FunctionDefinitionVisitor,
+                     FunctionBodyVisitor, ConstantFolding, Renamer)
 
 def main():
-    input_file, print_ast = process_cli()
-    with open(input_file) as f:
-        source = f.read()
-    node = ast.parse(source)
-    if print_ast:
-        print(ast.dump(node, indent=2))
-    else:
-        process(input_file, node)
-    
+    args = process_cli()
+    if args['batch']:
+        sys.exit(compile_batch(args['batch'], args['jobs'], args['out_dir'], cache_dir(args), args['optimize'],
+                               args['inline_budget'], args['profile'], args['instrument'],
+                               args['source_map'] is not None, args['source_comments']))
+    input_file = args['f']
+    profiler = CompileProfiler(input_file) if args['profile'] else None
+    counters = ExecutionCounters() if args['instrument'] else None
+    source_map = SourceMap() if args['source_map'] is not None else None
+    with profiler or contextlib.nullcontext(), instrument(profiler):
+        with phase(profiler, 'read'):
+            with open(input_file) as f:
+                source = f.read()
+        with phase(profiler, 'parse'):
+            node = ast.parse(source)
+        profile = ExecutionProfile.load(args['pgo_profile'], source) if args['pgo_profile'] else None
+        if args['ast_only']:
+            print(ast.dump(node, indent=2))
+        elif args['pgo_train']:
+            emulator, profile = train(node, source, args['input'], reference=args['reference_emulator'])
+            write_sidecar(args['pgo_train'], profile.map(input_file))
+            print(report_run(emulator))
+        elif args['run']:
+            print(report_run(run(node, args['input'], args['optimize'], inline_budget=args['inline_budget'],
+                                 profiler=profiler, counters=counters, source_map=source_map,
+                                 reference=args['reference_emulator'], profile=profile), counters, source_map))
+        else:
+            sys.stdout.write(process(input_file, node, open_cache(cache_dir(args)), args['optimize'],
+                                     args['inline_budget'], profiler, counters, source_map, args['source_comments'],
+                                     profile))
+    if profiler is not None:
+        write_profile(args['profile'], profiler.report())
+    if not args['ast_only']:
+        if counters is not None:
+            write_sidecar(args['counter_map'] or sidecar_path(input_file, '.counters.json'), counters.map(input_file))
+        if source_map is not None:
+            write_sidecar(args['source_map'] or sidecar_path(input_file, '.map.json'), source_map.map(input_file),
+                          indent=None) # a row per change of location, kept on one line
+
 def process_cli():
     """"Process Command Line Interface options"""
     parser = argparse.ArgumentParser()
     parser.add_argument('-f', help='filename to compile (.py)')
     parser.add_argument('--ast-only', default=False, action='store_true')
+    parser.add_argument('-O', dest='optimize', type=int, nargs='?', const=1, default=0, metavar='LEVEL',
+                        help='optimization level: 0 disables every optimization pass, 1 enables the cheap ones, '
+                             '2 adds the aggressive ones (default: 0, -O alone: 1)')
+    parser.add_argument('--inline-budget', type=int, default=DEFAULT_BUDGET, metavar='INSTRUCTIONS',
+                        help='estimated size of the largest function body inlined at -O2 '
+                             f'(default: {DEFAULT_BUDGET}, 0 disables inlining)')
+    parser.add_argument('--run', default=False, action='store_true',
+                        help='execute the translated program on the built-in PEP/9 emulator and report its counters')
+    parser.add_argument('--reference-emulator', default=False, action='store_true',
+                        help='run on the plain interpreter instead of translating the hot code into Python, '
+                             'same results, about as fast on short programs and ten times slower on long ones')
+    parser.add_argument('--input', nargs='*', type=int, default=[], metavar='VALUE',
+                        help='values read by DECI (input() calls) when running the program')
+    parser.add_argument('--batch', nargs='+', metavar='PATH',
+                        help='files, directories or glob patterns to compile, one .pep per input')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='number of worker processes in batch mode (default: one per CPU)')
+    parser.add_argument('--out-dir', default=None,
+                        help='directory receiving the .pep files in batch mode (default: next to each input)')
+    parser.add_argument('--no-cache', default=False, action='store_true',
+                        help='always translate, without reading or updating the compilation cache')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help=f'location of the compilation cache (default: {DEFAULT_CACHE_DIR})')
+    parser.add_argument('--profile', default=None, metavar='JSON',
+                        help='write the wall time and calls of every compilation phase, optimization pass and '
+                             'visit_* method, and the peak memory, as JSON to this file (- for stderr); '
+                             'in batch mode, one report per file and their total')
+    parser.add_argument('--instrument', default=False, action='store_true',
+                        help='count the executions of every statement, loop header, branch and function entry '
+                             'in the generated code, and write the map from the counters to the source lines '
+                             'as JSON (with the counts when running the program)')
+    parser.add_argument('--counter-map', default=None, metavar='JSON',
+                        help='where --instrument writes the counter map (default: next to the input, '
+                             'with the .counters.json extension; in batch mode, next to each .pep)')
+    parser.add_argument('--source-map', nargs='?', const='', default=None, metavar='JSON',
+                        help='write the line table of the program, rows [address, line, column] locating the '
+                             'assembled code in the Python source, as JSON to this file (default: next to the '
+                             'input, with the .map.json extension; in batch mode, next to each .pep)')
+    parser.add_argument('--source-comments', default=False, action='store_true',
+                        help='precede the instructions of every Python line with a "; line N" comment')
+    parser.add_argument('--pgo-train', default=None, metavar='JSON',
+                        help='run the program without optimizations on the --input values and write the '
+                             'executions of every source line, the profile read by --pgo-profile, to this file')
+    parser.add_argument('--pgo-profile', default=None, metavar='JSON',
+                        help='optimize for the profile written by --pgo-train: inline the hot call sites with a '
+                             'larger budget, place the hot branch of an if/else where it needs no jump, and keep '
+                             'in X the variables accessed the most in the hottest loops')
     args = vars(parser.parse_args())
-    return args['f'], args['ast_only']
-
-def process(input_file, root_node):
-    print(f'; Translating {input_file}')
-    global_extractor = GlobalVariableExtraction()
-    global_extractor.visit(root_node)
-    memory_alloc = StaticMemoryAllocation(global_extractor.results)
-
-    local_extractor = LocalVariableExtraction()
-    local_extractor.visit(root_node)
-    stack_alloc = StackMemoryAllocation(local_extractor.results)
-
-    print('; Branching to top level (tl) instructions')
-    print('\t\tBR tl')
-    memory_alloc.generate()
-
-    if local_extractor.results:
-        stack_alloc.generate()
-        function_def = FunctionDefinitionVisitor(local_extractor.results)
-        function_def.visit(root_node)
-        epfd = EntryPoint(function_def.finalize())
-        epfd.generate(True) 
-        
-    top_level = TopLevelProgram('tl', local_extractor.results)
-    top_level.visit(root_node)
-    ep = EntryPoint(top_level.finalize())
-    ep.generate() 
+    if not args['batch'] and not args['f']:
+        parser.error('one of -f or --batch is required')
+    if args['batch'] and (args['pgo_train'] or args['pgo_profile']):
+        parser.error('profiles are recorded and read for a single file, not in batch mode')
+    return args
+
+def process(input_file, root_node, cache=None, optimize=0, inline_budget=DEFAULT_BUDGET, profiler=None,
+            counters=None, source_map=None, source_comments=False, profile=None):
+    """Translate a parsed module, the whole PEP/9 program is returned as one string"""
+    header = f'; Translating {input_file}\n'
+    # counters and source maps are only filled while translating, line comments depend on the layout of the
+    # source while the cache keys do not
+    if cache is None or counters is not None or source_map is not None or source_comments:
+        return header + translate(root_node, optimize, inline_budget, profiler, counters, source_map,
+                                  source_comments, profile)
+    with phase(profiler, 'cache lookup'):
+        guided = [sorted(profile.lines.items())] if profile is not None else [] # keys without profile unchanged
+        key = cache.key(root_node, optimize, inline_budget, *guided)
+        assembly = cache.get(key)
+    if assembly is None:
+        assembly = translate(root_node, optimize, inline_budget, profiler, profile=profile)
+        with phase(profiler, 'cache update'):
+            cache.put(key, assembly)
+    return header + assembly
+
+def translate(root_node, optimize=0, inline_budget=DEFAULT_BUDGET, profiler=None, counters=None, source_map=None,
+              source_comments=False, profile=None):
+    program = build(root_node, optimize, inline_budget, profiler, counters, source_map, source_comments, profile)
+    with phase(profiler, 'output'):
+        lines = list()
+        for generator in program:
+            generator.generate(lines)
+        lines.append('')
+        return '\n'.join(lines)
+
+def build(root_node, optimize=0, inline_budget=DEFAULT_BUDGET, profiler=None, counters=None, source_map=None,
+          source_comments=False, profile=None):
+    """
+        The generators of the program in output order, each one renders a section of the assembly.
+        With counters (ExecutionCounters), the program counts the executions of its statements.
+        A source_map (SourceMap) receives the line table of the assembled program.
+        A profile (ExecutionProfile) of a training run guides the optimizations.
+    """
+    timings = profiler.passes if profiler is not None else None
+    profile = profile if optimize >= 1 else None
+    with phase(profiler, 'tree optimization'):
+        root_node, comments = optimize_tree(root_node, optimize, inline_budget, timings, profile)
+    with phase(profiler, 'program analysis'):
+        frame_layout = FrameLayout() if optimize >= 1 else None
+        symbols = ProgramAnalysis(frame_layout).analyze(root_node)
+        symbols.counters = counters
+        symbols.profile = profile
+        if frame_layout is not None:
+            comments.append(frame_layout.report())
+    entries = set(symbols.functions) | {'tl'} # labels reached from another section
+
+    sections = list() # (instructions, header, comments)
+    with phase(profiler, 'code generation'):
+        if symbols.functions:
+            function_def = FunctionDefinitionVisitor(symbols, optimize_tail_calls=optimize >= 1)
+            function_def.visit(root_node)
+            sections.append((function_def.finalize(), '; Function instructions',
+                             [function_def.report()] if optimize >= 1 else []))
+        top_level = TopLevelProgram('tl', symbols)
+        top_level.visit(root_node)
+        sections.append((top_level.finalize(), '; Top Level instructions', []))
+
+    # the runtime routines are known once every section is generated, they read their scratch words
+    runtime = symbols.runtime.finalize() if symbols.runtime.required else []
+    live_globals = DeadCodeElimination.reads([i for section, _, _ in sections for i in section] + runtime)
+    stack_symbols = [symbol for symbol, (_, kind, _) in symbols.local_vars().items() if kind != 'r']
+    observed = [f'{label},d' for label in counters.labels()] if counters is not None else []
+    live_globals |= set(observed) # read back once the program stops
+    # a CALL only reaches the functions and the runtime routines (never the top level), which may stop the program
+    called_globals = DeadCodeElimination.reads([i for section, _, _ in sections[:-1] for i in section] + runtime)
+    called_globals |= set(observed)
+    with phase(profiler, 'instruction optimization'):
+        sections = [optimize_instructions(instructions, optimize, header, entries, section_comments, timings,
+                                          live_globals, stack_symbols, observed, source_comments, profile,
+                                          called_globals)
+                    for instructions, header, section_comments in sections]
+
+    global_vars = symbols.global_vars
+    if optimize >= 1: # dropping the allocations no instruction refers to anymore
+        referenced = {i.operand for section in sections for i in section.finalize()} | \
+                     {i.operand for i in runtime}
+        global_vars = {n: v for n, v in global_vars.items() if n in referenced}
+        comments.append(f'; Dead code elimination dropped {len(symbols.global_vars) - len(global_vars)} '
+                        f'unused global allocations')
+    program = [EntryPoint([Instruction('BR', 'tl')], '; Branching to top level (tl) instructions', comments),
+               StaticMemoryAllocation(global_vars, symbols.arrays)]
+    if counters is not None:
+        program.append(counters)
+    if symbols.functions:
+        program.append(StackMemoryAllocation(symbols.local_vars()))
+    program += sections[:-1]
+    if runtime: # placed before the top level
+        program.append(symbols.runtime)
+    program.append(sections[-1])
+    if source_map is not None:
+        with phase(profiler, 'source map'):
+            instructions = [generator.finalize() for generator in program]
+            source_map.locate(instructions, Assembler([i for s in instructions for i in s]).assemble().addresses)
+    return program
+
+def optimize_tree(root_node, optimize, inline_budget=DEFAULT_BUDGET, timings=None, profile=None):
+    """Run the AST level passes enabled at this optimization level on a copy of the tree"""
+    passes = PassManager(timings)
+    if optimize >= 1:
+        root_node = copy.deepcopy(root_node)
+        if optimize >= 2 and inline_budget > 0: # before folding, which propagates the inlined arguments
+            passes.add('function inlining', FunctionInlining(inline_budget, profile))
+        passes.add('constant folding', ConstantFolding())
+        if optimize >= 2: # on folded constants, telling cheap products from expensive ones
+            passes.add('loop optimizer', LoopOptimizer())
+    return passes.run(root_node), passes.reports
+
+def optimize_instructions(instructions, optimize, header, entries=(), comments=(), timings=None,
+                          live_globals=(), stack_symbols=(), observed=(), source_comments=False, profile=None,
+                          called_globals=None):
+    """Run the instruction level passes enabled at this optimization level on one section"""
+    def later_passes():
+        return [BranchOptimizer(entries), AccumulatorTracking(entries),
+                DeadCodeElimination(entries, live_globals, stack_symbols, observed, called_globals)]
+
+    def finish(instructions):
+        # the passes following the allocation on a copy of the section, comparing the variables X may keep
+        for optimizer in later_passes() + [PeepholeOptimizer()]:
+            instructions = optimizer.optimize(instructions)
+        return instructions
+
+    passes = PassManager(timings)
+    if optimize >= 1:
+        peephole = PeepholeOptimizer()
+        passes.add('peephole', peephole)
+        if optimize >= 2:
+            passes.add('index register allocation', IndexRegisterAllocation(observed, profile, finish))
+        branches, tracking, elimination = later_passes()
+        passes.add('branch optimizer', branches) # after the allocation, which finds loops by their tests
+        passes.add('accumulator tracking', tracking)
+        passes.add('dead code elimination', elimination)
+        passes.add('peephole', peephole) # removing the sentinels left by the tracking
+    instructions = passes.run(instructions)
+    return EntryPoint(instructions, header, list(comments) + passes.reports, source_comments)
+
+def program_instructions(root_node, optimize=0, inline_budget=DEFAULT_BUDGET, profiler=None, counters=None,
+                         source_map=None, profile=None):
+    """Every instruction of the program, in the order the assembler consumes them"""
+    instructions = list()
+    for generator in build(root_node, optimize, inline_budget, profiler, counters, source_map, profile=profile):
+        instructions += generator.finalize()
+    return instructions
+
+def compile_source(source, input_file='<string>', cache=None, optimize=0, inline_budget=DEFAULT_BUDGET,
+                   counters=None, source_map=None, source_comments=False):
+    """Library entry point: translate Python source code into PEP/9 assembly"""
+    return process(input_file, ast.parse(source), cache, optimize, inline_budget, None, counters, source_map,
+                   source_comments)
+
+def compile_to(stream, source, input_file='<string>', cache=None, optimize=0, inline_budget=DEFAULT_BUDGET,
+               counters=None, source_map=None, source_comments=False):
+    """Translate source code and write the assembly to stream in a single write"""
+    stream.write(compile_source(source, input_file, cache, optimize, inline_budget, counters, source_map,
+                                source_comments))
+
+####
+## Emulation
+####
+
+def run(root_node, inputs=(), optimize=0, max_steps=10_000_000, inline_budget=DEFAULT_BUDGET, profiler=None,
+        counters=None, source_map=None, reference=False, profile=None):
+    """
+        Assemble the translated program and execute it on the emulator, returns the finished emulator.
+        The counters of an instrumented program are collected once it stops. The reference Emulator
+        interprets every instruction, the default FastEmulator gives the same results faster.
+    """
+    instructions = program_instructions(root_node, optimize, inline_budget, profiler, counters, source_map, profile)
+    with phase(profiler, 'assembly'):
+        assembler = Assembler(instructions).assemble()
+    with phase(profiler, 'emulation'):
+        emulator = (Emulator if reference else FastEmulator)(assembler.image, inputs, max_steps).run()
+    if counters is not None:
+        counters.collect(emulator.memory, assembler.symbols)
+    return emulator
+
+def train(root_node, source, inputs=(), max_steps=10_000_000, reference=False):
+    """
+        Training run of profile guided optimization, returns the finished emulator and the ExecutionProfile.
+        The program is not optimized, so that the executions of every statement are attributed to its line.
+    """
+    source_map = SourceMap()
+    emulator = run(root_node, inputs, 0, max_steps, source_map=source_map, reference=reference)
+    return emulator, ExecutionProfile.record(source_map, emulator.executions, source)
+
+def report_run(emulator, counters=None, source_map=None):
+    statistics = emulator.statistics()
+    mnemonics = ', '.join(f'{m} {n}' for m, n in statistics['mnemonics'].items())
+    lines = list()
+    if counters is not None:
+        lines.append(f'; Executions by line: {", ".join(f"{line} {n}" for line, n in counters.lines().items())}')
+    if source_map is not None:
+        executed = source_map.lines(emulator.executions)
+        lines.append(f'; Instructions by line: {", ".join(f"{line} {n}" for line, n in executed.items())}')
+    return '\n'.join([
+        f'; Output: {" ".join(emulator.text)}',
+        f'; Executed {statistics["instructions"]} instructions ({statistics["cycles"]} estimated cycles), '
+        f'stack high-water mark {statistics["stack_high_water"]} bytes',
+        f'; Memory traffic: fetched {statistics["fetched_bytes"]} bytes, read {statistics["read_bytes"]} bytes, '
+        f'written {statistics["written_bytes"]} bytes',
+        f'; Instructions by mnemonic: {mnemonics}',
+    ] + lines)
+
+####
+## Profiling
+####
+
+def phase(profiler, name):
+    """Context timing one phase of the compilation, doing nothing when not profiling"""
+    return profiler.phase(name) if profiler is not None else contextlib.nullcontext()
+
+def instrument(profiler):
+    return profiler.instrument(*PROFILED_VISITORS) if profiler is not None else contextlib.nullcontext()
+
+def write_profile(path, report):
+    text = json.dumps(report, indent=2) + '\n'
+    if path == '-':
+        sys.stderr.write(text)
+    else:
+        with open(path, 'w') as f:
+            f.write(text)
+
+####
+## Instrumentation
+####
+
+def sidecar_path(path, extension):
+    """The file with this extension written next to path (an input or a .pep file)"""
+    return os.path.splitext(path)[0] + extension
+
+def write_sidecar(path, contents, indent=2):
+    with open(path, 'w') as f:
+        f.write(json.dumps(contents, indent=indent) + '\n')
+
+####
+## Compilation cache
+####
+
+def cache_dir(args):
+    return None if args['no_cache'] else args['cache_dir']
+
+# packages whose sources decide the cached output
+TRANSLATOR_PACKAGES = ('visitors', 'generators', 'optimizers', 'ir', 'emulator', 'cache', 'profiling')
+
+def translator_version():
+    """Translator version and a fingerprint of its sources, so that editing the translator invalidates the cache"""
+    digest = hashlib.sha256(__version__.encode())
+    root = os.path.dirname(os.path.abspath(__file__))
+    paths = [os.path.join(root, 'translator.py')]
+    for package in TRANSLATOR_PACKAGES: # not the tests, bench.py nor differential.py
+        paths += glob.glob(os.path.join(root, package, '*.py'))
+    for path in sorted(paths):
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return f'{__version__}+{digest.hexdigest()[:16]}'
+
+def open_cache(directory):
+    return None if directory is None else CompilationCache(directory, translator_version())
+
+####
+## Batch compilation
+####
+
+def collect_inputs(patterns):
+    """Expand files, directories (searched recursively) and glob patterns into .py inputs"""
+    inputs = list()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = glob.glob(os.path.join(pattern, '**', '*.py'), recursive=True)
+        else:
+            matches = glob.glob(pattern, recursive=True)
+        for match in sorted(matches):
+            if match.endswith('.py') and os.path.isfile(match) and match not in inputs:
+                inputs.append(match)
+    return inputs
+
+def output_path(input_file, out_dir, root):
+    """The .pep file written for input_file, mirroring its location under root in out_dir"""
+    target = os.path.splitext(input_file)[0] + '.pep'
+    if out_dir is None:
+        return target
+    return os.path.join(out_dir, os.path.relpath(target, root))
+
+def compile_file(input_file, output_file, directory=None, optimize=0, inline_budget=DEFAULT_BUDGET, profile=False,
+                 count_executions=False, map_sources=False, source_comments=False):
+    """Worker entry point: compile one file, returns (input_file, output_file, seconds, error, profile report)"""
+    global _worker_cache
+    start = time.perf_counter()
+    profiler = CompileProfiler(input_file) if profile else None
+    counters = ExecutionCounters() if count_executions else None
+    source_map = SourceMap() if map_sources else None
+    try:
+        if directory is not None and _worker_cache is None:
+            _worker_cache = open_cache(directory)
+        with profiler or contextlib.nullcontext(), instrument(profiler):
+            with phase(profiler, 'read'):
+                with open(input_file) as f:
+                    source = f.read()
+            with phase(profiler, 'parse'):
+                node = ast.parse(source)
+            assembly = process(input_file, node, _worker_cache, optimize, inline_budget, profiler, counters,
+                               source_map, source_comments)
+            with phase(profiler, 'write'):
+                os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+                with open(output_file, 'w') as f:
+                    f.write(assembly)
+                if counters is not None:
+                    write_sidecar(sidecar_path(output_file, '.counters.json'), counters.map(input_file))
+                if source_map is not None:
+                    write_sidecar(sidecar_path(output_file, '.map.json'), source_map.map(input_file),
+                                  indent=None)
+        error = None
+    except Exception as e:
+        error = f'{type(e).__name__}: {e}'
+    report = profiler.report() if profiler is not None else None
+    return input_file, output_file, time.perf_counter() - start, error, report
+
+_worker_cache = None # opened once per worker process
+
+def compile_batch(patterns, jobs=None, out_dir=None, directory=None, optimize=0, inline_budget=DEFAULT_BUDGET,
+                  profile=None, count_executions=False, map_sources=False, source_comments=False):
+    """Compile every input over a process pool and print a per-file summary, returns the exit code"""
+    inputs = collect_inputs(patterns)
+    if not inputs:
+        print('; No input files found')
+        return 1
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(i)) for i in inputs])
+    outputs = [output_path(i, out_dir, root) for i in inputs]
+    jobs = jobs or os.cpu_count() or 1
+    chunksize = max(1, len(inputs) // (jobs * 4))
+
+    start = time.perf_counter()
+    failures = 0
+    reports = list()
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for input_file, output_file, elapsed, error, report in executor.map(
+                compile_file, inputs, outputs, [directory] * len(inputs), [optimize] * len(inputs),
+                [inline_budget] * len(inputs), [profile is not None] * len(inputs), [count_executions] * len(inputs),
+                [map_sources] * len(inputs), [source_comments] * len(inputs), chunksize=chunksize):
+            if report is not None:
+                reports.append(report)
+            if error is None:
+                print(f'{elapsed * 1000:8.2f} ms  ok    {input_file} -> {output_file}')
+            else:
+                failures += 1
+                print(f'{elapsed * 1000:8.2f} ms  FAIL  {input_file}: {error}')
+    total = time.perf_counter() - start
+    print(f'; Compiled {len(inputs) - failures}/{len(inputs)} files in {total:.2f} s '
+          f'with {jobs} worker(s), {failures} failed')
+    if profile is not None:
+        write_profile(profile, {'total': CompileProfiler.merge(reports), 'files': reports})
+    return 1 if failures else 0
 
 if __name__ == '__main__':
-    main()
+    try:
+        main()
+    except EmulatorError as e:
+        # --run and --pgo-train stopped by the program itself (no --input left, too many steps...)
+        sys.exit(f'{os.path.basename(sys.argv[0])}: error: {e}')
@@ -1,205 +1,216 @@
 import ast
-
-LabeledInstruction = tuple[str, str]
+from ir.Instruction import Instruction
+from visitors.InstructionVisitor import InstructionVisitor
 
 class FunctionDefinitionVisitor(ast.NodeVisitor):    
 
-    def __init__(self, local_vars: dict()) -> None:
+    def __init__(self, symbols, optimize_tail_calls=False) -> None:
         super().__init__()
         self.__function_instructions = list()
-        self.local_vars = local_vars
+        self.symbols = symbols
+        self.optimize_tail_calls = optimize_tail_calls
+        self.tail_calls = 0
+
+    def visit_Module(self, node):
+        # functions are only defined at the top level, no need to walk the other statements
+        for contents in node.body:
+            if isinstance(contents, ast.FunctionDef):
+                self.visit(contents)
 
     def visit_FunctionDef(self, node):
-        visit_function_body = FunctionBodyVisitor(self.local_vars, node.name)
+        visit_function_body = FunctionBodyVisitor(self.symbols, self.symbols.functions[node.name],
+                                                  self.optimize_tail_calls)
         visit_function_body.visit(node)
         self.__function_instructions += visit_function_body.finalize()
+        self.tail_calls += visit_function_body.tail_calls
 
     def finalize(self):
         return self.__function_instructions
 
-
-class FunctionBodyVisitor(ast.NodeVisitor):
-
-    def __init__(self, local_vars: dict(), function_name) -> None:
-        super().__init__()
-        self.__local_vars = local_vars
-        self.__instructions = list()
-        self.__record_instruction('NOP1', label=function_name)
+    def report(self):
+        return f'; Tail call elimination turned {self.tail_calls} calls into jumps'
+
+
+class FunctionBodyVisitor(InstructionVisitor):
+    """
+        Instructions of one function. With optimize_tail_calls, a call in tail
+        position (return f(...), or r = f(...) directly followed by return r)
+        does not grow the stack: the arguments overwrite the parameters of
+        the current frame, then a self call branches back to the body and a
+        call to a function with the same parameter and return slots releases
+        the locals and branches to it, returning straight to our caller.
+    """
+
+    def __init__(self, symbols, function, optimize_tail_calls=False) -> None:
+        super().__init__(symbols, function, (function.node.lineno, function.node.col_offset))
+        self.__optimize_tail_calls = optimize_tail_calls
+        self.tail_calls = 0
+        self._record_instruction('NOP1', label=function.name)
+        self.__body = f'body_{self._identify()}' # target of self tail calls
+        self.__epilogue = f'ret_{self._identify()}' # target of the returns before the end
+        self.__early_return = False
+        self.__last_statement = None
         self.initialize()
-        self.__return_id = 0
-
-        self.__should_save = True
-        self.__current_variable = None
-        self.__visited_global_variables = set()
-        self.__elem_id = 0
 
     def initialize(self):
         # allocate local variables to stack
-        local_stack_count = 0
-        for n, v in self.__local_vars.items():
-            if v[1] == 'l':
-                local_stack_count += 2
-        
+        local_stack_count = self._function.local_size()
         if local_stack_count > 0:
-            self.__record_instruction(f'SUBSP {local_stack_count},i')
+            self._record_instruction(f'SUBSP {local_stack_count},i')
+        if self._function.heap_symbol() is not None: # the arrays taken from the heap are released on return
+            self._record_instruction('LDWA rt_heap,d')
+            self._record_instruction(f'STWA {self._function.heap_symbol()},s')
+        if self.__optimize_tail_calls:
+            self._record_instruction('NOP1', label=self.__body)
+        self._count('function', self._function.node) # self tail calls enter the function again
 
     def finalize(self):
         # deallocate local variables to stack
-        local_stack_count = 0
-        for n, v in self.__local_vars.items():
-            if v[1] == 'l':
-                local_stack_count += 2
-        
+        label = self.__epilogue if self.__early_return else None
+        if self._function.heap_symbol() is not None:
+            self._record_instruction(f'LDWA {self._function.heap_symbol()},s', label)
+            self._record_instruction('STWA rt_heap,d')
+            label = None
+        local_stack_count = self._function.local_size()
         if local_stack_count > 0:
-            self.__record_instruction(f'ADDSP {local_stack_count},i')
+            self._record_instruction(f'ADDSP {local_stack_count},i', label)
+            label = None
         
-        self.__instructions.append((None, 'RET'))
-        return self.__instructions
-
-    def visit_Assign(self, node):
-        # remembering the name of the target
-        self.__current_variable = node.targets[0].id
-        # visiting the left part, now knowing where to store the result
-        self.visit(node.value)
-        if self.__should_save:
-            is_local = self.check_local(self.__current_variable)
-            if is_local[1]:
-                self.__record_instruction(f'LDWA {is_local[0]},s')
-            else:
-                self.__record_instruction(f'LDWA {is_local[0]},d')
-        else:
-            self.__should_save = True
-        self.__current_variable = None
+        self._instructions.append(Instruction('RET', label=label, source=self._location))
+        return self._instructions
+
+    def visit_FunctionDef(self, node):
+        self.__last_statement = node.body[-1]
+        self._visit_block(node.body)
 
     def visit_Constant(self, node):
-        self.__record_instruction(f'LDWA {node.value},i')
-            
-    def visit_Name(self, node):
-        is_local = self.check_local(node.id)
-        if is_local[1]:
-            self.__record_instruction(f'LDWA {is_local[0]},s')
-        else:
-            self.__record_instruction(f'LDWA {is_local[0]},d')
-
-    def visit_BinOp(self, node):
-        self.__access_memory(node.left, 'LDWA')
-        if isinstance(node.op, ast.Add):
-            self.__access_memory(node.right, 'ADDA')
-        elif isinstance(node.op, ast.Sub):
-            self.__access_memory(node.right, 'SUBA')
-        else:
-            raise ValueError(f'Unsupported binary operator: {node.op}')
+        self._record_instruction(f'LDWA {node.value},i')
 
     def visit_Return(self, node):
-        if not isinstance(node.value, ast.Constant):
-            is_local = self.check_local(node.value.id)
-            if is_local[1]:
-                self.__record_instruction(f'LDWA {is_local[0]},s')
+        if node.value is not None:
+            self.visit(node.value)
+            self._record_instruction(f'STWA {self._function.return_symbol()},s')
+        if node is not self.__last_statement:
+            self._record_instruction(f'BR {self.__epilogue}')
+            self.__early_return = True
+
+    ####
+    ## Arrays: the cells of a constant size are in the frame, the others in the heap
+    ####
+
+    def _allocate_array(self, name, fill, size):
+        # unlike the globals, the frame and the heap are not zeroed by the loader
+        symbol = self._function.symbols[name]
+        count = self._value(size)
+        if self._function.arrays[name] is not None:
+            if count > 0:
+                self._fill(f'{symbol},sx', fill, f'{count * 2},i')
+            return
+        # taking 2 * size bytes from the top of the heap, released by the epilogue
+        allocation_id = self._identify()
+        self._access_memory(size, 'LDWX')
+        self._record_instruction('ASLX')
+        self._record_instruction(f'BRLE alloc_{allocation_id}') # an empty array takes no cell
+        self._record_instruction('LDWA rt_heap,d')
+        self._record_instruction(f'STWA {symbol},s')
+        self._record_instruction('ADDX rt_heap,d')
+        self._record_instruction('STWX rt_heap,d')
+        self._record_instruction(f'SUBX {symbol},s')
+        self._fill(f'{symbol},sfx', fill)
+        self._record_instruction('NOP1', label = f'alloc_{allocation_id}')
+
+    def _cell(self, node):
+        if self._cell_offset(node) is not None:
+            return f'{self._cell_offset(node)},s'
+        name = node.value.id
+        if name not in self._function.symbols:
+            return f'{name},x'
+        # the slot of a heap array holds the address of its first cell
+        mode = 'sfx' if self._function.arrays.get(name, 0) is None else 'sx'
+        return f'{self._function.symbols[name]},{mode}'
+
+    def _cell_offset(self, node):
+        # a constant index in an array of the frame is a plain stack offset, PEP/9 has no symbol + constant
+        name, index = node.value.id, self._value(node.slice)
+        if index is None or self._function.arrays.get(name) is None:
+            return None
+        return self._function.offsets[self._function.symbols[name]][0] + index * 2
+
+    def _variable(self, name):
+        if name in self._function.symbols:
+            return f'{self._function.symbols[name]},s'
+        return f'{name},d'
+
+    ####
+    ## Tail calls
+    ####
+
+    def _visit_block(self, statements):
+        i = 0
+        while i < len(statements):
+            following = statements[i + 1] if i + 1 < len(statements) else None
+            call = self.__tail_call(statements[i], following)
+            location = self._location
+            self._location = self._source(statements[i])
+            self._count('statement', statements[i])
+            if call is None:
+                self.visit(statements[i])
+                i += 1
             else:
-                self.__record_instruction(f'LDWA {is_local[0]},d')
-        else:
-            self.__record_instruction(f'LDWA {node.value.value},d')
-
-        self.__record_instruction(f'STWA RetVal{self.__return_id},s')
-        self.__return_id += 1
-
-    def visit_Call(self, node):
-        match node.func.id:
-            case 'int': 
-                # Let's visit whatever is casted into an int
-                self.visit(node.args[0])
-            case 'input':
-                # We are only supporting integers for now
-                self.__record_instruction(f'DECI {self.__current_variable},d')
-                self.__should_save = False # DECI already save the value in memory
-            case 'print':
-                # We are only supporting integers for now
-                self.__record_instruction(f'DECO {node.args[0].id},d')
-            case _:
-                pass
-
-    def visit_While(self, node):
-        loop_id = self.__identify()
-        inverted = {
-            ast.Lt:  'BRGE', # '<'  in the code means we branch if '>=' 
-            ast.LtE: 'BRGT', # '<=' in the code means we branch if '>' 
-            ast.Gt:  'BRLE', # '>'  in the code means we branch if '<='
-            ast.GtE: 'BRLT', # '>=' in the code means we branch if '<'
-            ast.NotEq: 'BREQ', # '!=' in the code means we branch if '=='
-            ast.Eq: 'BRNE' # '==' in the code means we branch if '!='
-        }
-        # left part can only be a variable
-        self.__access_memory(node.test.left, 'LDWA', label = f'test_{loop_id}')
-        # right part can only be a variable
-        self.__access_memory(node.test.comparators[0], 'CPWA')
-        # Branching is condition is not true (thus, inverted)
-        self.__record_instruction(f'{inverted[type(node.test.ops[0])]} end_l_{loop_id}')
-        # Visiting the body of the loop
-        for contents in node.body:
-            self.visit(contents)
-        self.__record_instruction(f'BR test_{loop_id}')
-        # Sentinel marker for the end of the loop
-        self.__record_instruction(f'NOP1', label = f'end_l_{loop_id}')
-
-    def visit_If(self, node):
-        loop_id = self.__identify()
-        inverted = {
-            ast.Lt:  'BRGE', # '<'  in the code means we branch if '>=' 
-            ast.LtE: 'BRGT', # '<=' in the code means we branch if '>' 
-            ast.Gt:  'BRLE', # '>'  in the code means we branch if '<='
-            ast.GtE: 'BRLT', # '>=' in the code means we branch if '<'
-            ast.NotEq: 'BREQ', # '!=' in the code means we branch if '=='
-            ast.Eq: 'BRNE' # '==' in the code means we branch if '!='
-        }
-
-        self.__access_memory(node.test.left, 'LDWA', label = f'if_{loop_id}') # LDWA
-        self.__access_memory(node.test.comparators[0], 'CPWA') # CPWA
-
-        if not node.orelse:
-            self.__record_instruction(f'{inverted[type(node.test.ops[0])]} end_f_{loop_id}') # BRANCH to end if condition not met
+                if isinstance(statements[i], ast.Assign):
+                    self._count('statement', following)
+                self.__jump(call)
+                i += 2 if isinstance(statements[i], ast.Assign) else 1 # the return is part of the jump
+            self._location = location
+
+    def __tail_call(self, statement, following):
+        """The call made in tail position by statement, None if there is none or it needs a frame"""
+        if not self.__optimize_tail_calls or self._function.heap_symbol() is not None:
+            return None # a jump would skip releasing the heap
+        if isinstance(statement, ast.Return):
+            call = statement.value
+        elif isinstance(statement, ast.Assign) and isinstance(following, ast.Return) \
+                and isinstance(statement.targets[0], ast.Name) and isinstance(following.value, ast.Name) \
+                and following.value.id == statement.targets[0].id:
+            call = statement.value
+        elif isinstance(statement, ast.Expr) and statement is self.__last_statement \
+                and not self._function.return_slots:
+            call = statement.value
         else:
-            self.__record_instruction(f'{inverted[type(node.test.ops[0])]} else_f_{loop_id}') # BRANCH to else if condition not met
-            
-        for contents in node.body: # print content of if statement
-            self.visit(contents)
-
-        self.__record_instruction(f'BR end_f_{loop_id}') # statement done, BRANCH to end
-        
-        if node.orelse: # print content of else statement 
-            self.__record_instruction(f'NOP1', label = f'else_f_{loop_id}') # end statement
-            for contents in node.orelse:
-                self.visit(contents)
-            self.__record_instruction(f'BR end_f_{loop_id}') # statement done, BRANCH to end
-        
-        self.__record_instruction(f'NOP1', label = f'end_f_{loop_id}') # end statement
-
-    def __record_instruction(self, instruction, label = None):
-        self.__instructions.append((label, instruction))
-
-    def check_local(self, name):
-        if 'm' + name in self.__local_vars:
-            return ('m' + name, True)
-        else:
-            return (name, False)
-
-    def __access_memory(self, node, instruction, label = None):
-        if isinstance(node, ast.Constant):
-            self.__record_instruction(f'{instruction} {node.value},i', label)
-        elif isinstance(node, ast.Name) and self.__identify_constant(node.id): # EQUATE
-            self.__record_instruction(f'{instruction} {node.id},i', label)
-        else:
-            is_local = self.check_local(node.id)
-            if is_local[1]:
-                self.__record_instruction(f'LDWA {is_local[0]},s')
+            return None
+        if not isinstance(call, ast.Call) or not isinstance(call.func, ast.Name) \
+                or call.func.id not in self._symbols.functions:
+            return None
+        callee = self._symbols.functions[call.func.id]
+        if callee is self._function:
+            return call
+        if len(callee.params) == len(self._function.params) \
+                and len(callee.return_slots) == len(self._function.return_slots):
+            return call # same argument area: the callee finds its parameters and return slot in our frame
+        return None
+
+    def __jump(self, node):
+        params = self._function.params
+        # parameters are overwritten in order, an argument reading one already overwritten needs a copy
+        overwritten = any(isinstance(name, ast.Name) and name.id in params[:i]
+                          for i, arg in enumerate(node.args) for name in ast.walk(arg))
+        if overwritten:
+            for i, arg in enumerate(node.args):
+                self._access_memory(arg, 'LDWA')
+                self._record_instruction(f'STWA {i * 2 - len(params) * 2},s')
+        for i, arg in enumerate(node.args):
+            if isinstance(arg, ast.Name) and arg.id == params[i]:
+                continue # unchanged parameter
+            if overwritten:
+                self._record_instruction(f'LDWA {i * 2 - len(params) * 2},s')
             else:
-                self.__record_instruction(f'LDWA {is_local[0]},d')
-
-    def __identify(self):
-        result = self.__elem_id
-        self.__elem_id = self.__elem_id + 1
-        return result
-
-    def __identify_constant(self, name):
-        if name.isupper() and name[0] == '_':
-            return True
-        return False
+                self._access_memory(arg, 'LDWA')
+            self._record_instruction(f'STWA {self._function.symbols[params[i]]},s')
+        if node.func.id == self._function.name:
+            self._record_instruction(f'BR {self.__body}')
+        else:
+            local_stack_count = self._function.local_size()
+            if local_stack_count > 0:
+                self._record_instruction(f'ADDSP {local_stack_count},i')
+            self._record_instruction(f'BR {node.func.id}')
+        self.tail_calls += 1
@@ -0,0 +1,283 @@
+import ast
+import copy
+from ir.Instruction import Instruction
+from visitors.ProgramAnalysis import array_allocation
+
+# branching when the condition does not hold, or when it holds
+INVERTED = {
+    ast.Lt:  'BRGE', # '<'  in the code means we branch if '>='
+    ast.LtE: 'BRGT', # '<=' in the code means we branch if '>'
+    ast.Gt:  'BRLE', # '>'  in the code means we branch if '<='
+    ast.GtE: 'BRLT', # '>=' in the code means we branch if '<'
+    ast.NotEq: 'BREQ', # '!=' in the code means we branch if '=='
+    ast.Eq: 'BRNE' # '==' in the code means we branch if '!='
+}
+DIRECT = {
+    ast.Lt:  'BRLT', ast.LtE: 'BRLE', ast.Gt:  'BRGT', ast.GtE: 'BRGE', ast.NotEq: 'BRNE', ast.Eq: 'BREQ'
+}
+
+class InstructionVisitor(ast.NodeVisitor):
+    """
+        Statements translated the same way at the top level and in a function.
+        The subclasses only tell where a variable lives (_variable: ,d or
+        ,s) and how an array cell indexed by X is addressed (_cell: ,x or
+        ,sx/,sfx), function is None at the top level.
+    """
+
+    def __init__(self, symbols, function=None, location=None) -> None:
+        super().__init__()
+        self._symbols = symbols
+        self._function = function
+        self._instructions = list()
+        self._location = location # (line, column) of the node being translated
+        self._should_save = True
+        self._current_variable = None
+
+    def visit(self, node):
+        location = self._location
+        self._location = self._source(node)
+        result = super().visit(node)
+        self._location = location
+        return result
+
+    def _visit_block(self, statements):
+        for statement in statements:
+            location = self._location
+            self._location = self._source(statement)
+            self._count('statement', statement)
+            self.visit(statement)
+            self._location = location
+
+    ####
+    ## Assignments and expressions
+    ####
+
+    def visit_Assign(self, node):
+        if isinstance(node.targets[0], ast.Subscript):
+            self.__store_cell(node.targets[0], node.value)
+            return
+        allocation = array_allocation(node.value)
+        if allocation is not None:
+            self._allocate_array(node.targets[0].id, *allocation)
+            return
+        # remembering the name of the target
+        self._current_variable = node.targets[0].id
+        # visiting the left part, now knowing where to store the result
+        self.visit(node.value)
+        if self._should_save:
+            self._record_instruction(f'STWA {self._operand(node.targets[0])}')
+        else:
+            self._should_save = True
+        self._current_variable = None
+
+    def visit_AugAssign(self, node):
+        # target op= value is translated as target = target op value
+        current = copy.deepcopy(node.target)
+        current.ctx = ast.Load()
+        value = ast.copy_location(ast.BinOp(current, node.op, node.value), node)
+        self.visit_Assign(ast.copy_location(ast.Assign(targets=[node.target], value=value), node))
+
+    def visit_Name(self, node):
+        self._record_instruction(f'LDWA {self._variable(node.id)}')
+
+    def visit_BinOp(self, node):
+        # +, -, *, //, %, << and >>, the runtime routines lower those without instruction
+        for operand in (node.left, node.right):
+            self.__index(operand) # at most one array cell, see ProgramAnalysis
+        instructions = self._symbols.runtime.arithmetic(node.op, self._operand(node.left), self._operand(node.right),
+                                                        self._value(node.left), self._value(node.right))
+        for instruction in instructions:
+            self._record_instruction(instruction)
+
+    def visit_Call(self, node):
+        match node.func.id:
+            case 'int':
+                # Let's visit whatever is casted into an int
+                self.visit(node.args[0])
+            case 'input':
+                # We are only supporting integers for now
+                self._record_instruction(f'DECI {self._variable(self._current_variable)}')
+                self._should_save = False # DECI already save the value in memory
+            case 'print':
+                # We are only supporting integers for now
+                self._access_memory(node.args[0], 'DECO')
+            case 'exit':
+                # no exit status on PEP/9
+                self._record_instruction('STOP')
+            case _:
+                # user function, the returned value (if any) ends up in A
+                self.__call_function(node)
+
+    ####
+    ## Arrays (name_ = [0] * N, name_[i]), X holds twice the index
+    ####
+
+    def visit_Subscript(self, node):
+        self._access_memory(node, 'LDWA')
+
+    def __store_cell(self, target, value):
+        while isinstance(value, ast.Call) and value.func.id == 'int':
+            value = value.args[0]
+        if isinstance(value, ast.Call) and value.func.id == 'input':
+            self._access_memory(target, 'DECI')
+            return
+        if isinstance(value, (ast.Constant, ast.Name, ast.Subscript)):
+            self._access_memory(value, 'LDWA')
+        else:
+            self.visit(value) # the result ends up in A
+        self._access_memory(target, 'STWA')
+
+    def _fill(self, cells, fill, count = None):
+        # from the last cell down to the first one, X already holds twice the size when count is None
+        fill_id = self._identify()
+        self._record_instruction(f'LDWA {fill},i')
+        if count is not None:
+            self._record_instruction(f'LDWX {count}')
+        self._record_instruction('SUBX 2,i', label = f'fill_{fill_id}')
+        self._record_instruction(f'STWA {cells}')
+        self._record_instruction(f'BRGT fill_{fill_id}')
+
+    def __index(self, node, label = None):
+        """Puts twice the index of an array cell in X, returns the label still to place"""
+        if not isinstance(node, ast.Subscript) or self._cell_offset(node) is not None:
+            return label
+        value = self._value(node.slice)
+        if value is not None:
+            self._record_instruction(f'LDWX {value * 2},i', label)
+        else:
+            self._record_instruction(f'LDWX {self._operand(node.slice)}', label)
+            self._record_instruction('ASLX')
+        return None
+
+    def _cell_offset(self, node):
+        """Stack offset of a cell addressed without X, None when X holds its index"""
+        return None
+
+    ####
+    ## Loops and conditions (only variable OP variable)
+    ####
+
+    def visit_While(self, node):
+        loop_id = self._identify()
+        # left part can only be a variable, the counter of the header takes the label
+        test_label = self._count('loop', node, label = f'test_{loop_id}')
+        self._access_memory(node.test.left, 'LDWA', label = test_label)
+        # right part can only be a variable
+        self._access_memory(node.test.comparators[0], 'CPWA')
+        # Branching is condition is not true (thus, inverted)
+        self._record_instruction(f'{INVERTED[type(node.test.ops[0])]} end_l_{loop_id}')
+        # Visiting the body of the loop
+        self._visit_block(node.body)
+        self._record_instruction(f'BR test_{loop_id}')
+        # Sentinel marker for the end of the loop
+        self._record_instruction(f'NOP1', label = f'end_l_{loop_id}')
+
+    def visit_If(self, node):
+        loop_id = self._identify()
+        swapped = self._swapped(node)
+        branches = [('if', node, node.body), ('else', node.orelse[0] if node.orelse else None, node.orelse)]
+        if swapped:
+            branches.reverse()
+
+        self._access_memory(node.test.left, 'LDWA', label = f'if_{loop_id}') # LDWA
+        self._access_memory(node.test.comparators[0], 'CPWA') # CPWA
+
+        if not node.orelse:
+            self._record_instruction(f'{INVERTED[type(node.test.ops[0])]} end_f_{loop_id}') # BRANCH to end if condition not met
+        elif swapped:
+            self._record_instruction(f'{DIRECT[type(node.test.ops[0])]} else_f_{loop_id}') # BRANCH to the if branch if condition met
+        else:
+            self._record_instruction(f'{INVERTED[type(node.test.ops[0])]} else_f_{loop_id}') # BRANCH to else if condition not met
+
+        kind, counted, statements = branches[0]
+        self._count(kind, counted)
+        self._visit_block(statements) # print content of the first branch
+
+        if node.orelse: # print content of the second branch
+            self._record_instruction(f'BR end_f_{loop_id}') # first branch done, BRANCH over the second one
+            self._record_instruction(f'NOP1', label = f'else_f_{loop_id}') # end statement
+            kind, counted, statements = branches[1]
+            self._count(kind, counted)
+            self._visit_block(statements)
+
+        self._record_instruction(f'NOP1', label = f'end_f_{loop_id}') # end statement
+
+    ####
+    ## Helper functions
+    ####
+
+    def _record_instruction(self, instruction, label = None):
+        self._instructions.append(Instruction.parse(instruction, label, self._location))
+
+    def __call_function(self, node):
+        function = self._symbols.functions[node.func.id]
+        size = (len(function.params) + len(function.return_slots)) * 2
+        # arguments are stored below the stack pointer before allocating their slots,
+        # so that the stack relative operands are still valid while reading them
+        for i, arg in enumerate(node.args):
+            self._access_memory(arg, 'LDWA')
+            self._record_instruction(f'STWA {i * 2 - size},s')
+        if size > 0:
+            self._record_instruction(f'SUBSP {size},i')
+        self._record_instruction(f'CALL {node.func.id}')
+        if size > 0:
+            self._record_instruction(f'ADDSP {size},i')
+        if function.return_slots:
+            self._record_instruction('LDWA -2,s') # return slot, just released
+
+    def _access_memory(self, node, instruction, label = None):
+        label = self.__index(node, label)
+        self._record_instruction(f'{instruction} {self._operand(node)}', label)
+
+    def _operand(self, node):
+        if isinstance(node, ast.Subscript): # X already holds the index
+            return self._cell(node)
+        elif isinstance(node, ast.Constant):
+            return f'{node.value},i'
+        elif isinstance(node, ast.Name) and self.__identify_constant(node.id): # EQUATE
+            return f'{node.id},i'
+        else:
+            return self._variable(node.id)
+
+    def _value(self, node):
+        # value of an operand known at compile time, None for variables
+        if isinstance(node, ast.Constant):
+            return node.value
+        elif isinstance(node, ast.Name) and self.__identify_constant(node.id):
+            return self._symbols.global_vars.get(node.id)
+        return None
+
+    def _identify(self):
+        return self._symbols.identify()
+
+    def _swapped(self, node):
+        """True when the else branch of node is emitted first"""
+        # the first branch ends with a BR over the second one, the hotter branch of a profile goes second
+        return bool(node.orelse) and self.__hotter(node.body, node.orelse)
+
+    def __hotter(self, statements, others):
+        """True when the profile of a training run executed statements more often than others"""
+        profile = self._symbols.profile
+        if profile is None:
+            return False
+        return (profile.count(statements[0]) or 0) > (profile.count(others[0]) or 0)
+
+    def _source(self, node):
+        # nodes built by the optimizers may have no location, they belong to the enclosing one
+        return (node.lineno, node.col_offset) if hasattr(node, 'lineno') else self._location
+
+    def _count(self, kind, node, label = None):
+        """Increments the counter of node when instrumenting, returns the label still to place"""
+        counters = self._symbols.counters
+        if counters is None:
+            return label
+        counter = counters.add(kind, node, self._function.name if self._function is not None else None)
+        self._record_instruction(f'LDWA {counter},d', label)
+        self._record_instruction('ADDA 1,i')
+        self._record_instruction(f'STWA {counter},d')
+        return None
+
+    def __identify_constant(self, name):
+        if name.isupper() and name[0] == '_':
+            return True
+        return False
@@ -0,0 +1,114 @@
+import ast
+from generators.SymbolTable import SymbolTable, FunctionSymbols
+
+BUILTINS = ('int', 'input', 'print', 'exit')
+
+def array_allocation(node):
+    """(fill value, size node) when node allocates an array, [fill] * size, None otherwise"""
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Mult) and isinstance(node.left, ast.List) \
+            and len(node.left.elts) == 1 and isinstance(node.left.elts[0], ast.Constant) \
+            and type(node.left.elts[0].value) == int:
+        return node.left.elts[0].value, node.right
+    return None
+
+def is_constant_name(name):
+    return name.isupper() and name[0] == '_'
+
+
+class ProgramAnalysis(ast.NodeVisitor):
+    """
+        Single walk over the module collecting the globals, the arrays and
+        the stack frame of every function into one symbol table
+    """
+
+    def __init__(self, frame_layout=None) -> None:
+        super().__init__()
+        self.results = SymbolTable()
+        self.__function = None
+        self.__frame_layout = frame_layout # FrameLayout sharing the slots of the locals, None for one slot each
+
+    def analyze(self, root_node):
+        self.visit(root_node)
+        self.results.finalize(self.__frame_layout)
+        return self.results
+
+    def visit_Assign(self, node):
+        if len(node.targets) != 1:
+            raise ValueError("Only unary assignments are supported")
+
+        if isinstance(node.targets[0], ast.Subscript): # storing an array cell
+            self.generic_visit(node)
+            return
+        name = node.targets[0].id
+        allocation = array_allocation(node.value)
+        if allocation is not None:
+            self.__add_array(name, allocation[1])
+            self.visit(allocation[1])
+            return
+        elif self.__function is not None:
+            self.__function.add_local(name)
+        elif name not in self.results.global_vars:
+            if isinstance(node.value, ast.Constant):
+                self.results.global_vars[name] = node.value.value
+            else:
+                self.results.global_vars[name] = None
+        self.visit(node.value)
+
+    def visit_AugAssign(self, node):
+        if isinstance(node.target, ast.Subscript) and isinstance(node.value, ast.Subscript):
+            raise ValueError("Only one array cell per operation is supported")
+        if isinstance(node.target, ast.Name):
+            if self.__function is not None:
+                self.__function.add_local(node.target.id)
+            else:
+                self.results.global_vars.setdefault(node.target.id, None)
+        self.generic_visit(node)
+
+    def visit_Subscript(self, node):
+        if not isinstance(node.value, ast.Name) or not isinstance(node.slice, (ast.Name, ast.Constant)):
+            raise ValueError("Only array cells indexed by a variable or a constant are supported")
+        self.generic_visit(node)
+
+    def visit_List(self, node):
+        raise ValueError("Only arrays allocated as [constant] * size are supported")
+
+    def visit_BinOp(self, node):
+        if isinstance(node.left, ast.Subscript) and isinstance(node.right, ast.Subscript):
+            raise ValueError("Only one array cell per operation is supported")
+        self.generic_visit(node)
+
+    def visit_FunctionDef(self, node):
+        function = FunctionSymbols(node.name, node)
+        self.results.functions[node.name] = function
+        self.__function = function
+        for contents in node.body:
+            self.visit(contents)
+        self.__function = None
+
+    def visit_Return(self, node):
+        if self.__function is None:
+            raise ValueError("Return statements are only supported in functions")
+        if node.value is not None:
+            self.__function.add_return()
+        self.generic_visit(node)
+
+    def __add_array(self, name, size_node):
+        size = self.__size(size_node)
+        if self.__function is not None:
+            if size is None and not isinstance(size_node, ast.Name):
+                raise ValueError("The size of an array must be a constant or a variable")
+            self.__function.add_array(name, size)
+        else:
+            if size is None:
+                raise ValueError("The size of a global array must be a constant")
+            self.results.global_vars.setdefault(name, None)
+            self.results.arrays[name] = max(size, self.results.arrays.get(name, 0))
+
+    def __size(self, node):
+        # number of cells known at compile time, None otherwise
+        if isinstance(node, ast.Constant) and type(node.value) == int:
+            return max(node.value, 0)
+        if isinstance(node, ast.Name) and is_constant_name(node.id) \
+                and type(self.results.global_vars.get(node.id)) == int:
+            return max(self.results.global_vars[node.id], 0)
+        return None